@@ -0,0 +1,435 @@
+"""Server-side conversation archive (SQLite + FTS5).
+
+Completed turns from /chat/stream are ingested here so history can be
+listed, searched and exported independently of the browser. Messages are
+indexed in an external-content FTS5 table kept in sync by triggers; search
+results are ranked with bm25 and come with highlighted snippets.
+
+Run `python archive.py [messages]` to time searches over a synthetic
+archive of that many messages (default 100000).
+"""
+import asyncio
+import json
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import AsyncIterator
+
+from config import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    model TEXT,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation_id, id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    content,
+    content='messages',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Matches ranked per search; bm25 over every match of a term found in
+# nearly all messages would cost hundreds of milliseconds at 100k messages
+SEARCH_CANDIDATES = 5000
+
+# Titles for conversations whose first turn never arrives are dropped oldest first
+MAX_PENDING_TITLES = 1000
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def parse_cursor(cursor: str) -> tuple[int, str]:
+    """Split a `next_cursor` into (updated_at, id); ValueError if malformed."""
+    updated_at, sep, last_id = cursor.partition(":")
+    if not sep or not last_id:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return int(updated_at), last_id
+
+
+def fts_query(text: str) -> str | None:
+    """Turn free text into a safe FTS5 query: all terms, last one as a prefix."""
+    terms = _TOKEN.findall(text)
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _fold(word: str) -> str:
+    """Casefold and strip diacritics, like the FTS tokenizer does."""
+    decomposed = unicodedata.normalize("NFKD", word.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def make_snippet(content: str, text: str, width: int = 12) -> str:
+    """Excerpt of `content` around the first query term, matches in [brackets]."""
+    terms = [_fold(t) for t in _TOKEN.findall(text)]
+    prefix = terms[-1] if terms else ""
+    exact = set(terms[:-1])
+
+    def matches(word: str) -> bool:
+        folded = _fold(word)
+        return folded in exact or folded.startswith(prefix)
+
+    words = content.split()
+    first = next((i for i, w in enumerate(words) if any(matches(t) for t in _TOKEN.findall(w))), 0)
+    start = max(0, first - width // 3)
+    window = words[start:start + width]
+    out = [
+        f"[{w}]" if any(matches(t) for t in _TOKEN.findall(w)) else w
+        for w in window
+    ]
+    return ("…" if start > 0 else "") + " ".join(out) + ("…" if start + width < len(words) else "")
+
+
+class Archive:
+    """SQLite archive. Blocking calls run in a worker thread via the async wrappers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        # Titles that arrived before their conversation's first turn
+        self._pending_titles: dict[str, str] = {}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _run(self, fn, *args):
+        with self._lock:
+            return fn(self._db(), *args)
+
+    # --- Writes ---
+
+    def add_messages(
+        self,
+        conversation_id: str,
+        messages: list[tuple[str, str]],
+        model: str | None = None,
+        title: str | None = None,
+    ) -> None:
+        """Append (role, content) messages, creating the conversation if needed."""
+        def write(db: sqlite3.Connection):
+            now = _now_ms()
+            new_title = title or self._pending_titles.pop(conversation_id, None)
+            with db:
+                fallback_title = next((c for r, c in messages if r == "user"), "")[:60]
+                db.execute(
+                    "INSERT INTO conversations (id, title, model, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+                    "updated_at = excluded.updated_at, model = COALESCE(excluded.model, model)",
+                    (conversation_id, new_title or fallback_title, model, now, now),
+                )
+                if new_title:
+                    db.execute("UPDATE conversations SET title = ? WHERE id = ?", (new_title, conversation_id))
+                db.executemany(
+                    "INSERT INTO messages (conversation_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                    [(conversation_id, role, content, now) for role, content in messages],
+                )
+                db.execute(
+                    "UPDATE conversations SET message_count = message_count + ? WHERE id = ?",
+                    (len(messages), conversation_id),
+                )
+        self._run(write)
+
+    def set_title(self, conversation_id: str, title: str) -> None:
+        """Rename a conversation without touching `updated_at`.
+
+        The title request usually races the first turn; if the conversation
+        is not stored yet, the title is applied when it is.
+        """
+        def write(db: sqlite3.Connection):
+            with db:
+                updated = db.execute(
+                    "UPDATE conversations SET title = ? WHERE id = ?", (title, conversation_id),
+                ).rowcount
+            if not updated:
+                self._pending_titles[conversation_id] = title
+                if len(self._pending_titles) > MAX_PENDING_TITLES:
+                    del self._pending_titles[next(iter(self._pending_titles))]
+        self._run(write)
+
+    def delete(self, conversation_id: str) -> bool:
+        def write(db: sqlite3.Connection) -> bool:
+            with db:
+                return db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,)).rowcount > 0
+        return self._run(write)
+
+    def import_conversations(self, conversations: list[dict]) -> int:
+        """Insert or replace whole conversations in the frontend's format."""
+        def write(db: sqlite3.Connection) -> int:
+            with db:
+                for c in conversations:
+                    messages = c.get("messages", [])
+                    created = int(c.get("createdAt") or _now_ms())
+                    db.execute("DELETE FROM conversations WHERE id = ?", (c["id"],))
+                    db.execute(
+                        "INSERT INTO conversations (id, title, model, created_at, updated_at, message_count) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (c["id"], c.get("title", ""), c.get("model"), created,
+                         int(c.get("updatedAt") or created), len(messages)),
+                    )
+                    db.executemany(
+                        "INSERT INTO messages (conversation_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                        [
+                            (c["id"], m["role"], m.get("content", ""), int(m.get("timestamp") or created))
+                            for m in messages
+                        ],
+                    )
+            return len(conversations)
+        return self._run(write)
+
+    # --- Reads ---
+
+    def list_conversations(self, limit: int, cursor: str | None = None) -> dict:
+        """Most recently updated first; `cursor` is the `next_cursor` of the previous page."""
+        def read(db: sqlite3.Connection) -> dict:
+            if cursor:
+                rows = db.execute(
+                    "SELECT * FROM conversations WHERE (updated_at, id) < (?, ?) "
+                    "ORDER BY updated_at DESC, id DESC LIMIT ?",
+                    (*parse_cursor(cursor), limit),
+                ).fetchall()
+            else:
+                rows = db.execute(
+                    "SELECT * FROM conversations ORDER BY updated_at DESC, id DESC LIMIT ?", (limit,),
+                ).fetchall()
+            items = [_conversation_row(r) for r in rows]
+            next_cursor = f"{rows[-1]['updated_at']}:{rows[-1]['id']}" if len(rows) == limit else None
+            return {"conversations": items, "next_cursor": next_cursor}
+        return self._run(read)
+
+    def get_conversation(self, conversation_id: str) -> dict | None:
+        def read(db: sqlite3.Connection) -> dict | None:
+            row = db.execute("SELECT * FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+            if row is None:
+                return None
+            messages = db.execute(
+                "SELECT role, content, created_at FROM messages WHERE conversation_id = ? ORDER BY id",
+                (conversation_id,),
+            ).fetchall()
+            return {
+                **_conversation_row(row),
+                "messages": [
+                    {"role": m["role"], "content": m["content"], "timestamp": m["created_at"]}
+                    for m in messages
+                ],
+            }
+        return self._run(read)
+
+    def search(self, text: str, limit: int, offset: int = 0) -> dict:
+        """Rank messages matching `text` (bm25) and return highlighted snippets."""
+        query = fts_query(text)
+        if query is None:
+            return {"results": [], "next_offset": None}
+
+        def read(db: sqlite3.Connection) -> dict:
+            # Rank on the index alone, then load the page's rows. Snippets are
+            # built here: FTS5's snippet() rescans the term's whole doclist.
+            # Very common terms are ranked among their most recent matches only.
+            ranked = db.execute(
+                "SELECT rowid, rank FROM ("
+                "  SELECT rowid, bm25(messages_fts) AS rank FROM messages_fts"
+                "  WHERE messages_fts MATCH ? ORDER BY rowid DESC LIMIT ?"
+                ") ORDER BY rank LIMIT ? OFFSET ?",
+                (query, SEARCH_CANDIDATES, limit, offset),
+            ).fetchall()
+            if not ranked:
+                return {"results": [], "next_offset": None}
+
+            ids = [r["rowid"] for r in ranked]
+            placeholders = ",".join("?" * len(ids))
+            details = {
+                r["id"]: r
+                for r in db.execute(
+                    "SELECT m.id, m.conversation_id, m.role, m.content, m.created_at, c.title "
+                    "FROM messages m JOIN conversations c ON c.id = m.conversation_id "
+                    f"WHERE m.id IN ({placeholders})",
+                    ids,
+                )
+            }
+            results = []
+            for r in ranked:
+                d = details.get(r["rowid"])
+                if d is None:
+                    continue
+                results.append({
+                    "conversation_id": d["conversation_id"],
+                    "title": d["title"],
+                    "message_id": d["id"],
+                    "role": d["role"],
+                    "snippet": make_snippet(d["content"], text),
+                    "rank": round(r["rank"], 4),
+                    "timestamp": d["created_at"],
+                })
+            return {
+                "results": results,
+                "next_offset": offset + limit if len(ranked) == limit else None,
+            }
+        return self._run(read)
+
+    def export_ids(self) -> list[str]:
+        def read(db: sqlite3.Connection) -> list[str]:
+            return [r[0] for r in db.execute("SELECT id FROM conversations ORDER BY created_at, id")]
+        return self._run(read)
+
+    def stats(self) -> dict:
+        def read(db: sqlite3.Connection) -> dict:
+            return {
+                "conversations": db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0],
+                "messages": db.execute("SELECT COUNT(*) FROM messages").fetchone()[0],
+            }
+        return self._run(read)
+
+    # --- Async wrappers ---
+
+    async def arun(self, method: str, *args):
+        return await asyncio.to_thread(getattr(self, method), *args)
+
+    async def export_jsonl(self) -> AsyncIterator[str]:
+        """Yield one conversation per line, in the same shape /archive/import accepts."""
+        for conversation_id in await self.arun("export_ids"):
+            conversation = await self.arun("get_conversation", conversation_id)
+            if conversation is not None:
+                yield json.dumps(conversation, ensure_ascii=False) + "\n"
+
+
+def _conversation_row(row: sqlite3.Row) -> dict:
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "model": row["model"],
+        "createdAt": row["created_at"],
+        "updatedAt": row["updated_at"],
+        "messageCount": row["message_count"],
+    }
+
+
+archive = Archive(settings.archive_path)
+
+
+async def archive_stream(
+    source: AsyncIterator[str],
+    conversation_id: str,
+    user_message: str | None,
+    model: str | None,
+) -> AsyncIterator[str]:
+    """Pass SSE chunks through and archive the turn once it completes.
+
+    The user message (if any) and the streamed answer are stored together
+    when the `done` event arrives. A turn paused for terminal approval is
+    stored without an answer; its resume stream archives the answer later.
+    Cancelled or failed turns are not archived.
+    """
+    tokens: list[str] = []
+    async for chunk in source:
+        yield chunk
+        if not settings.archive_enabled or not chunk.startswith("data: "):
+            continue
+        event = json.loads(chunk[6:])
+        if event["type"] == "token":
+            tokens.append(event.get("content", ""))
+        elif event["type"] == "done":
+            messages = [("user", user_message)] if user_message else []
+            answer = "".join(tokens)
+            if answer:
+                messages.append(("assistant", answer))
+            if messages:
+                try:
+                    await archive.arun("add_messages", conversation_id, messages, model)
+                except sqlite3.Error as e:
+                    print(f"[ARCHIVE] Could not store turn for {conversation_id}: {e}")
+
+
+# --- Search benchmark ---
+
+_TOPICS = (
+    "python fastapi langgraph docker nginx postgres sqlite react vite typescript "
+    "lisboa porto viagem orçamento receita bolo chocolate futebol notícias clima"
+).split()
+
+
+def benchmark(total_messages: int) -> dict:
+    """Time searches over a synthetic archive with a Zipf-like vocabulary."""
+    import random
+
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(20_000)]
+    weights = [1 / (rank + 1) ** 1.07 for rank in range(len(vocabulary))]
+
+    def text() -> str:
+        words = rng.choices(vocabulary, weights=weights, k=40)
+        words += rng.sample(_TOPICS, k=2) if rng.random() < 0.1 else []
+        return " ".join(words)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench = Archive(str(Path(tmp) / "bench.db"))
+        started = time.perf_counter()
+        per_conversation = 50
+        for c in range(total_messages // per_conversation):
+            bench.add_messages(f"conv-{c}", [
+                ("user" if i % 2 == 0 else "assistant", text()) for i in range(per_conversation)
+            ])
+        ingest_s = time.perf_counter() - started
+
+        timings: dict[str, dict] = {}
+        # Topical terms, a prefix, a mid-frequency word and the most common one
+        for q in ["langgraph", "docker nginx", "orçamento viagem", "chocol", "w500", "w0"]:
+            samples = []
+            for _ in range(20):
+                t = time.perf_counter()
+                bench.search(q, 20)
+                samples.append((time.perf_counter() - t) * 1000)
+            matches = bench._run(lambda db: db.execute(
+                "SELECT COUNT(*) FROM messages_fts WHERE messages_fts MATCH ?", (fts_query(q),),
+            ).fetchone()[0])
+            timings[q] = {"matches": matches, "median_ms": round(sorted(samples)[len(samples) // 2], 2)}
+
+        return {**bench.stats(), "ingest_s": round(ingest_s, 2), "search": timings}
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(json.dumps(benchmark(count), indent=2, ensure_ascii=False))
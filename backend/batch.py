@@ -0,0 +1,129 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+
+from graph import stream_graph_response, discard_thread
+from schemas import ChatRequest, BatchJobResult
+
+
+def parse_jobs(body: str) -> list[ChatRequest | str]:
+    """Parse a JSONL body into ChatRequest jobs.
+
+    Lines that fail validation are kept as their error message so the
+    caller can report them without aborting the whole batch.
+    """
+    jobs: list[ChatRequest | str] = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            jobs.append(ChatRequest.model_validate_json(line))
+        except ValidationError as e:
+            jobs.append(f"Invalid job: {e.errors()[0].get('msg', 'validation error')}")
+    return jobs
+
+
+async def run_job(batch_id: str, index: int, request: ChatRequest) -> BatchJobResult:
+    """Run one job through the graph and collect its streamed output."""
+    # Jobs run on a private thread so they never collide with (or leave
+    # checkpoints behind for) interactive conversations.
+    internal_thread_id = f"batch:{batch_id}:{index}"
+    content: list[str] = []
+    tool_calls: list[dict] = []
+    result = BatchJobResult(index=index, thread_id=request.thread_id, status="ok")
+    started = time.perf_counter()
+
+    try:
+        async for chunk in stream_graph_response(
+            thread_id=internal_thread_id,
+            messages=[m.model_dump() for m in request.messages],
+            new_message=request.new_message,
+            image_base64=request.image_base64,
+            image_media_type=request.image_media_type,
+            model=request.model,
+            thinking_mode=request.thinking_mode,
+            web_search=request.web_search,
+            terminal_access=request.terminal_access,
+        ):
+            if not chunk.startswith("data: "):
+                continue
+            event = json.loads(chunk[6:])
+            if event["type"] == "token":
+                content.append(event.get("content", ""))
+            elif event["type"] == "message_type":
+                result.message_type = event.get("content")
+            elif event["type"] == "tool_start":
+                tool_calls.append(json.loads(event.get("content", "{}")))
+            elif event["type"] == "terminal_pending":
+                # Nobody is around to approve commands in a batch run
+                result.status = "pending_approval"
+            elif event["type"] == "error":
+                result.status = "error"
+                result.error = event.get("content")
+    except Exception as e:
+        result.status = "error"
+        result.error = str(e)
+    finally:
+        discard_thread(internal_thread_id)
+
+    result.content = "".join(content)
+    result.tool_calls = tool_calls
+    result.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def run_batch(
+    jobs: list[ChatRequest | str],
+    concurrency: int,
+    offset: int = 0,
+) -> AsyncIterator[str]:
+    """Run jobs with a bounded concurrency window, yielding JSONL results
+    in completion order.
+
+    Every result carries `resume_offset`: the number of leading jobs that
+    have all completed. Re-submitting the same batch with that offset
+    resumes an interrupted run without repeating finished work (jobs past
+    the offset that already completed may run again).
+    """
+    batch_id = uuid.uuid4().hex[:12]
+    queue = iter(range(offset, len(jobs)))
+    running: set[asyncio.Task] = set()
+    completed: set[int] = set()
+    resume_offset = offset
+
+    def launch_next() -> bool:
+        for index in queue:
+            job = jobs[index]
+            if isinstance(job, str):
+                task = asyncio.create_task(asyncio.sleep(
+                    0, BatchJobResult(index=index, thread_id="", status="invalid", error=job),
+                ))
+            else:
+                task = asyncio.create_task(run_job(batch_id, index, job))
+            running.add(task)
+            return True
+        return False
+
+    try:
+        while len(running) < concurrency and launch_next():
+            pass
+
+        while running:
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                running.discard(task)
+                result: BatchJobResult = task.result()
+                completed.add(result.index)
+                while resume_offset in completed:
+                    completed.discard(resume_offset)
+                    resume_offset += 1
+                result.resume_offset = resume_offset
+                yield result.model_dump_json(exclude_none=True) + "\n"
+                launch_next()
+    finally:
+        for task in running:
+            task.cancel()
@@ -0,0 +1,242 @@
+"""Microbenchmarks for the backend's CPU hot paths.
+
+    python bench.py [--output results.json] [--compare baseline.json]
+    python bench.py --record [--model MODEL]
+
+Cases: estimate_tokens, the <think> tag filter, the terminal command
+validator, SSE event encoding, ChatRequest deserialization, and one full
+stream_graph_response turn. The full turn replays a fixture (see
+fixtures.py) with no delays, so it measures graph, LangChain and parsing
+overhead rather than the model; record that fixture once against a running
+LM Studio with --record. Without it the case is reported as skipped.
+
+Results are JSON. With --compare, each case's fastest run is checked
+against a previous results file and the exit code is 1 if any case is
+slower by more than --threshold.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from config import settings
+from graph import ThinkTagFilter, estimate_tokens, format_event, stream_graph_response, discard_thread
+from schemas import ChatRequest
+from tools import validate_command
+
+TURN_FIXTURES = Path(__file__).with_name("fixtures") / "bench"
+TURN_THREAD = "bench-turn"
+TURN_HISTORY = [
+    {"role": "user", "content": "What is the difference between a process and a thread?"},
+    {"role": "assistant", "content": "A process has its own memory space; threads share the memory of their process."},
+    {"role": "user", "content": "And which one is cheaper to create?"},
+    {"role": "assistant", "content": "Threads: no new address space has to be set up."},
+]
+TURN_MESSAGE = "Give me three short tips for writing thread-safe Python code."
+
+
+# --- Inputs ---
+
+def _history(length: int) -> list:
+    return [
+        HumanMessage(content="How do I configure a reverse proxy for my API? " * 3)
+        if i % 2 == 0 else
+        AIMessage(content="Use nginx with a location block that forwards to the upstream. " * 8)
+        for i in range(length)
+    ]
+
+
+def _think_tokens() -> list[str]:
+    text = (
+        "<think>The user wants a short answer. Let me think about proxies, "
+        "upstreams and headers.</think>Use nginx: add a `location /api` block "
+        "with `proxy_pass http://127.0.0.1:8000;` and set the Host header. "
+    ) * 20
+    # Small, irregular tokens like a model emits, splitting tags across tokens
+    tokens, i = [], 0
+    while i < len(text):
+        size = 2 + len(tokens) % 5
+        tokens.append(text[i:i + size])
+        i += size
+    return tokens
+
+
+def _filter_stream(tokens: list[str]) -> None:
+    f = ThinkTagFilter()
+    for token in tokens:
+        f.feed(token)
+    f.flush()
+
+
+COMMANDS = [
+    "ls -la",
+    "git status",
+    "Get-ChildItem | Select-Object Name, Length",
+    "cat README.md | grep install | wc -l",
+    "rm -rf /",
+    "curl http://example.com",
+    "python --version",
+    "find . -name '*.py' | head -20",
+]
+
+
+def _chat_request_json(messages: int) -> str:
+    return json.dumps({
+        "thread_id": "bench",
+        "messages": [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": "Some message content. " * 20}
+            for i in range(messages)
+        ],
+        "new_message": "Summarize the above.",
+        "model": "local-model",
+        "web_search": True,
+    })
+
+
+# --- Measurement ---
+
+def measure(fn, repeat: int = 5) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    per_op = [t / number for t in timer.repeat(repeat, number)]
+    return {
+        "ops": number,
+        "repeat": repeat,
+        "median_us": round(statistics.median(per_op) * 1e6, 3),
+        "min_us": round(min(per_op) * 1e6, 3),
+    }
+
+
+async def _run_turn(model: str) -> int:
+    events = 0
+    async for _ in stream_graph_response(
+        thread_id=TURN_THREAD,
+        messages=TURN_HISTORY,
+        new_message=TURN_MESSAGE,
+        image_base64=None,
+        image_media_type=None,
+        model=model,
+        thinking_mode=False,
+    ):
+        events += 1
+    discard_thread(TURN_THREAD)
+    return events
+
+
+def measure_turn(repeat: int) -> dict:
+    meta_path = TURN_FIXTURES / "turn.json"
+    if not meta_path.exists():
+        return {"skipped": "no recorded turn; run `python bench.py --record` with LM Studio running"}
+
+    model = json.loads(meta_path.read_text(encoding="utf-8"))["model"]
+    settings.llm_fixture_mode = "replay"
+    settings.llm_fixture_dir = str(TURN_FIXTURES)
+    settings.llm_fixture_speed = 0.0
+
+    async def run() -> dict:
+        events = await _run_turn(model)  # warm-up
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await _run_turn(model)
+            timings.append((time.perf_counter() - started) * 1e6)
+        return {
+            "ops": 1,
+            "repeat": repeat,
+            "events": events,
+            "median_us": round(statistics.median(timings), 3),
+            "min_us": round(min(timings), 3),
+        }
+
+    return asyncio.run(run())
+
+
+def record_turn(model: str) -> None:
+    settings.llm_fixture_mode = "record"
+    settings.llm_fixture_dir = str(TURN_FIXTURES)
+    events = asyncio.run(_run_turn(model))
+    (TURN_FIXTURES / "turn.json").write_text(json.dumps({"model": model}), encoding="utf-8")
+    print(f"Recorded bench turn ({events} events) with {model} into {TURN_FIXTURES}")
+
+
+def run_all(repeat: int) -> dict:
+    history = _history(200)
+    tokens = _think_tokens()
+    request_json = _chat_request_json(50)
+    event_payload = json.dumps({"name": "web_search", "args": {"query": "weather in Lisbon"}})
+
+    cases = {
+        "estimate_tokens_200_messages": lambda: estimate_tokens(history),
+        f"think_filter_{len(tokens)}_tokens": lambda: _filter_stream(tokens),
+        f"validate_command_x{len(COMMANDS)}": lambda: [validate_command(c) for c in COMMANDS],
+        "format_event_token": lambda: format_event("token", "hello"),
+        "format_event_tool_start": lambda: format_event("tool_start", event_payload),
+        "chat_request_50_messages": lambda: ChatRequest.model_validate_json(request_json),
+    }
+    results = {name: measure(fn, repeat) for name, fn in cases.items()}
+    results["stream_graph_response_turn"] = measure_turn(repeat)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[dict]:
+    rows = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name, {})
+        # The fastest run is the least noisy estimate of the code's own cost
+        if "min_us" not in result or "min_us" not in before:
+            continue
+        ratio = result["min_us"] / before["min_us"] if before["min_us"] else None
+        rows.append({
+            "case": name,
+            "baseline_min_us": before["min_us"],
+            "current_min_us": result["min_us"],
+            "ratio": round(ratio, 3) if ratio is not None else None,
+            "regression": ratio is not None and ratio > 1 + threshold,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write results JSON here instead of stdout")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown (default 0.10)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--record", action="store_true", help="record the full-turn fixture against LM Studio")
+    parser.add_argument("--model", default=settings.lm_studio_model)
+    args = parser.parse_args()
+
+    if args.record:
+        record_turn(args.model)
+        return
+
+    report = run_all(args.repeat)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        report["comparison"] = compare(report, baseline, args.threshold)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+    if any(row["regression"] for row in report.get("comparison", [])):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
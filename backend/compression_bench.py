@@ -0,0 +1,150 @@
+"""Compare the extractive and LLM history summaries.
+
+    python compression_bench.py [samples.jsonl] [--model MODEL] [--no-llm]
+
+Reports, per sample and on average, summary size in tokens, tokens saved
+against the original history, fact retention (see tiers.fact_retention)
+and latency. Samples use the tiers.py format: JSONL with a `history` list
+of {"role", "content"} dicts. Without a file, built-in conversations are
+used. With --no-llm only the extractive summarizer runs, so LM Studio is
+not needed. Extractive summaries are capped at a third of the source so
+that short samples are still compressed.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from config import settings
+from summarizer import summarize
+from tiers import BUILTIN_SAMPLES, fact_retention, history_text, run_summary
+
+BUILTIN_HISTORIES = [s["history"] for s in BUILTIN_SAMPLES if "history" in s] + [
+    [
+        {"role": "user", "content": (
+            "Our API runs on FastAPI behind nginx on a single Hetzner CX22 box. "
+            "Latency at p95 is around 850 ms and we have 3 workers. "
+            "The database is Postgres 15 on the same machine."
+        )},
+        {"role": "assistant", "content": (
+            "With 3 workers on a 2 vCPU machine you are likely CPU bound. "
+            "First check whether the slow requests are waiting on Postgres. "
+            "Enable pg_stat_statements and look at the top queries by total time. "
+            "Also make sure nginx keeps upstream connections alive with keepalive 32."
+        )},
+        {"role": "user", "content": (
+            "pg_stat_statements shows one query on the orders table taking 600 ms. "
+            "It filters by customer_id and sorts by created_at."
+        )},
+        {"role": "assistant", "content": (
+            "That query needs a composite index. "
+            "Create an index on orders (customer_id, created_at DESC). "
+            "Build it with CREATE INDEX CONCURRENTLY so writes are not blocked. "
+            "After that the query should drop well below 10 ms."
+        )},
+        {"role": "user", "content": (
+            "The index helped, p95 is now 140 ms. "
+            "Should I move Postgres to a separate server before the Black Friday launch on November 28?"
+        )},
+        {"role": "assistant", "content": (
+            "At 140 ms you have headroom, but a separate database server isolates CPU spikes. "
+            "A managed Postgres or a second CX32 box are both fine. "
+            "Do the move at least two weeks before November 28 and load test with k6 at 3x normal traffic. "
+            "Keep a snapshot so you can roll back quickly."
+        )},
+    ],
+    [
+        {"role": "user", "content": (
+            "Estou aprendendo Rust e quero escrever um servidor HTTP simples. "
+            "Já uso Python há 5 anos."
+        )},
+        {"role": "assistant", "content": (
+            "Para começar, use o Axum com o runtime Tokio. "
+            "Crie o projeto com cargo new servidor e adicione axum e tokio ao Cargo.toml. "
+            "O Axum tem uma API parecida com o FastAPI, então a transição deve ser tranquila."
+        )},
+        {"role": "user", "content": (
+            "Como faço para ler JSON no corpo da requisição? "
+            "No FastAPI eu usava modelos Pydantic."
+        )},
+        {"role": "assistant", "content": (
+            "No Rust o equivalente é o Serde. "
+            "Derive Deserialize na sua struct e use o extractor Json<T> no handler. "
+            "Se o corpo for inválido, o Axum responde 422 automaticamente, como o FastAPI."
+        )},
+        {"role": "user", "content": "E para acessar um banco SQLite?"},
+        {"role": "assistant", "content": (
+            "Use o SQLx com a feature sqlite. "
+            "Ele verifica as queries em tempo de compilação com a macro query!. "
+            "Guarde o pool de conexões no estado da aplicação com Router::with_state."
+        )},
+    ],
+]
+
+
+def tokens(text: str) -> int:
+    return len(text) // 4
+
+
+async def run(histories: list[list[dict]], model: str | None) -> dict:
+    strategies = ["extractive"] + (["llm"] if model else [])
+    rows = []
+    for history in histories:
+        source = history_text(history)
+        row: dict = {"source_tokens": tokens(source), "strategies": {}}
+        for strategy in strategies:
+            started = time.perf_counter()
+            try:
+                if strategy == "llm":
+                    summary = await run_summary(model, None, history)
+                else:
+                    summary = summarize(
+                        [(m["role"], m["content"]) for m in history],
+                        min(settings.extractive_summary_tokens, row["source_tokens"] // 3),
+                    )
+            except Exception as e:
+                row["strategies"][strategy] = {"error": str(e)}
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            row["strategies"][strategy] = {
+                "tokens": tokens(summary),
+                "tokens_saved": row["source_tokens"] - tokens(summary),
+                "fact_retention": fact_retention(source, summary),
+                "ms": round(elapsed, 2),
+                "summary": summary,
+            }
+        rows.append(row)
+
+    totals = {}
+    for strategy in strategies:
+        done = [r["strategies"][strategy] for r in rows if "error" not in r["strategies"][strategy]]
+        totals[strategy] = {
+            "samples": len(done),
+            "failures": len(rows) - len(done),
+            "mean_tokens_saved": round(statistics.mean(d["tokens_saved"] for d in done), 1) if done else None,
+            "mean_fact_retention": round(statistics.mean(d["fact_retention"] for d in done), 3) if done else None,
+            "mean_ms": round(statistics.mean(d["ms"] for d in done), 2) if done else None,
+        }
+    return {"model": model, "results": rows, "summary": totals}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("samples", nargs="?")
+    parser.add_argument("--model", default=settings.lm_studio_model)
+    parser.add_argument("--no-llm", action="store_true", help="only run the extractive summarizer")
+    args = parser.parse_args()
+
+    if args.samples:
+        with open(args.samples, encoding="utf-8") as f:
+            histories = [json.loads(line)["history"] for line in f if line.strip()]
+    else:
+        histories = BUILTIN_HISTORIES
+
+    model = None if args.no_llm else args.model
+    print(json.dumps(asyncio.run(run(histories, model)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,9 +7,56 @@ class Settings(BaseSettings):
     lm_studio_url: str = "http://localhost:1234/v1"
     lm_studio_model: str = "local-model"
     max_history_tokens: int = 2000
+    compression_strategy: Literal["llm", "extractive", "auto"] = "auto"
+    extractive_summary_tokens: int = 400
+    aux_model: str | None = None
+    aux_lm_studio_url: str | None = None
+    aux_tasks: list[str] = ["title", "compress", "tool_decision"]
+    aux_timeout_seconds: float = 30.0
+    aux_retry_after_seconds: float = 60.0
+    residency_enabled: bool = True
+    residency_warm_models: list[str] = []
+    residency_ping_interval_seconds: float = 240.0
+    residency_window_seconds: float = 1800.0
+    residency_half_life_seconds: float = 300.0
+    residency_max_hot_models: int = 1
+    residency_load_timeout_seconds: float = 300.0
     cors_origins: list[str] = ["http://localhost:5173", "http://localhost:4173"]
     tools_enabled: bool = True
     tool_call_max_iterations: int = 3
+    tool_router_enabled: bool = True
+    tool_router_model_path: str | None = None
+    file_search_roots: list[str] = []
+    file_search_exclude: list[str] = [
+        ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv",
+        ".ssh", ".gnupg", ".aws", ".env", ".env.*", "*.pem", "*.key", "id_rsa*", "id_ed25519*",
+    ]
+    file_search_content: bool = False
+    file_search_content_index: bool = False
+    file_search_max_files: int = 200_000
+    file_search_max_file_bytes: int = 1_000_000
+    file_search_max_results: int = 200
+    file_search_matches_per_file: int = 5
+    file_search_refresh_seconds: float = 5.0
+    file_search_timeout_seconds: float = 15.0
+    stream_buffer_max_events: int = 2000
+    tracemalloc_frames: int = 0
+    tracemalloc_keep_snapshots: int = 5
+    stream_resume_grace_seconds: float = 30.0
+    stream_high_water_events: int = 256
+    ws_initial_credit: int = 64
+    ws_max_streams: int = 16
+    ws_health_interval_seconds: float = 10.0
+    batch_concurrency: int = 4
+    batch_max_concurrency: int = 32
+    archive_enabled: bool = False
+    archive_path: str = "archive.db"
+    llm_fixture_mode: Literal["off", "record", "replay"] = "off"
+    llm_fixture_dir: str = "fixtures/llm"
+    llm_fixture_speed: float = 1.0
+    speculative_search_enabled: bool = False
+    speculative_search_min_coverage: float = 0.6
+    speculative_search_max_extra_terms: int = 3
 
     class Config:
         env_file = ".env"
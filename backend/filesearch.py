@@ -0,0 +1,404 @@
+"""In-process file index behind the file_search tool.
+
+Paths under the configured roots (`file_search_roots`) are indexed once
+on first use and then kept current incrementally. A refresh re-lists only
+directories whose mtime changed (files were added or removed there).
+When contents are indexed, files whose mtime or size changed are re-read
+as well. Refreshes run at most every `file_search_refresh_seconds`.
+
+Searching file contents (`content_regex`) is off unless
+`file_search_content` is set, since it runs without per-call approval.
+Regexes with nested quantifiers are rejected: matching cannot be
+interrupted inside a file, so one catastrophic pattern could otherwise
+run for minutes.
+
+With `file_search_content_index`, the lowercased content trigrams of each
+text file are indexed too. A content regex is then only run against files
+that contain every trigram of the regex's literal parts. Files are read
+through mmap, so matching does not copy whole files into memory.
+
+The tool never writes anything and never leaves the configured roots.
+Names matching `file_search_exclude` (VCS and dependency folders, keys,
+.env files) are skipped.
+"""
+import fnmatch
+import mmap
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+import numpy as np
+
+from config import settings
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+BINARY_SNIFF_BYTES = 8192
+MAX_LINE_CHARS = 200
+
+
+@dataclass
+class _Dir:
+    mtime: float
+    files: set[str] = field(default_factory=set)
+    dirs: set[str] = field(default_factory=set)
+
+
+@dataclass
+class _File:
+    mtime: float
+    size: int
+    trigrams: np.ndarray | None = None
+
+
+def literal_runs(pattern: str) -> list[str] | None:
+    """Literal substrings every match of `pattern` must contain.
+
+    Returns None if the pattern cannot be narrowed down this way (top-level
+    alternation, or no literal of three characters or more).
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None
+    runs, current = [], []
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(arg))
+            continue
+        if op is sre_parse.BRANCH:
+            return None
+        if current:
+            runs.append("".join(current))
+            current = []
+    if current:
+        runs.append("".join(current))
+    runs = [r for r in runs if len(r) >= 3]
+    return runs or None
+
+
+def nested_quantifier(pattern: str) -> bool:
+    """Whether a repeat sits inside another repeat, as in (a+)+ or (\\w*)*."""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return False
+    repeats = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+    if hasattr(sre_parse, "POSSESSIVE_REPEAT"):
+        repeats.add(sre_parse.POSSESSIVE_REPEAT)
+
+    def walk(items, inside: bool) -> bool:
+        for op, arg in items:
+            if op in repeats:
+                _, high, sub = arg
+                if high > 1 and inside:
+                    return True
+                if walk(sub, inside or high > 1):
+                    return True
+            elif op is sre_parse.SUBPATTERN:
+                if walk(arg[-1], inside):
+                    return True
+            elif op is sre_parse.BRANCH:
+                if any(walk(branch, inside) for branch in arg[1]):
+                    return True
+            elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+                if walk(arg[1], inside):
+                    return True
+        return False
+
+    return walk(parsed, False)
+
+
+def trigrams(data: bytes) -> np.ndarray:
+    """Distinct lowercased byte trigrams of `data`, packed into integers."""
+    b = np.frombuffer(data.lower(), dtype=np.uint8).astype(np.uint32)
+    if len(b) < 3:
+        return np.empty(0, dtype=np.uint32)
+    return np.unique((b[:-2] << 16) | (b[1:-1] << 8) | b[2:])
+
+
+def _match_lines(data: mmap.mmap | str, regex: re.Pattern, limit: int) -> list[dict]:
+    """Matching lines with 1-based line numbers, at most `limit`.
+
+    `data` is a mapped file for bytes patterns or decoded text for str ones.
+    """
+    nl = "\n" if isinstance(data, str) else b"\n"
+    matches = []
+    line_no, scanned = 1, 0
+    for m in regex.finditer(data):
+        start = data.rfind(nl, 0, m.start()) + 1
+        if matches and start == matches[-1]["_start"]:
+            continue  # another match on the same line
+        pos = data.find(nl, scanned, start)
+        while pos != -1:
+            line_no += 1
+            pos = data.find(nl, pos + 1, start)
+        scanned = start
+        end = data.find(nl, m.end())
+        text = data[start:end if end != -1 else len(data)]
+        if not isinstance(text, str):
+            text = text.decode("utf-8", "replace")
+        matches.append({"_start": start, "line": line_no, "text": text.strip()[:MAX_LINE_CHARS]})
+        if len(matches) >= limit:
+            break
+    for match in matches:
+        del match["_start"]
+    return matches
+
+
+class FileIndex:
+    def __init__(self):
+        self.dirs: dict[str, _Dir] = {}
+        self.files: dict[str, _File] = {}
+        self.postings: dict[int, set[str]] = {}
+        self.last_refresh = 0.0
+        self.refresh_ms: float | None = None
+        self._lock = threading.Lock()
+
+    # --- Roots and exclusions ---
+
+    @staticmethod
+    def roots() -> list[str]:
+        return [
+            os.path.realpath(os.path.expanduser(r))
+            for r in settings.file_search_roots
+        ]
+
+    @staticmethod
+    def excluded(name: str) -> bool:
+        return any(fnmatch.fnmatch(name, p) for p in settings.file_search_exclude)
+
+    def resolve_root(self, root: str | None) -> str | None:
+        """Absolute search root if it lies inside a configured root."""
+        roots = self.roots()
+        if not root:
+            return None
+        path = os.path.realpath(os.path.expanduser(root))
+        if any(path == r or path.startswith(r.rstrip(os.sep) + os.sep) for r in roots):
+            return path
+        return None
+
+    # --- Indexing ---
+
+    def refresh(self, force: bool = False) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self.last_refresh < settings.file_search_refresh_seconds:
+                return
+            started = time.perf_counter()
+            seen: set[str] = set()
+            for root in self.roots():
+                self._refresh_dir(root, seen)
+            for gone in set(self.dirs) - seen:
+                self._drop_dir(gone)
+            self.last_refresh = time.monotonic()
+            self.refresh_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def _refresh_dir(self, path: str, seen: set[str]) -> None:
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            try:
+                mtime = os.stat(current).st_mtime
+            except OSError:
+                continue
+            seen.add(current)
+            entry = self.dirs.get(current)
+            if entry is None or entry.mtime != mtime:
+                entry = self._list_dir(current, mtime, entry)
+            elif settings.file_search_content_index:
+                # Listing unchanged, but indexed contents may be stale
+                for name in list(entry.files):
+                    self._refresh_file(os.path.join(current, name))
+            stack.extend(os.path.join(current, d) for d in entry.dirs)
+
+    def _list_dir(self, path: str, mtime: float, old: _Dir | None) -> _Dir:
+        entry = _Dir(mtime)
+        try:
+            with os.scandir(path) as it:
+                for item in it:
+                    if self.excluded(item.name):
+                        continue
+                    try:
+                        if item.is_dir(follow_symlinks=False):
+                            entry.dirs.add(item.name)
+                        elif item.is_file(follow_symlinks=False):
+                            if item.path not in self.files and len(self.files) >= settings.file_search_max_files:
+                                continue
+                            entry.files.add(item.name)
+                            self._refresh_file(item.path)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        if old is not None:
+            for name in old.files - entry.files:
+                self._drop_file(os.path.join(path, name))
+        self.dirs[path] = entry
+        return entry
+
+    def _refresh_file(self, path: str) -> None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._drop_file(path)
+            return
+        entry = self.files.get(path)
+        if entry is not None and entry.mtime == st.st_mtime and entry.size == st.st_size:
+            return
+        self._drop_file(path)
+        entry = _File(st.st_mtime, st.st_size)
+        if settings.file_search_content_index:
+            grams = self._read_trigrams(path, st.st_size)
+            if grams is not None:
+                entry.trigrams = grams
+                for g in grams.tolist():
+                    self.postings.setdefault(g, set()).add(path)
+        self.files[path] = entry
+
+    @staticmethod
+    def _read_trigrams(path: str, size: int) -> np.ndarray | None:
+        if size == 0 or size > settings.file_search_max_file_bytes:
+            return None
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if b"\0" in mm[:BINARY_SNIFF_BYTES]:
+                    return None
+                return trigrams(mm[:])
+        except (OSError, ValueError):
+            return None
+
+    def _drop_file(self, path: str) -> None:
+        entry = self.files.pop(path, None)
+        if entry is not None and entry.trigrams is not None:
+            for g in entry.trigrams.tolist():
+                paths = self.postings.get(g)
+                if paths is not None:
+                    paths.discard(path)
+                    if not paths:
+                        del self.postings[g]
+
+    def _drop_dir(self, path: str) -> None:
+        entry = self.dirs.pop(path, None)
+        if entry is not None:
+            for name in entry.files:
+                self._drop_file(os.path.join(path, name))
+
+    # --- Queries ---
+
+    def _candidates(self, content_regex: str | None, ignore_case: bool) -> list[str]:
+        # The trigrams are ASCII-lowercased bytes, so they cannot narrow down
+        # a case-insensitive match of non-ASCII text
+        if content_regex and settings.file_search_content_index and not (
+            ignore_case and not content_regex.isascii()
+        ):
+            runs = literal_runs(content_regex)
+            if runs:
+                grams = set().union(*(trigrams(r.encode("utf-8")).tolist() for r in runs))
+                sets = sorted((self.postings.get(g, set()) for g in grams), key=len)
+                if not sets:
+                    return []
+                return sorted(sets[0].intersection(*sets[1:]))
+        return list(self.files)
+
+    def search(self, pattern: str = "*", content_regex: str | None = None,
+               root: str | None = None, max_results: int = 50, ignore_case: bool = False) -> dict:
+        if not self.roots():
+            return {"status": "error", "message": "File search has no configured roots"}
+        base = self.resolve_root(root) if root else None
+        if root and base is None:
+            return {
+                "status": "error",
+                "message": f"{root} is outside the searchable roots: {', '.join(self.roots())}",
+            }
+        if content_regex and not settings.file_search_content:
+            return {"status": "error", "message": "Searching file contents is disabled; search by name only"}
+        if content_regex and nested_quantifier(content_regex):
+            return {
+                "status": "error",
+                "message": "Regex has nested quantifiers such as (a+)+, which can take exponential time",
+            }
+        try:
+            flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+            if not content_regex:
+                regex = None
+            elif ignore_case and not content_regex.isascii():
+                # Bytes patterns only fold ASCII case; match decoded text instead
+                regex = re.compile(content_regex, flags)
+            else:
+                regex = re.compile(content_regex.encode("utf-8"), flags)
+        except re.error as e:
+            return {"status": "error", "message": f"Invalid regex: {e}"}
+
+        started = time.perf_counter()
+        self.refresh()
+        max_results = max(1, min(settings.file_search_max_results, max_results))
+        deadline = time.monotonic() + settings.file_search_timeout_seconds
+        match_path = "/" in pattern or os.sep in pattern
+        if match_path and not base and not pattern.startswith(("/", "*")):
+            pattern = "*/" + pattern  # relative to any root
+        glob = re.compile(fnmatch.translate(pattern), re.IGNORECASE if os.name == "nt" else 0)
+
+        results: list[dict] = []
+        truncated = timed_out = False
+        for path in self._candidates(content_regex, ignore_case):
+            if base and not path.startswith(base.rstrip(os.sep) + os.sep):
+                continue
+            if match_path:
+                target = (path[len(base) + 1:] if base else path).replace(os.sep, "/")
+            else:
+                target = path[path.rfind(os.sep) + 1:]
+            if not glob.match(target):
+                continue
+            if len(results) >= max_results:
+                truncated = True
+                break
+            if regex is None:
+                results.append({"path": path})
+                continue
+            if time.monotonic() > deadline:
+                timed_out = truncated = True
+                break
+            lines = self._grep(path, regex)
+            if lines:
+                results.append({"path": path, "matches": lines})
+
+        return {
+            "status": "success",
+            "pattern": pattern,
+            "content_regex": content_regex,
+            "results": results,
+            "truncated": truncated,
+            "timed_out": timed_out,
+            "indexed_files": len(self.files),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def _grep(self, path: str, regex: re.Pattern) -> list[dict]:
+        entry = self.files.get(path)
+        if entry is None or entry.size == 0 or entry.size > settings.file_search_max_file_bytes:
+            return []
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if b"\0" in mm[:BINARY_SNIFF_BYTES]:
+                    return []
+                data = mm[:].decode("utf-8", "replace") if isinstance(regex.pattern, str) else mm
+                return _match_lines(data, regex, settings.file_search_matches_per_file)
+        except (OSError, ValueError):
+            return []
+
+    def stats(self) -> dict:
+        return {
+            "roots": self.roots(),
+            "files": len(self.files),
+            "dirs": len(self.dirs),
+            "trigrams": len(self.postings),
+            "last_refresh_ms": self.refresh_ms,
+        }
+
+
+file_index = FileIndex()
@@ -0,0 +1,183 @@
+"""Record and replay LM Studio HTTP traffic.
+
+With `LLM_FIXTURE_MODE=record`, every chat completion request made through
+`get_llm` is forwarded to LM Studio and its response is saved, chunk by
+chunk with inter-chunk delays, to `LLM_FIXTURE_DIR`. This covers streamed
+tokens, `<think>` blocks and tool calls. With `LLM_FIXTURE_MODE=replay`, the
+same requests are answered from those files without contacting LM Studio.
+Replay runs at the recorded pace divided by `LLM_FIXTURE_SPEED`; a speed of
+0 means no delays at all.
+
+Fixtures are keyed by a hash of the request path and JSON body. A replayed
+run must therefore send exactly the same prompts, including tool outputs.
+"""
+import asyncio
+import codecs
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable
+
+import httpx
+
+from config import settings
+
+
+class FixtureNotFound(httpx.TransportError):
+    """Replay mode got a request that was never recorded."""
+
+
+def fixture_key(request: httpx.Request) -> str:
+    try:
+        body = json.dumps(json.loads(request.content), sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        body = request.content.decode("utf-8", "replace")
+    digest = hashlib.sha256(f"{request.url.path}\n{body}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def write_fixture(directory: Path, request: httpx.Request, status: int,
+                  content_type: str, chunks: list[list]) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    try:
+        body = json.loads(request.content)
+    except ValueError:
+        body = request.content.decode("utf-8", "replace")
+    path = directory / f"{fixture_key(request)}.json"
+    path.write_text(json.dumps({
+        "request": {"method": request.method, "path": request.url.path, "body": body},
+        "status": status,
+        "content_type": content_type,
+        # [seconds since previous chunk, text]
+        "chunks": chunks,
+    }, indent=1, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+# --- Record ---
+
+class _RecordingStream(httpx.AsyncByteStream):
+    def __init__(self, inner: httpx.AsyncByteStream, on_complete: Callable[[list[list]], None]):
+        self.inner = inner
+        self.on_complete = on_complete
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        chunks: list[list] = []
+        last = time.perf_counter()
+        async for chunk in self.inner:
+            now = time.perf_counter()
+            chunks.append([round(now - last, 4), decoder.decode(chunk)])
+            last = now
+            yield chunk
+        # Only complete responses are saved; an aborted stream leaves no fixture
+        self.on_complete(chunks)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forwards requests to LM Studio and saves each response as a fixture."""
+
+    def __init__(self, directory: str | Path, inner: httpx.AsyncBaseTransport | None = None):
+        self.directory = Path(directory)
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        # Fixtures store text, so ask for an unencoded body
+        request.headers["Accept-Encoding"] = "identity"
+        response = await self.inner.handle_async_request(request)
+        content_type = response.headers.get("content-type", "application/json")
+
+        def save(chunks: list[list]) -> None:
+            path = write_fixture(self.directory, request, response.status_code, content_type, chunks)
+            print(f"[FIXTURES] Recorded {request.url.path} -> {path.name}")
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, save),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+# --- Replay ---
+
+class _ReplayStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[list], speed: float):
+        self.chunks = chunks
+        self.speed = speed
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for delay, text in self.chunks:
+            if self.speed > 0 and delay > 0:
+                await asyncio.sleep(delay / self.speed)
+            yield text.encode("utf-8")
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Answers requests from recorded fixtures, never touching the network."""
+
+    def __init__(self, directory: str | Path, speed: float = 1.0):
+        self.directory = Path(directory)
+        self.speed = speed
+        self._cache: dict[str, dict] = {}
+
+    def _load(self, key: str) -> dict | None:
+        if key not in self._cache:
+            path = self.directory / f"{key}.json"
+            if not path.exists():
+                return None
+            self._cache[key] = json.loads(path.read_text(encoding="utf-8"))
+        return self._cache[key]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        key = fixture_key(request)
+        fixture = self._load(key)
+        if fixture is None:
+            raise FixtureNotFound(
+                f"No fixture {key}.json in {self.directory} for {request.method} {request.url.path}",
+                request=request,
+            )
+        return httpx.Response(
+            status_code=fixture["status"],
+            headers={"content-type": fixture["content_type"]},
+            stream=_ReplayStream(fixture["chunks"], self.speed),
+        )
+
+
+# --- get_llm integration ---
+
+_clients: dict[tuple, httpx.AsyncClient] = {}
+_replay_transports: list[ReplayTransport] = []
+
+
+def fixture_http_client() -> httpx.AsyncClient | None:
+    """HTTP client for ChatOpenAI in record/replay mode, or None for the default."""
+    mode = settings.llm_fixture_mode
+    if mode == "off":
+        return None
+    cache_key = (mode, settings.llm_fixture_dir, settings.llm_fixture_speed)
+    if cache_key not in _clients:
+        if mode == "record":
+            transport: httpx.AsyncBaseTransport = RecordingTransport(settings.llm_fixture_dir)
+        else:
+            transport = ReplayTransport(settings.llm_fixture_dir, settings.llm_fixture_speed)
+            _replay_transports.append(transport)
+        # ChatOpenAI sets its own per-request timeout
+        _clients[cache_key] = httpx.AsyncClient(transport=transport, timeout=600.0)
+    return _clients[cache_key]
+
+
+def fixture_cache_stats() -> dict:
+    return {
+        "clients": len(_clients),
+        "replay_fixtures_cached": sum(len(t._cache) for t in _replay_transports),
+    }
@@ -2,7 +2,10 @@ import asyncio
 import json
 import platform
 import re
-from typing import AsyncIterator, TypedDict, Literal
+import time
+from collections import Counter
+from contextlib import aclosing, contextmanager
+from typing import Annotated, AsyncIterator, TypedDict, Literal
 
 from langchain_core.messages import (
     AnyMessage,
@@ -10,29 +13,76 @@ from langchain_core.messages import (
     AIMessage,
     SystemMessage,
     ToolMessage,
+    RemoveMessage,
 )
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
+from langgraph.graph.message import add_messages
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import StreamWriter
 
 from config import settings
-from tools import ALL_TOOLS, web_search, terminal_execute
+from tools import ALL_TOOLS, web_search, terminal_execute, file_search
+from filesearch import file_index
+from router import follows_tool_turn, route_message, record_decision
+from payloads import payloads
+from fixtures import fixture_http_client
+from prefetch import speculative_search
+from summarizer import summarize
+
+# --- Housekeeping prompts (shared with tiers.py) ---
+
+TITLE_SYSTEM_PROMPT = (
+    "You are a title generator. "
+    "Reply with ONLY the title text, maximum 6 words. "
+    "No quotes, no explanation, no tags, no punctuation at the end."
+)
+TITLE_USER_PROMPT = (
+    "Generate a short title for this message. "
+    "The title MUST be in the SAME language as the message.\n\n"
+    "Message: {message}"
+)
+SUMMARY_PROMPT = (
+    "Summarize the following conversation history concisely, "
+    "preserving key facts and context:\n\n{history}"
+)
 
 
 # --- State ---
 
+def merge_tool_log(existing: list[dict], new: list[dict]) -> list[dict]:
+    """Append new tool log entries; an entry with a known id replaces the old one."""
+    merged = list(existing)
+    index = {entry.get("id"): i for i, entry in enumerate(merged)}
+    for entry in new:
+        i = index.get(entry.get("id"))
+        if i is None:
+            merged.append(entry)
+        else:
+            merged[i] = entry
+    return merged
+
+
 class GraphState(TypedDict):
-    messages: list[AnyMessage]
+    """Graph state. Nodes return only the keys they change.
+
+    `messages` and `tool_calls_log` are reduced (appended / upserted by id)
+    instead of rewritten, so a step never copies the history. Images and
+    long tool outputs live in the payload store; the state holds references.
+    """
+    messages: Annotated[list[AnyMessage], add_messages]
     new_message: str
-    image_base64: str | None
+    image_ref: str | None
     image_media_type: str | None
     message_type: Literal["simple", "summary_request", "system_instruction"]
+    tool_route: Literal["tools", "no_tools", "uncertain"]
     history_compressed: bool
     model: str
     thinking_mode: bool
     web_search: bool
     terminal_access: bool
-    tool_calls_log: list[dict]
+    tool_calls_log: Annotated[list[dict], merge_tool_log]
     tool_call_iterations: int
     has_pending_terminal: bool
 
@@ -46,6 +96,8 @@ def get_enabled_tools(state: dict) -> list:
         tools.append(web_search)
     if state.get("terminal_access"):
         tools.append(terminal_execute)
+        if settings.file_search_roots:
+            tools.append(file_search)
     return tools
 
 
@@ -54,17 +106,122 @@ def has_tools_enabled(state: dict) -> bool:
     return bool(state.get("web_search") or state.get("terminal_access"))
 
 
-def get_llm(model: str, temperature: float = 0.7, streaming: bool = False) -> ChatOpenAI:
+def uses_tool_loop(state: dict) -> bool:
+    """True if this turn goes through the ReAct loop rather than plain streaming.
+
+    Turns the pre-router classified as not needing tools skip tool binding
+    even when tool modes are on.
+    """
+    return (
+        has_tools_enabled(state)
+        and settings.tools_enabled
+        and state.get("tool_route") != "no_tools"
+    )
+
+
+def get_llm(
+    model: str,
+    temperature: float = 0.7,
+    streaming: bool = False,
+    base_url: str | None = None,
+    timeout: float = 120,
+) -> ChatOpenAI:
     return ChatOpenAI(
-        base_url=settings.lm_studio_url,
+        base_url=base_url or settings.lm_studio_url,
         api_key="lm-studio",
         model=model,
         temperature=temperature,
         streaming=streaming,
-        request_timeout=120,
+        request_timeout=timeout,
+        http_async_client=fixture_http_client(),
     )
 
 
+# LLM calls currently running, per model
+_in_flight: Counter[str] = Counter()
+
+
+@contextmanager
+def _track(llm: ChatOpenAI):
+    _in_flight[llm.model_name] += 1
+    try:
+        yield
+    finally:
+        _in_flight[llm.model_name] -= 1
+
+
+def model_busy(model: str) -> bool:
+    """True while another call is generating on `model`; a new request would queue behind it."""
+    return _in_flight[model] > 0
+
+
+async def _invoke(llm: ChatOpenAI, msgs: list[AnyMessage], tools: list | None = None) -> AIMessage:
+    with _track(llm):
+        if not tools:
+            return await llm.ainvoke(msgs)
+        try:
+            return await llm.bind_tools(tools).ainvoke(msgs)
+        except Exception as e:
+            print(f"[CALL_MODEL] Tool binding failed, falling back: {e}")
+            return await llm.ainvoke(msgs)
+
+
+# After a failure the auxiliary model is skipped for a while instead of
+# paying its timeout on every housekeeping call.
+_aux_unavailable_until = 0.0
+
+
+def aux_model_for(task: str) -> str | None:
+    """Return the auxiliary model to use for `task`, if one applies right now."""
+    if not settings.aux_model or task not in settings.aux_tasks:
+        return None
+    if time.monotonic() < _aux_unavailable_until:
+        return None
+    return settings.aux_model
+
+
+async def invoke_housekeeping(
+    task: str,
+    main_model: str,
+    msgs: list[AnyMessage],
+    temperature: float = 0.7,
+    tools: list | None = None,
+) -> AIMessage:
+    """Run a housekeeping call (title, summary, tool decision) on the
+    auxiliary model, falling back to the user's main model."""
+    global _aux_unavailable_until
+
+    aux_model = aux_model_for(task)
+    if aux_model:
+        llm = get_llm(
+            aux_model, temperature,
+            base_url=settings.aux_lm_studio_url,
+            timeout=settings.aux_timeout_seconds,
+        )
+        try:
+            return await _invoke(llm, msgs, tools)
+        except Exception as e:
+            _aux_unavailable_until = time.monotonic() + settings.aux_retry_after_seconds
+            print(f"[AUX] {aux_model} failed for {task}, falling back to {main_model}: {e}")
+
+    return await _invoke(get_llm(main_model, temperature), msgs, tools)
+
+
+async def astream_tokens(llm: ChatOpenAI, msgs: list[AnyMessage]) -> AsyncIterator[str]:
+    """Yield non-empty content tokens from a streaming LLM call.
+
+    The upstream stream is closed explicitly when the consumer stops or is
+    cancelled, so LM Studio stops generating right away instead of whenever
+    the abandoned generator gets garbage collected.
+    """
+    with _track(llm):
+        async with aclosing(llm.astream(msgs)) as stream:
+            async for chunk in stream:
+                token = chunk.content or ""
+                if token:
+                    yield token
+
+
 def estimate_tokens(messages: list[AnyMessage]) -> int:
     total = 0
     for m in messages:
@@ -77,6 +234,18 @@ def estimate_tokens(messages: list[AnyMessage]) -> int:
     return total // 4
 
 
+def file_search_hint() -> str:
+    if not settings.file_search_roots:
+        return ""
+    what = "name or content" if settings.file_search_content else "name"
+    return (
+        f" To locate files by {what}, use the file_search tool instead "
+        "of find, grep, dir /s or Get-ChildItem -Recurse: it answers from an index "
+        "in milliseconds and needs no approval. It covers these folders: "
+        + ", ".join(file_index.roots()) + "."
+    )
+
+
 def build_system_prompt(
     message_type: str,
     thinking_mode: bool,
@@ -123,7 +292,8 @@ def build_system_prompt(
             "timeout scanning thousands of files. Always scope commands to specific "
             "folders. If the user asks about a broad location, list the top-level "
             "first, then drill down into specific subdirectories as needed. "
-            + os_hint +
+            + os_hint
+            + file_search_hint() +
             " IMPORTANT: If a command fails or returns an error, do NOT give up. "
             "Analyze the error, fix the command, and try again with the corrected version. "
             "Only explain the error to the user if you have exhausted all alternatives."
@@ -158,6 +328,27 @@ def build_user_content(
     ]
 
 
+def state_user_content(state: dict) -> list[dict] | str:
+    """Build the user's turn from state, resolving the image reference."""
+    return build_user_content(
+        state["new_message"],
+        payloads.resolve(state.get("image_ref")),
+        state.get("image_media_type"),
+    )
+
+
+def resolve_payloads(messages: list[AnyMessage]) -> list[AnyMessage]:
+    """Swap tool output references for their content before an LLM call."""
+    resolved: list[AnyMessage] = []
+    for m in messages:
+        if isinstance(m, ToolMessage):
+            content = payloads.resolve(m.content)
+            if content is not m.content:
+                m = m.model_copy(update={"content": content})
+        resolved.append(m)
+    return resolved
+
+
 def build_llm_messages(state: dict) -> list[AnyMessage]:
     """Build the full message list for the LLM call from state."""
     system_prompt = build_system_prompt(
@@ -166,21 +357,16 @@ def build_llm_messages(state: dict) -> list[AnyMessage]:
         state.get("web_search", False),
         state.get("terminal_access", False),
     )
-    user_content = build_user_content(
-        state["new_message"],
-        state.get("image_base64"),
-        state.get("image_media_type"),
-    )
 
     msgs: list[AnyMessage] = [SystemMessage(content=system_prompt)]
-    msgs.extend(state["messages"])
-    msgs.append(HumanMessage(content=user_content))
+    msgs.extend(resolve_payloads(state["messages"]))
+    msgs.append(HumanMessage(content=state_user_content(state)))
     return msgs
 
 
 # --- Nodes ---
 
-def node_pre_process(state: GraphState) -> GraphState:
+def node_pre_process(state: GraphState) -> dict:
     msg = state["new_message"].lower()
 
     summary_keywords = ["resumo", "resume", "summarize", "summary", "tldr", "tl;dr"]
@@ -196,70 +382,108 @@ def node_pre_process(state: GraphState) -> GraphState:
     else:
         message_type = "simple"
 
-    return {**state, "message_type": message_type}
+    tool_route = "uncertain"
+    if has_tools_enabled(state) and settings.tools_enabled and settings.tool_router_enabled:
+        decision = route_message(
+            state["new_message"], state.get("web_search", False), state.get("terminal_access", False),
+            follows_tool_turn(state["messages"]),
+        )
+        record_decision(decision)
+        tool_route = decision["route"]
+
+    return {"message_type": message_type, "tool_route": tool_route}
 
 
-def node_check_history(state: GraphState) -> GraphState:
+def node_check_history(state: GraphState) -> dict:
     compressed = estimate_tokens(state["messages"]) > settings.max_history_tokens
-    return {**state, "history_compressed": compressed}
+    return {"history_compressed": compressed}
 
 
-async def node_compress_history(state: GraphState) -> GraphState:
-    history_text = "\n".join(
-        f"{m.type.upper()}: {m.content}"
-        for m in state["messages"]
-        if isinstance(m.content, str)
+def extractive_summary(messages: list[AnyMessage]) -> str:
+    return summarize(
+        [(m.type, m.content) for m in messages if isinstance(m.content, str)],
+        settings.extractive_summary_tokens,
     )
 
-    llm = get_llm(state["model"])
-    response = await llm.ainvoke([
-        HumanMessage(content=(
-            "Summarize the following conversation history concisely, "
-            f"preserving key facts and context:\n\n{history_text}"
-        )),
-    ])
 
-    summary = response.content or ""
+async def node_compress_history(state: GraphState) -> dict:
+    """Replace the history with a summary.
+
+    "llm" always asks the model, "extractive" never does, and "auto" asks
+    the model unless it is busy with another request, falling back to the
+    extractive summary if the call fails.
+    """
+    strategy = settings.compression_strategy
+    target_model = aux_model_for("compress") or state["model"]
+    if strategy == "auto" and model_busy(target_model):
+        print(f"[COMPRESS] {target_model} is busy, using extractive summary")
+        strategy = "extractive"
+
+    summary = ""
+    if strategy != "extractive":
+        history_text = "\n".join(
+            f"{m.type.upper()}: {m.content}"
+            for m in state["messages"]
+            if isinstance(m.content, str)
+        )
+        try:
+            response = await invoke_housekeeping("compress", state["model"], [
+                HumanMessage(content=SUMMARY_PROMPT.format(history=history_text)),
+            ])
+            summary = response.content or ""
+        except Exception as e:
+            if strategy == "llm":
+                raise
+            print(f"[COMPRESS] LLM summary failed, using extractive summary: {e}")
+
+    if not summary:
+        summary = extractive_summary(state["messages"])
 
     compressed: list[AnyMessage] = [
         HumanMessage(content=f"[Previous conversation summary: {summary}]"),
         AIMessage(content="Understood. I have the context from our previous conversation."),
     ]
 
-    return {**state, "messages": compressed, "history_compressed": True}
+    # The summary replaces the history: remove every message, then add it
+    removed = [RemoveMessage(id=m.id) for m in state["messages"]]
+    return {"messages": removed + compressed, "history_compressed": True}
 
 
-async def node_call_model(state: GraphState) -> GraphState:
+async def node_call_model(state: GraphState, config: RunnableConfig) -> dict:
     """Call the LLM, optionally with tools bound (non-streaming for tool detection)."""
     msgs = build_llm_messages(state)
-    llm = get_llm(state["model"])
 
-    enabled_tools = get_enabled_tools(state)
-    if enabled_tools and settings.tools_enabled:
-        try:
-            llm_with_tools = llm.bind_tools(enabled_tools)
-            response = await llm_with_tools.ainvoke(msgs)
-        except Exception as e:
-            print(f"[CALL_MODEL] Tool binding failed, falling back: {e}")
-            response = await llm.ainvoke(msgs)
-    else:
-        response = await llm.ainvoke(msgs)
+    # Opt-in: search speculatively while the model decides whether to search
+    if state.get("web_search") and state.get("tool_call_iterations", 0) == 0:
+        speculative_search.start(config["configurable"]["thread_id"], state["new_message"])
+
+    # The final answer is always streamed afresh by the main model, so this
+    # decision call can run on the auxiliary tier.
+    enabled_tools = get_enabled_tools(state) if settings.tools_enabled else []
+    response = await invoke_housekeeping(
+        "tool_decision", state["model"], msgs, tools=enabled_tools,
+    )
 
     return {
-        **state,
-        "messages": state["messages"] + [response],
+        "messages": [response],
         "tool_call_iterations": state.get("tool_call_iterations", 0) + 1,
     }
 
 
-async def node_tool_executor(state: GraphState) -> GraphState:
+async def node_tool_executor(state: GraphState, config: RunnableConfig, writer: StreamWriter) -> dict:
     """Execute tool calls from the last AIMessage.
 
+    Each call reports tool_start/tool_result through the custom stream as
+    it runs, so the client sees a fast search finish while a slow one in
+    the same step is still going.
+
     Terminal commands are NOT executed here — they are recorded as pending
     so the frontend can request user approval before actual execution.
     When a terminal command is found, the graph stops the ReAct loop
-    (via has_pending_terminal flag) to avoid duplicate calls.
+    (via has_pending_terminal flag); resume_after_terminal_approval later
+    fills in the results and continues from the checkpoint.
     """
+    thread_id = config["configurable"]["thread_id"]
     last_msg = state["messages"][-1]
     tool_messages: list[ToolMessage] = []
     log_entries: list[dict] = []
@@ -272,6 +496,7 @@ async def node_tool_executor(state: GraphState) -> GraphState:
             # Don't execute — record as pending for frontend approval
             pending = json.dumps({
                 "status": "pending_approval",
+                "tool_call_id": tc["id"],
                 "command": tc["args"].get("command", ""),
                 "working_directory": tc["args"].get("working_directory", "."),
             })
@@ -279,6 +504,7 @@ async def node_tool_executor(state: GraphState) -> GraphState:
                 ToolMessage(content=pending, tool_call_id=tc["id"])
             )
             log_entries.append({
+                "id": tc["id"],
                 "name": tc["name"],
                 "args": tc["args"],
                 "result": pending,
@@ -286,25 +512,37 @@ async def node_tool_executor(state: GraphState) -> GraphState:
             found_terminal = True
             continue
 
+        writer({"type": "tool_start", "content": json.dumps({"name": tc["name"], "args": tc["args"]})})
         tool_fn = tools_by_name.get(tc["name"])
-        if not tool_fn:
-            result = json.dumps({"status": "error", "message": f"Unknown tool: {tc['name']}"})
-        else:
-            result = await asyncio.to_thread(tool_fn.invoke, tc["args"])
-
+        result = None
+        if tc["name"] == "web_search":
+            # Reuse the speculative search if it covers this query
+            result = await speculative_search.take(thread_id, tc["args"])
+
+        if result is None:
+            if not tool_fn:
+                result = json.dumps({"status": "error", "message": f"Unknown tool: {tc['name']}"})
+            else:
+                # If the run is cancelled while waiting here, the worker thread is
+                # abandoned and its result discarded; nothing else waits on it.
+                result = await asyncio.to_thread(tool_fn.invoke, tc["args"])
+        writer({"type": "tool_result", "content": str(result)})
+
+        # Message and log entry share one stored copy of a long output
+        result_ref = payloads.wrap(thread_id, str(result))
         tool_messages.append(
-            ToolMessage(content=str(result), tool_call_id=tc["id"])
+            ToolMessage(content=result_ref, tool_call_id=tc["id"])
         )
         log_entries.append({
+            "id": tc["id"],
             "name": tc["name"],
             "args": tc["args"],
-            "result": str(result),
+            "result": result_ref,
         })
 
     return {
-        **state,
-        "messages": state["messages"] + tool_messages,
-        "tool_calls_log": state.get("tool_calls_log", []) + log_entries,
+        "messages": tool_messages,
+        "tool_calls_log": log_entries,
         "has_pending_terminal": found_terminal,
     }
 
@@ -336,21 +574,11 @@ def _clean_title(raw: str) -> str:
 
 async def generate_title_from_message(model: str, user_message: str) -> str:
     """Generate a title based solely on the user message."""
-    llm = get_llm(model, temperature=0.1)
-
     try:
-        response = await llm.ainvoke([
-            SystemMessage(content=(
-                "You are a title generator. "
-                "Reply with ONLY the title text, maximum 6 words. "
-                "No quotes, no explanation, no tags, no punctuation at the end."
-            )),
-            HumanMessage(content=(
-                "Generate a short title for this message. "
-                "The title MUST be in the SAME language as the message.\n\n"
-                f"Message: {user_message[:300]}"
-            )),
-        ])
+        response = await invoke_housekeeping("title", model, [
+            SystemMessage(content=TITLE_SYSTEM_PROMPT),
+            HumanMessage(content=TITLE_USER_PROMPT.format(message=user_message[:300])),
+        ], temperature=0.1)
         raw = response.content or ""
         title = _clean_title(raw)
     except Exception:
@@ -370,16 +598,16 @@ async def generate_title_from_message(model: str, user_message: str) -> str:
 def route_after_check(state: GraphState) -> str:
     if state["history_compressed"]:
         return "compress"
-    # If any tools are enabled, route to call_model node (non-streaming, with tools)
+    # If the turn may need tools, route to call_model node (non-streaming, with tools)
     # Otherwise, route to END so streaming happens outside the graph
-    if has_tools_enabled(state) and settings.tools_enabled:
+    if uses_tool_loop(state):
         return "call_model"
     return END
 
 
 def _route_after_compress(state: GraphState) -> str:
-    """After compressing history, go to call_model if tools enabled, otherwise END."""
-    if has_tools_enabled(state) and settings.tools_enabled:
+    """After compressing history, go to call_model if the turn may need tools, otherwise END."""
+    if uses_tool_loop(state):
         return "call_model"
     return END
 
@@ -391,14 +619,15 @@ def route_after_tool(state: GraphState) -> str:
     return "call_model"
 
 
+def wants_tool_calls(message: AnyMessage, iterations: int) -> bool:
+    """True if the model asked for tools and the iteration budget allows it."""
+    return bool(getattr(message, "tool_calls", None)) and iterations < settings.tool_call_max_iterations
+
+
 def route_after_model(state: GraphState) -> str:
     """Route after LLM call: if tool_calls present, go to tool_node; otherwise END."""
-    last_msg = state["messages"][-1]
-    if (
-        has_tools_enabled(state)
-        and hasattr(last_msg, "tool_calls")
-        and last_msg.tool_calls
-        and state.get("tool_call_iterations", 0) < settings.tool_call_max_iterations
+    if has_tools_enabled(state) and wants_tool_calls(
+        state["messages"][-1], state.get("tool_call_iterations", 0),
     ):
         return "tool_node"
     return END
@@ -457,8 +686,252 @@ def build_graph():
 compiled_graph = build_graph()
 
 
+def discard_thread(thread_id: str) -> None:
+    """Drop every checkpoint, pending write and payload stored for a thread."""
+    memory.delete_thread(thread_id)
+    payloads.discard_thread(thread_id)
+    speculative_search.finish(thread_id)
+
+
+def _serialized_size(value) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_serialized_size(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_serialized_size(v) for v in value.values())
+    return 0
+
+
+def checkpoint_size(thread_id: str, saver: MemorySaver = memory) -> int:
+    """Serialized bytes held by the checkpointer for a thread."""
+    total = _serialized_size(saver.storage.get(thread_id, {}))
+    total += sum(_serialized_size(v) for k, v in saver.writes.items() if k[0] == thread_id)
+    total += sum(_serialized_size(v) for k, v in saver.blobs.items() if k[0] == thread_id)
+    return total
+
+
+def checkpoint_stats(saver: MemorySaver = memory) -> dict[str, dict]:
+    """Checkpoint count and serialized bytes for every thread, in one pass."""
+    threads: dict[str, dict] = {}
+    for thread_id, namespaces in saver.storage.items():
+        threads[thread_id] = {
+            "checkpoints": sum(len(c) for c in namespaces.values()),
+            "bytes": _serialized_size(namespaces),
+        }
+    for table in (saver.writes, saver.blobs):
+        for key, value in table.items():
+            entry = threads.setdefault(key[0], {"checkpoints": 0, "bytes": 0})
+            entry["bytes"] += _serialized_size(value)
+    return threads
+
+
 # --- Main streaming interface ---
 
+def format_event(event_type: str, content: str | None = None) -> str:
+    """Encode one SSE event in the shape the frontend expects."""
+    event = {"type": event_type}
+    if content is not None:
+        event["content"] = content
+    return f"data: {json.dumps(event)}\n\n"
+
+
+class ThinkTagFilter:
+    """Incrementally strips <think>...</think> blocks from streamed tokens."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.inside_think = False
+
+    def feed(self, token: str) -> list[str]:
+        """Add a token and return the text that is safe to emit so far."""
+        self.buffer += token
+        out: list[str] = []
+
+        while True:
+            if self.inside_think:
+                close = self.buffer.find("</think")
+                if close == -1:
+                    self.buffer = ""
+                    break
+                tag_end = self.buffer.find(">", close)
+                if tag_end == -1:
+                    break
+                self.buffer = self.buffer[tag_end + 1:]
+                self.inside_think = False
+            else:
+                open_pos = self.buffer.find("<think")
+                if open_pos == -1:
+                    if self.buffer:
+                        out.append(self.buffer)
+                        self.buffer = ""
+                    break
+                before = self.buffer[:open_pos]
+                if before:
+                    out.append(before)
+                tag_end = self.buffer.find(">", open_pos)
+                if tag_end == -1:
+                    self.buffer = self.buffer[open_pos:]
+                    break
+                self.buffer = self.buffer[tag_end + 1:]
+                self.inside_think = True
+
+        return out
+
+    def flush(self) -> str:
+        """Return whatever visible text is still buffered at end of stream."""
+        rest = "" if self.inside_think else self.buffer
+        self.buffer = ""
+        return rest
+
+
+async def stream_answer(
+    llm: ChatOpenAI,
+    msgs: list[AnyMessage],
+    thinking_mode: bool,
+) -> AsyncIterator[str]:
+    """Stream token events, hiding <think> blocks unless thinking_mode is on."""
+    think_filter = None if thinking_mode else ThinkTagFilter()
+
+    async for token in astream_tokens(llm, msgs):
+        if think_filter is None:
+            yield format_event("token", token)
+            continue
+        for text in think_filter.feed(token):
+            yield format_event("token", text)
+
+    if think_filter is not None:
+        rest = think_filter.flush()
+        if rest:
+            yield format_event("token", rest)
+
+
+def _pending_terminal_call(message: AnyMessage) -> dict | None:
+    """Return the pending command recorded in a ToolMessage, if any."""
+    if not isinstance(message, ToolMessage) or not isinstance(message.content, str):
+        return None
+    try:
+        data = json.loads(payloads.resolve(message.content))
+    except ValueError:
+        return None
+    if isinstance(data, dict) and data.get("status") == "pending_approval":
+        return data
+    return None
+
+
+async def _graph_events(graph_input: dict | None, config: dict) -> AsyncIterator[str]:
+    """Drive the graph step by step, emitting progress as each node finishes.
+
+    Each update holds only what the node returned (its delta); tool_node
+    also writes per-call events to the custom stream while it runs.
+    Passing `graph_input=None` continues the run stored in the thread's
+    checkpoint instead of starting a new one.
+    """
+    async for mode, chunk in compiled_graph.astream(graph_input, config=config, stream_mode=["updates", "custom"]):
+        if mode == "custom":
+            yield format_event(chunk["type"], chunk.get("content"))
+            continue
+        for node_name, values in chunk.items():
+            if not values:
+                continue
+            yield format_event("status", node_name)
+
+            if node_name == "pre_process":
+                yield format_event("message_type", values["message_type"])
+
+            elif node_name == "check_history" and values.get("history_compressed"):
+                yield format_event("compressing")
+
+            elif node_name == "tool_node":
+                # Other tools already reported through the custom stream
+                for entry in values.get("tool_calls_log", []):
+                    if entry["name"] != "terminal_execute":
+                        continue
+                    result_data = json.loads(payloads.resolve(entry["result"]))
+                    if result_data.get("status") == "pending_approval":
+                        # Emit pending event — frontend must approve before execution
+                        yield format_event("terminal_pending", json.dumps({
+                            "tool_call_id": entry.get("id"),
+                            "command": result_data["command"],
+                            "working_directory": result_data.get("working_directory", "."),
+                        }))
+
+
+async def _stream_final_answer(state: dict) -> AsyncIterator[str]:
+    """Stream the user-facing answer once the graph run has finished."""
+    message_type = state.get("message_type", "simple")
+    thinking_mode = state.get("thinking_mode", False)
+    web_search_on = state.get("web_search", False)
+    terminal_on = state.get("terminal_access", False)
+    user_content = state_user_content(state)
+
+    if not uses_tool_loop(state):
+        # --- Normal streaming path (no tools, or the pre-router ruled them out) ---
+        # The graph ran only pre-processing (pre_process, check_history, compress).
+        if thinking_mode:
+            yield format_event("thinking_start")
+
+        stream_msgs: list[AnyMessage] = [SystemMessage(content=build_system_prompt(message_type, thinking_mode))]
+        stream_msgs.extend(state["messages"])
+        stream_msgs.append(HumanMessage(content=user_content))
+
+    elif state.get("has_pending_terminal"):
+        # Terminal commands need user approval — don't stream the answer yet.
+        # The frontend resumes this run via /chat/terminal/resume.
+        yield format_event("done")
+        return
+
+    elif state.get("tool_calls_log"):
+        # Tool calls were made — stream a fresh response.
+        # We flatten the conversation to avoid sending AIMessage(tool_calls)
+        # and ToolMessage to the LLM, which causes jinja template errors
+        # in models that don't have tool-role templates.
+        tool_context = "\n\n".join(
+            f"[Tool call: {entry['name']}({entry['args']})]\n{payloads.resolve(entry['result'])}"
+            for entry in state["tool_calls_log"]
+        )
+        stream_msgs = [
+            SystemMessage(content=build_system_prompt(
+                message_type, thinking_mode,
+                web_search=web_search_on, terminal_access=terminal_on,
+            ))
+        ]
+        # Keep only HumanMessage/AIMessage from history (skip tool messages)
+        for m in state["messages"]:
+            if isinstance(m, (HumanMessage, AIMessage)) and not getattr(m, "tool_calls", None):
+                stream_msgs.append(m)
+        # Inject tool results as context, then the user's question
+        stream_msgs.append(SystemMessage(content=(
+            "The following tool results were retrieved. "
+            "Use them to answer the user's question:\n\n" + tool_context
+        )))
+        stream_msgs.append(HumanMessage(content=user_content))
+
+    else:
+        # No tool calls were made (model answered directly even with tools available).
+        # Stream a fresh response so the user sees real token-by-token output.
+        if thinking_mode:
+            yield format_event("thinking_start")
+
+        history = state["messages"]
+        if history and isinstance(history[-1], AIMessage):
+            history = history[:-1]
+        stream_msgs = [
+            SystemMessage(content=build_system_prompt(
+                message_type, thinking_mode,
+                web_search=web_search_on, terminal_access=terminal_on,
+            ))
+        ]
+        stream_msgs.extend(history)
+        stream_msgs.append(HumanMessage(content=user_content))
+
+    llm = get_llm(state["model"], streaming=True)
+    async for chunk in stream_answer(llm, stream_msgs, thinking_mode):
+        yield chunk
+
+    yield format_event("done")
+
+
 async def stream_graph_response(
     thread_id: str,
     messages: list[dict],
@@ -480,12 +953,17 @@ async def stream_graph_response(
 
     history = [deserialize(m) for m in messages]
 
+    # Each turn starts from the history the client sent; checkpoints left by
+    # the previous turn would otherwise be merged into it by the reducers.
+    discard_thread(thread_id)
+
     initial_state = {
         "messages": history,
         "new_message": new_message,
-        "image_base64": image_base64,
+        "image_ref": payloads.put(thread_id, image_base64, kind="image") if image_base64 else None,
         "image_media_type": image_media_type,
         "message_type": "simple",
+        "tool_route": "uncertain",
         "history_compressed": False,
         "model": model,
         "thinking_mode": thinking_mode,
@@ -498,201 +976,75 @@ async def stream_graph_response(
 
     config = {"configurable": {"thread_id": thread_id}}
 
-    # Emit compressing event if history will need compression
-    if estimate_tokens(history) > settings.max_history_tokens:
-        yield f"data: {json.dumps({'type': 'compressing'})}\n\n"
-
-    # Run the graph
-    final_state = await compiled_graph.ainvoke(initial_state, config=config)
-
-    message_type = final_state.get("message_type", "simple")
-    yield f"data: {json.dumps({'type': 'message_type', 'content': message_type})}\n\n"
-
-    tools_active = (web_search or terminal_access) and settings.tools_enabled
-    if tools_active:
-        # --- Tools path ---
-        # The graph executed the full ReAct loop (call_model ↔ tool_node).
-        # Emit tool events to the frontend, then stream the final answer.
-
-        tool_log = final_state.get("tool_calls_log", [])
-        has_pending_terminal = final_state.get("has_pending_terminal", False)
-
-        for entry in tool_log:
-            if entry["name"] == "terminal_execute":
-                result_data = json.loads(entry["result"]) if isinstance(entry["result"], str) else entry["result"]
-                if result_data.get("status") == "pending_approval":
-                    # Emit pending event — frontend must approve before execution
-                    yield f"data: {json.dumps({'type': 'terminal_pending', 'content': json.dumps({'command': result_data['command'], 'working_directory': result_data.get('working_directory', '.')})})}\n\n"
-                    continue
-            yield f"data: {json.dumps({'type': 'tool_start', 'content': json.dumps({'name': entry['name'], 'args': entry['args']})})}\n\n"
-            yield f"data: {json.dumps({'type': 'tool_result', 'content': entry['result']})}\n\n"
-
-        if has_pending_terminal:
-            # Terminal commands need user approval — don't stream final answer yet.
-            # The frontend will call /chat/terminal/execute, get the result,
-            # then make a follow-up chat request with the tool context injected.
-            pass
-        elif tool_log:
-            # Tool calls were made — stream a fresh response.
-            # We flatten the conversation to avoid sending AIMessage(tool_calls)
-            # and ToolMessage to the LLM, which causes jinja template errors
-            # in models that don't have tool-role templates.
-            tool_context = "\n\n".join(
-                f"[Tool call: {entry['name']}({entry['args']})]\n{entry['result']}"
-                for entry in tool_log
-            )
-            stream_msgs: list[AnyMessage] = [
-                SystemMessage(content=build_system_prompt(
-                    message_type, thinking_mode,
-                    web_search=web_search, terminal_access=terminal_access,
-                ))
-            ]
-            # Keep only HumanMessage/AIMessage from history (skip tool messages)
-            for m in final_state["messages"]:
-                if isinstance(m, (HumanMessage, AIMessage)) and not getattr(m, "tool_calls", None):
-                    stream_msgs.append(m)
-            # Inject tool results as context, then the user's question
-            stream_msgs.append(SystemMessage(content=(
-                "The following tool results were retrieved. "
-                "Use them to answer the user's question:\n\n" + tool_context
-            )))
-            stream_msgs.append(HumanMessage(content=build_user_content(
-                new_message, image_base64, image_media_type,
-            )))
-
-            llm = get_llm(model, streaming=True)
-            async for chunk in llm.astream(stream_msgs):
-                token = chunk.content or ""
-                if token:
-                    yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
-        else:
-            # No tool calls were made (model answered directly even with tools available).
-            # Stream a fresh response so the user sees real token-by-token output.
-            if thinking_mode:
-                yield f"data: {json.dumps({'type': 'thinking_start'})}\n\n"
-
-            stream_msgs: list[AnyMessage] = [
-                SystemMessage(content=build_system_prompt(
-                    message_type, thinking_mode,
-                    web_search=web_search, terminal_access=terminal_access,
-                ))
-            ]
-            stream_msgs.extend(history)
-            stream_msgs.append(HumanMessage(content=build_user_content(
-                new_message, image_base64, image_media_type,
-            )))
-
-            llm = get_llm(model, streaming=True)
-
-            emit_buffer = ""
-            inside_think = False
-
-            async for chunk in llm.astream(stream_msgs):
-                token = chunk.content or ""
-                if not token:
-                    continue
-
-                if thinking_mode:
-                    yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
-                    continue
-
-                # Filter <think>...</think> blocks when thinking_mode is off
-                emit_buffer += token
-
-                while True:
-                    if inside_think:
-                        close = emit_buffer.find("</think")
-                        if close == -1:
-                            emit_buffer = ""
-                            break
-                        tag_end = emit_buffer.find(">", close)
-                        if tag_end == -1:
-                            break
-                        emit_buffer = emit_buffer[tag_end + 1:]
-                        inside_think = False
-                    else:
-                        open_pos = emit_buffer.find("<think")
-                        if open_pos == -1:
-                            if emit_buffer:
-                                yield f"data: {json.dumps({'type': 'token', 'content': emit_buffer})}\n\n"
-                                emit_buffer = ""
-                            break
-                        before = emit_buffer[:open_pos]
-                        if before:
-                            yield f"data: {json.dumps({'type': 'token', 'content': before})}\n\n"
-                        tag_end = emit_buffer.find(">", open_pos)
-                        if tag_end == -1:
-                            emit_buffer = emit_buffer[open_pos:]
-                            break
-                        emit_buffer = emit_buffer[tag_end + 1:]
-                        inside_think = True
-
-            if not thinking_mode and emit_buffer and not inside_think:
-                yield f"data: {json.dumps({'type': 'token', 'content': emit_buffer})}\n\n"
-
-        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+    async for chunk in _graph_events(initial_state, config):
+        yield chunk
+    speculative_search.finish(thread_id)
 
-    else:
-        # --- Normal streaming path (no tools) ---
-        # The graph ran only pre-processing (pre_process, check_history, compress).
-        # Now stream the LLM response with real-time token delivery.
+    final_state = (await compiled_graph.aget_state(config)).values
+    async for chunk in _stream_final_answer(final_state):
+        yield chunk
 
-        if thinking_mode:
-            yield f"data: {json.dumps({'type': 'thinking_start'})}\n\n"
 
-        system_prompt = build_system_prompt(message_type, thinking_mode)
-        user_content = build_user_content(new_message, image_base64, image_media_type)
+async def resume_after_terminal_approval(
+    thread_id: str,
+    decisions: dict[str, bool],
+) -> AsyncIterator[str]:
+    """Continue a turn that stopped to wait for terminal approval.
 
-        stream_msgs: list[AnyMessage] = [SystemMessage(content=system_prompt)]
-        stream_msgs.extend(final_state["messages"])
-        stream_msgs.append(HumanMessage(content=user_content))
+    Approved commands are executed and rejected ones answered with a
+    denial; the results replace the pending ToolMessages in the thread's
+    checkpoint as if tool_node had produced them, and the ReAct loop picks
+    up from there without re-running pre-processing or earlier model calls.
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    state = (await compiled_graph.aget_state(config)).values
 
-        llm = get_llm(model, streaming=True)
+    if not state.get("has_pending_terminal"):
+        yield format_event("error", "No terminal command is awaiting approval in this conversation")
+        return
 
-        emit_buffer = ""
-        inside_think = False
+    replacements: list[ToolMessage] = []
+    log_updates: list[dict] = []
+    log_by_id = {entry.get("id"): entry for entry in state.get("tool_calls_log", [])}
 
-        async for chunk in llm.astream(stream_msgs):
-            token = chunk.content or ""
-            if not token:
-                continue
+    for message in state["messages"]:
+        pending = _pending_terminal_call(message)
+        if pending is None:
+            continue
 
-            if thinking_mode:
-                yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
-                continue
+        args = {
+            "command": pending["command"],
+            "working_directory": pending.get("working_directory", "."),
+        }
+        yield format_event("tool_start", json.dumps({"name": "terminal_execute", "args": args}))
+
+        if decisions.get(message.tool_call_id):
+            result = await asyncio.to_thread(terminal_execute.invoke, args)
+        else:
+            result = json.dumps({
+                "status": "denied",
+                "command": args["command"],
+                "message": "Command rejected by user",
+            })
+        yield format_event("tool_result", result)
+
+        # Same message id and log entry id: the reducers replace them in place
+        result_ref = payloads.wrap(thread_id, result)
+        replacements.append(ToolMessage(content=result_ref, tool_call_id=message.tool_call_id, id=message.id))
+        entry = log_by_id.get(message.tool_call_id)
+        if entry is not None:
+            log_updates.append({**entry, "result": result_ref})
+
+    await compiled_graph.aupdate_state(
+        config,
+        {"messages": replacements, "tool_calls_log": log_updates, "has_pending_terminal": False},
+        as_node="tool_node",
+    )
+
+    async for chunk in _graph_events(None, config):
+        yield chunk
+    speculative_search.finish(thread_id)
 
-            # Filter <think>...</think> blocks when thinking_mode is off
-            emit_buffer += token
-
-            while True:
-                if inside_think:
-                    close = emit_buffer.find("</think")
-                    if close == -1:
-                        emit_buffer = ""
-                        break
-                    tag_end = emit_buffer.find(">", close)
-                    if tag_end == -1:
-                        break
-                    emit_buffer = emit_buffer[tag_end + 1:]
-                    inside_think = False
-                else:
-                    open_pos = emit_buffer.find("<think")
-                    if open_pos == -1:
-                        if emit_buffer:
-                            yield f"data: {json.dumps({'type': 'token', 'content': emit_buffer})}\n\n"
-                            emit_buffer = ""
-                        break
-                    before = emit_buffer[:open_pos]
-                    if before:
-                        yield f"data: {json.dumps({'type': 'token', 'content': before})}\n\n"
-                    tag_end = emit_buffer.find(">", open_pos)
-                    if tag_end == -1:
-                        emit_buffer = emit_buffer[open_pos:]
-                        break
-                    emit_buffer = emit_buffer[tag_end + 1:]
-                    inside_think = True
-
-        if not thinking_mode and emit_buffer and not inside_think:
-            yield f"data: {json.dumps({'type': 'token', 'content': emit_buffer})}\n\n"
-
-        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+    final_state = (await compiled_graph.aget_state(config)).values
+    async for chunk in _stream_final_answer(final_state):
+        yield chunk
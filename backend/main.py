@@ -1,21 +1,52 @@
+import asyncio
 import json
+from contextlib import asynccontextmanager
+
 import httpx
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 
 from config import settings
 from schemas import (
     ChatRequest, TitleRequest, TitleResponse, ErrorResponse,
-    TerminalExecuteRequest, TerminalExecuteResponse,
+    TerminalResumeRequest,
+)
+from graph import (
+    stream_graph_response, generate_title_from_message, resume_after_terminal_approval,
 )
-from graph import stream_graph_response, generate_title_from_message
-from tools import execute_terminal_command
+from streams import stream_registry
+from batch import parse_jobs, run_batch
+from router import router_stats
+from prefetch import speculative_search
+from residency import residency
+from archive import archive, archive_stream, parse_cursor
+from ws import ChatConnection
+from filesearch import file_index
+from memstats import memory_report, tracer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.tracemalloc_frames > 0:
+        tracer.start(settings.tracemalloc_frames)
+    await residency.start()
+    indexing = None
+    if settings.file_search_roots:
+        # Build the file index in the background so the first search is fast
+        indexing = asyncio.create_task(asyncio.to_thread(file_index.refresh, True))
+    yield
+    if indexing is not None:
+        indexing.cancel()
+        await asyncio.gather(indexing, return_exceptions=True)
+    await residency.stop()
+
 
 app = FastAPI(
     title="LangGraph Chat API",
     description="Chat backend powered by LangGraph and LM Studio",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -24,8 +55,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Stream-Id"],
 )
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def resumable_sse_response(source, resumable: bool) -> StreamingResponse:
+    """Run `source` in its own task behind a replay buffer and stream it.
+
+    A dropped connection can be picked up again via
+    /chat/stream/{stream_id}/resume. Clients announce that they will with
+    `X-Stream-Resumable: true`; for any other client a disconnect cancels
+    the run right away instead of after the resume grace period.
+    """
+    buffer = stream_registry.start(source)
+    return StreamingResponse(
+        buffer.subscribe(resumable=resumable),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Stream-Id": buffer.stream_id},
+    )
+
+
+async def chat_events(request: ChatRequest):
+    """SSE chunks for one chat turn; shared by /chat/stream and /ws."""
+    residency.record_request(request.model)
+    try:
+        async for chunk in archive_stream(stream_graph_response(
+            thread_id=request.thread_id,
+            messages=[m.model_dump() for m in request.messages],
+            new_message=request.new_message,
+            image_base64=request.image_base64,
+            image_media_type=request.image_media_type,
+            model=request.model,
+            thinking_mode=request.thinking_mode,
+            web_search=request.web_search,
+            terminal_access=request.terminal_access,
+        ), request.thread_id, request.new_message, request.model):
+            yield chunk
+    except Exception as e:
+        yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+
+
+async def terminal_resume_events(request: TerminalResumeRequest):
+    """SSE chunks for a turn continued after terminal approval."""
+    decisions = {d.tool_call_id: d.approved for d in request.decisions}
+    try:
+        async for chunk in archive_stream(
+            resume_after_terminal_approval(request.thread_id, decisions),
+            request.thread_id, None, None,
+        ):
+            yield chunk
+    except Exception as e:
+        yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+
 
 @app.get("/health")
 async def health_check():
@@ -46,16 +132,75 @@ async def lmstudio_status():
 
 @app.get("/lmstudio/models")
 async def lmstudio_models():
+    """List models with their residency state ("hot", "cold" or "loading")
+    so the UI can warn before a cold model is picked."""
     try:
-        async with httpx.AsyncClient(timeout=3.0) as client:
-            response = await client.get(f"{settings.lm_studio_url}/models")
-            if response.status_code == 200:
-                data = response.json()
-                models = [m["id"] for m in data.get("data", [])]
-                return {"models": models}
+        models = await residency.refresh()
+        return {
+            "models": models,
+            "status": {m: residency.status(m) for m in models},
+        }
     except Exception:
         pass
-    return {"models": []}
+    return {"models": [], "status": {}}
+
+
+@app.get("/debug/router")
+async def debug_router():
+    """Counts of pre-router decisions since startup."""
+    return {"decisions": router_stats}
+
+
+@app.get("/debug/prefetch")
+async def debug_prefetch():
+    """Speculative web search hit rate and time saved since startup."""
+    return speculative_search.report()
+
+
+@app.get("/debug/memory")
+async def debug_memory(threads: int = Query(default=20, ge=0)):
+    """Checkpoint, payload, cache and stream buffer sizes; cheap enough to scrape."""
+    return memory_report(threads)
+
+
+@app.post("/debug/memory/tracemalloc/start")
+async def debug_tracemalloc_start(frames: int = Query(default=1, ge=1, le=50)):
+    tracer.start(frames)
+    return tracer.status()
+
+
+@app.post("/debug/memory/tracemalloc/stop")
+async def debug_tracemalloc_stop():
+    tracer.stop()
+    return tracer.status()
+
+
+@app.post(
+    "/debug/memory/snapshots",
+    responses={409: {"model": ErrorResponse}},
+)
+async def debug_memory_snapshot(limit: int = Query(default=20, ge=1, le=200)):
+    """Take a tracemalloc snapshot and return its top allocation sites."""
+    try:
+        return await asyncio.to_thread(tracer.take, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get(
+    "/debug/memory/snapshots/{snapshot_id}/diff",
+    responses={404: {"model": ErrorResponse}},
+)
+async def debug_memory_diff(
+    snapshot_id: int,
+    base: int = Query(...),
+    limit: int = Query(default=20, ge=1, le=200),
+):
+    """Allocation sites that grew the most between two snapshots."""
+    try:
+        return await asyncio.to_thread(tracer.diff, snapshot_id, base, limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found or already evicted")
 
 
 @app.post(
@@ -69,6 +214,8 @@ async def chat_title(request: TitleRequest):
         print(f"[TITLE ENDPOINT] Error: {e}")
         words = request.message.split()[:6]
         title = " ".join(words)
+    if request.thread_id and settings.archive_enabled:
+        await archive.arun("set_title", request.thread_id, title)
     return TitleResponse(title=title)
 
 
@@ -77,38 +224,199 @@ async def chat_title(request: TitleRequest):
     responses={500: {"model": ErrorResponse}},
 )
 
-async def chat_stream(request: ChatRequest):
-    async def event_generator():
-        try:
-            async for chunk in stream_graph_response(
-                thread_id=request.thread_id,
-                messages=[m.model_dump() for m in request.messages],
-                new_message=request.new_message,
-                image_base64=request.image_base64,
-                image_media_type=request.image_media_type,
-                model=request.model,
-                thinking_mode=request.thinking_mode,
-                web_search=request.web_search,
-                terminal_access=request.terminal_access,
-            ):
-                yield chunk
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+async def chat_stream(
+    request: ChatRequest,
+    x_stream_resumable: bool = Header(default=False),
+):
+    return resumable_sse_response(chat_events(request), x_stream_resumable)
+
+
+@app.get(
+    "/chat/stream/{stream_id}/resume",
+    responses={
+        400: {"model": ErrorResponse},
+        404: {"model": ErrorResponse},
+        409: {"model": ErrorResponse},
+    },
+)
+async def chat_stream_resume(
+    stream_id: str,
+    last_event_id: str | None = Header(default=None),
+):
+    buffer = stream_registry.get(stream_id)
+    if buffer is None:
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+
+    try:
+        last_seq = int(last_event_id) if last_event_id else -1
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    if not buffer.can_resume_from(last_seq):
+        raise HTTPException(status_code=409, detail="Requested events are no longer buffered")
 
     return StreamingResponse(
-        event_generator(),
+        buffer.subscribe(last_seq),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-        },
+        headers={**SSE_HEADERS, "X-Stream-Id": buffer.stream_id},
     )
 
 
 @app.post(
-    "/chat/terminal/execute",
-    response_model=TerminalExecuteResponse,
+    "/chat/stream/{stream_id}/cancel",
+    responses={404: {"model": ErrorResponse}},
+)
+async def chat_stream_cancel(stream_id: str):
+    buffer = stream_registry.get(stream_id)
+    if buffer is None:
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+
+    cancelled = buffer.cancel()
+    if cancelled and buffer.task:
+        await asyncio.wait({buffer.task}, timeout=5.0)
+
+    latency_ms = round(buffer.cancel_latency * 1000, 1) if buffer.cancel_latency is not None else None
+    return {"cancelled": cancelled, "latency_ms": latency_ms}
+
+
+@app.websocket("/ws")
+async def chat_websocket(websocket: WebSocket):
+    """Many chat streams, terminal approvals and health pushes over one
+    connection. See ws.py for the protocol."""
+    # CORS does not apply to WebSockets, so check the Origin here. Browsers
+    # always send it; clients without one are not web pages.
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in settings.cors_origins:
+        print(f"[WS] Rejected connection from origin {origin}")
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    await ChatConnection(websocket, {
+        "chat": (ChatRequest, chat_events),
+        "terminal_resume": (TerminalResumeRequest, terminal_resume_events),
+    }).run()
+
+
+@app.post(
+    "/chat/batch",
+    responses={400: {"model": ErrorResponse}},
 )
-async def terminal_execute_endpoint(request: TerminalExecuteRequest):
-    result = execute_terminal_command(request.command, request.working_directory)
-    return TerminalExecuteResponse(**result)
+async def chat_batch(
+    request: Request,
+    concurrency: int | None = Query(default=None, ge=1),
+    offset: int = Query(default=0, ge=0),
+):
+    """Run a JSONL list of ChatRequest jobs; results stream back as JSONL
+    in completion order."""
+    body = (await request.body()).decode("utf-8")
+    jobs = parse_jobs(body)
+    if not jobs:
+        raise HTTPException(status_code=400, detail="No jobs in request body")
+
+    window = min(concurrency or settings.batch_concurrency, settings.batch_max_concurrency)
+
+    return StreamingResponse(
+        run_batch(jobs, window, offset),
+        media_type="application/x-ndjson",
+        headers=SSE_HEADERS,
+    )
+
+
+@app.post(
+    "/chat/terminal/resume",
+    responses={500: {"model": ErrorResponse}},
+)
+async def terminal_resume(
+    request: TerminalResumeRequest,
+    x_stream_resumable: bool = Header(default=False),
+):
+    """Apply terminal approval decisions and continue the paused graph run."""
+    return resumable_sse_response(terminal_resume_events(request), x_stream_resumable)
+
+
+# --- Archive ---
+
+def require_archive() -> None:
+    if not settings.archive_enabled:
+        raise HTTPException(status_code=404, detail="Conversation archive is disabled")
+
+
+@app.get(
+    "/archive/conversations",
+    responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+)
+async def archive_list(
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: str | None = None,
+):
+    """Archived conversations, most recently updated first (no messages)."""
+    require_archive()
+    if cursor:
+        try:
+            parse_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return await archive.arun("list_conversations", limit, cursor)
+
+
+@app.get("/archive/conversations/{conversation_id}", responses={404: {"model": ErrorResponse}})
+async def archive_get(conversation_id: str):
+    require_archive()
+    conversation = await archive.arun("get_conversation", conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation
+
+
+@app.delete("/archive/conversations/{conversation_id}", responses={404: {"model": ErrorResponse}})
+async def archive_delete(conversation_id: str):
+    require_archive()
+    return {"deleted": await archive.arun("delete", conversation_id)}
+
+
+@app.get("/archive/search", responses={404: {"model": ErrorResponse}})
+async def archive_search(
+    q: str,
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+):
+    """Full-text search over archived messages, best matches first."""
+    require_archive()
+    return await archive.arun("search", q, limit, offset)
+
+
+@app.get("/archive/export", responses={404: {"model": ErrorResponse}})
+async def archive_export():
+    """Every archived conversation as JSONL (the format /archive/import accepts)."""
+    require_archive()
+    return StreamingResponse(
+        archive.export_jsonl(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="conversations.jsonl"'},
+    )
+
+
+@app.post(
+    "/archive/import",
+    responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+)
+async def archive_import(request: Request):
+    """Import conversations from a JSONL body (or a JSON array), replacing
+    archived conversations with the same id."""
+    require_archive()
+    body = (await request.body()).decode("utf-8").strip()
+    try:
+        if body.startswith("["):
+            conversations = json.loads(body)
+        else:
+            conversations = [json.loads(line) for line in body.splitlines() if line.strip()]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import body: {e}")
+    if not conversations or not all(isinstance(c, dict) and "id" in c for c in conversations):
+        raise HTTPException(status_code=400, detail="Each conversation needs an id")
+
+    try:
+        imported = await archive.arun("import_conversations", conversations)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid conversation: {e}")
+    return {"imported": imported}
@@ -0,0 +1,160 @@
+"""Where the backend's memory goes.
+
+memory_report() is built from counters and lengths only, so it is cheap
+enough to scrape periodically. It covers checkpoints per thread (with
+their payload share, images included), the in-process caches, live stream
+buffers and process RSS.
+
+tracemalloc tracing is opt-in (TRACEMALLOC_FRAMES, or start() at runtime)
+because it slows every allocation down. Snapshots are kept in memory,
+bounded by TRACEMALLOC_KEEP_SNAPSHOTS, and can be diffed against each
+other to find what grew between two points in time.
+"""
+import os
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from config import settings
+from fixtures import fixture_cache_stats
+from filesearch import file_index
+from graph import checkpoint_stats
+from payloads import payloads
+from prefetch import speculative_search
+from streams import stream_registry
+
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def process_rss_bytes() -> int | None:
+    """Current resident set size, or the peak where only that is available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource  # not available on Windows
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # bytes vs KiB
+    except ImportError:
+        return None
+
+
+def thread_report(limit: int) -> dict:
+    checkpoints = checkpoint_stats()
+    thread_ids = set(checkpoints) | payloads.thread_ids()
+    rows = []
+    for thread_id in thread_ids:
+        cp = checkpoints.get(thread_id, {"checkpoints": 0, "bytes": 0})
+        rows.append({"thread_id": thread_id, **cp, **payloads.thread_stats(thread_id)})
+    rows.sort(key=lambda r: r["bytes"] + sum(r["chars_by_kind"].values()), reverse=True)
+    return {
+        "count": len(rows),
+        "checkpoints": sum(r["checkpoints"] for r in rows),
+        "checkpoint_bytes": sum(r["bytes"] for r in rows),
+        "top": rows[:limit],
+    }
+
+
+def memory_report(thread_limit: int = 20) -> dict:
+    streams = stream_registry.stats()
+    report = {
+        "rss_bytes": process_rss_bytes(),
+        "threads": thread_report(thread_limit),
+        "caches": {
+            "payloads": payloads.stats(),
+            "file_index": file_index.stats(),
+            "fixtures": fixture_cache_stats(),
+            "speculative_search_pending": speculative_search.report()["pending"],
+        },
+        "streams": {
+            "count": len(streams),
+            "live": sum(1 for s in streams if not s["done"]),
+            "events": sum(s["events"] for s in streams),
+            "chars": sum(s["chars"] for s in streams),
+            "buffers": streams,
+        },
+        "tracemalloc": tracer.status(),
+    }
+    return report
+
+
+def _stat_row(stat) -> dict:
+    frame = stat.traceback[0]
+    row = {"where": f"{frame.filename}:{frame.lineno}", "bytes": stat.size, "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        row["bytes_diff"] = stat.size_diff
+        row["count_diff"] = stat.count_diff
+    return row
+
+
+class Tracer:
+    def __init__(self):
+        self.snapshots: OrderedDict[int, tuple[float, tracemalloc.Snapshot]] = OrderedDict()
+        self._next_id = 1
+
+    def start(self, frames: int) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, frames))
+            print(f"[MEMORY] tracemalloc started ({frames} frame(s))")
+
+    def stop(self) -> None:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.snapshots.clear()
+
+    def status(self) -> dict:
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": True,
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+            "snapshots": [
+                {"id": sid, "taken_at": taken} for sid, (taken, _) in self.snapshots.items()
+            ],
+        }
+
+    def take(self, limit: int = 20) -> dict:
+        """Store a new snapshot and return its largest allocation sites."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        snapshot_id = self._next_id
+        self._next_id += 1
+        self.snapshots[snapshot_id] = (time.time(), snapshot)
+        while len(self.snapshots) > settings.tracemalloc_keep_snapshots:
+            self.snapshots.popitem(last=False)
+        stats = snapshot.statistics("lineno")
+        return {
+            "id": snapshot_id,
+            "total_bytes": sum(s.size for s in stats),
+            "top": [_stat_row(s) for s in stats[:limit]],
+        }
+
+    def diff(self, snapshot_id: int, base_id: int, limit: int = 20) -> dict:
+        """Allocation sites that grew the most from `base_id` to `snapshot_id`."""
+        if snapshot_id not in self.snapshots or base_id not in self.snapshots:
+            raise KeyError("Unknown snapshot id")
+        _, snapshot = self.snapshots[snapshot_id]
+        _, base = self.snapshots[base_id]
+        stats = snapshot.compare_to(base, "lineno")
+        return {
+            "id": snapshot_id,
+            "base": base_id,
+            "bytes_diff": sum(s.size_diff for s in stats),
+            "top": [_stat_row(s) for s in stats[:limit]],
+        }
+
+
+tracer = Tracer()
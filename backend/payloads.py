@@ -0,0 +1,71 @@
+"""Large per-turn payloads kept outside the graph checkpoints.
+
+Images and long tool outputs are stored here once; the checkpointed graph
+state only carries short reference strings that are resolved when a prompt
+is built or an event is emitted.
+"""
+import uuid
+
+REF_PREFIX = "payload-ref:"
+
+# Shorter values stay inline: a reference would not save anything
+INLINE_MAX_CHARS = 512
+
+
+class PayloadStore:
+    def __init__(self):
+        self._data: dict[str, str] = {}
+        self._kinds: dict[str, str] = {}
+        self._by_thread: dict[str, set[str]] = {}
+
+    def put(self, thread_id: str, data: str, kind: str = "tool") -> str:
+        ref = f"{REF_PREFIX}{uuid.uuid4().hex}"
+        self._data[ref] = data
+        self._kinds[ref] = kind
+        self._by_thread.setdefault(thread_id, set()).add(ref)
+        return ref
+
+    def wrap(self, thread_id: str, data: str) -> str:
+        """Return `data` itself if it is small, otherwise a reference to it."""
+        if len(data) <= INLINE_MAX_CHARS:
+            return data
+        return self.put(thread_id, data)
+
+    def resolve(self, value):
+        """Return the payload behind a reference; other values pass through.
+
+        A reference whose thread was discarded resolves to an empty string.
+        """
+        if isinstance(value, str) and value.startswith(REF_PREFIX):
+            return self._data.get(value, "")
+        return value
+
+    def discard_thread(self, thread_id: str) -> None:
+        for ref in self._by_thread.pop(thread_id, ()):
+            self._data.pop(ref, None)
+            self._kinds.pop(ref, None)
+
+    def _chars_by_kind(self, refs) -> dict[str, int]:
+        chars: dict[str, int] = {}
+        for ref in refs:
+            kind = self._kinds.get(ref, "tool")
+            chars[kind] = chars.get(kind, 0) + len(self._data.get(ref, ""))
+        return chars
+
+    def thread_ids(self) -> set[str]:
+        return set(self._by_thread)
+
+    def thread_stats(self, thread_id: str) -> dict:
+        refs = self._by_thread.get(thread_id, ())
+        return {"payloads": len(refs), "chars_by_kind": self._chars_by_kind(refs)}
+
+    def stats(self) -> dict:
+        return {
+            "threads": len(self._by_thread),
+            "payloads": len(self._data),
+            "chars": sum(len(v) for v in self._data.values()),
+            "chars_by_kind": self._chars_by_kind(self._data),
+        }
+
+
+payloads = PayloadStore()
@@ -0,0 +1,142 @@
+"""Speculative web search, started while the model decides on tools.
+
+When web search is on, node_call_model starts a search for a keyword
+query derived from the user's message before the (non-streaming)
+tool-decision call. If the model then asks for web_search with a query
+whose terms are mostly covered by the speculative one (and which the
+speculative one does not broaden by more than a few terms), tool_node
+reuses that result. The search has been running the whole time, so most of its
+latency is hidden. Otherwise the speculative result is discarded.
+"""
+import asyncio
+import json
+import re
+import time
+
+from config import settings
+from textutil import STOPWORDS
+from tools import web_search
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+MAX_QUERY_TERMS = 12
+
+
+def query_terms(text: str) -> list[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+def derive_query(message: str) -> str:
+    """Keyword query for a user message, close to what a model would search."""
+    return " ".join(query_terms(message)[:MAX_QUERY_TERMS])
+
+
+def coverage(speculative_query: str, requested_query: str) -> float:
+    """Share of the requested query's terms already in the speculative query."""
+    requested = set(query_terms(requested_query))
+    if not requested:
+        return 0.0
+    return len(requested & set(query_terms(speculative_query))) / len(requested)
+
+
+def extra_terms(speculative_query: str, requested_query: str) -> int:
+    """Terms of the speculative query the requested one does not have."""
+    return len(set(query_terms(speculative_query)) - set(query_terms(requested_query)))
+
+
+def usable_result(result: str) -> bool:
+    """web_search reports failures in its JSON instead of raising."""
+    try:
+        return json.loads(result).get("status") in ("success", "no_results")
+    except (ValueError, AttributeError):
+        return False
+
+
+class _Speculation:
+    def __init__(self, query: str, num_results: int):
+        self.query = query
+        self.num_results = num_results
+        self.started = time.monotonic()
+        self.finished: float | None = None
+        # The search runs in a worker thread; if discarded, the thread is
+        # left to finish and its result dropped.
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> str:
+        try:
+            return await asyncio.to_thread(
+                web_search.invoke, {"query": self.query, "num_results": self.num_results},
+            )
+        finally:
+            self.finished = time.monotonic()
+
+
+class SpeculativeSearch:
+    def __init__(self):
+        self._pending: dict[str, _Speculation] = {}
+        self.stats = {"started": 0, "hits": 0, "misses": 0, "unused": 0, "time_saved_ms": 0.0}
+
+    def start(self, thread_id: str, message: str) -> None:
+        if not settings.speculative_search_enabled or thread_id in self._pending:
+            return
+        query = derive_query(message)
+        if not query:
+            return
+        self._pending[thread_id] = _Speculation(query, num_results=5)
+        self.stats["started"] += 1
+        print(f"[PREFETCH] Speculative search: {query!r}")
+
+    async def take(self, thread_id: str, args: dict) -> str | None:
+        """Return the speculative result if it answers this web_search call."""
+        spec = self._pending.pop(thread_id, None)
+        if spec is None:
+            return None
+
+        requested = str(args.get("query", ""))
+        score = coverage(spec.query, requested)
+        if (
+            score < settings.speculative_search_min_coverage
+            or extra_terms(spec.query, requested) > settings.speculative_search_max_extra_terms
+            or args.get("num_results", 5) > spec.num_results
+        ):
+            self.stats["misses"] += 1
+            spec.task.cancel()
+            print(f"[PREFETCH] Miss ({score:.2f}): model asked for {requested!r}")
+            return None
+
+        # Time the search had already been running before the model asked for it
+        asked_at = time.monotonic()
+        try:
+            result = await spec.task
+        except Exception as e:
+            result = json.dumps({"status": "error", "message": str(e)})
+        if not usable_result(result):
+            self.stats["misses"] += 1
+            print(f"[PREFETCH] Speculative search failed, searching live: {result[:200]}")
+            return None
+        saved = (min(spec.finished or asked_at, asked_at) - spec.started) * 1000
+        self.stats["hits"] += 1
+        self.stats["time_saved_ms"] += saved
+        print(f"[PREFETCH] Hit ({score:.2f}) for {requested!r}, saved {saved:.0f} ms")
+        return result
+
+    def finish(self, thread_id: str) -> None:
+        """Drop a speculation the turn never used."""
+        spec = self._pending.pop(thread_id, None)
+        if spec is not None:
+            self.stats["unused"] += 1
+            spec.task.cancel()
+
+    def report(self) -> dict:
+        s = self.stats
+        decided = s["hits"] + s["misses"] + s["unused"]
+        return {
+            **s,
+            "pending": len(self._pending),
+            "time_saved_ms": round(s["time_saved_ms"], 1),
+            "hit_rate": round(s["hits"] / decided, 3) if decided else None,
+            "mean_saved_ms_per_hit": round(s["time_saved_ms"] / s["hits"], 1) if s["hits"] else None,
+        }
+
+
+speculative_search = SpeculativeSearch()
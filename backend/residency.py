@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections import deque
+
+import httpx
+
+from config import settings
+
+
+class ModelResidency:
+    """Keeps frequently used LM Studio models loaded ("hot").
+
+    Configured models are warmed at startup with a one-token completion,
+    hot models are pinged periodically so LM Studio's idle TTL never
+    unloads them, and the models with the highest recency-weighted request
+    score are warmed proactively when they go cold. The model of the latest
+    request is the one the user has selected, so it is always kept hot.
+    """
+
+    def __init__(self):
+        self.hot: dict[str, bool] = {}
+        self.last_ping: dict[str, float] = {}
+        self.load_ms: dict[str, float] = {}
+        self._recent: deque[tuple[float, str]] = deque()
+        self.selected: str | None = None
+        self._warming: set[str] = set()
+        self._task: asyncio.Task | None = None
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        if self._task is None and settings.residency_enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Keep going: the maintenance loop retries on every interval
+            print(f"[RESIDENCY] Startup refresh failed: {e}")
+        for model in self.pinned_models():
+            await self.warm(model)
+
+        while True:
+            await asyncio.sleep(settings.residency_ping_interval_seconds)
+            try:
+                await self.refresh()
+                await self._maintain()
+            except Exception as e:
+                print(f"[RESIDENCY] Maintenance failed: {e}")
+
+    async def _maintain(self) -> None:
+        wanted = set(self.pinned_models()) | set(self.popular_models())
+        if self.selected:
+            wanted.add(self.selected)
+        now = time.monotonic()
+        for model in wanted:
+            idle = now - self.last_ping.get(model, 0.0)
+            if not self.hot.get(model) or idle >= settings.residency_ping_interval_seconds:
+                await self.warm(model)
+
+    # --- Tracking ---
+
+    def record_request(self, model: str) -> None:
+        now = time.monotonic()
+        self._recent.append((now, model))
+        self.selected = model
+        self.last_ping[model] = now
+        cutoff = now - settings.residency_window_seconds
+        while self._recent and self._recent[0][0] < cutoff:
+            self._recent.popleft()
+
+    def pinned_models(self) -> list[str]:
+        """Models kept hot regardless of traffic: configured ones plus the auxiliary model."""
+        pinned = list(settings.residency_warm_models)
+        if settings.aux_model and not settings.aux_lm_studio_url and settings.aux_model not in pinned:
+            pinned.append(settings.aux_model)
+        return pinned
+
+    def scores(self) -> dict[str, float]:
+        """Requests per model in the window, each halving in weight every
+        `residency_half_life_seconds`."""
+        now = time.monotonic()
+        half_life = max(settings.residency_half_life_seconds, 1e-3)
+        scores: dict[str, float] = {}
+        for at, model in self._recent:
+            scores[model] = scores.get(model, 0.0) + 0.5 ** ((now - at) / half_life)
+        return scores
+
+    def popular_models(self) -> list[str]:
+        ranked = sorted(self.scores().items(), key=lambda item: item[1], reverse=True)
+        return [m for m, _ in ranked[:settings.residency_max_hot_models]]
+
+    def status(self, model: str) -> str:
+        if model in self._warming:
+            return "loading"
+        return "hot" if self.hot.get(model) else "cold"
+
+    # --- LM Studio calls ---
+
+    async def refresh(self) -> list[str]:
+        """Update hot/cold state from LM Studio and return the known models.
+
+        LM Studio's REST API (/api/v0/models) reports load state for every
+        downloaded model; the OpenAI-compatible /v1/models only lists what
+        is available, which is then treated as hot.
+        """
+        base = settings.lm_studio_url.rstrip("/")
+        rest_base = base[:-3] if base.endswith("/v1") else base
+        async with httpx.AsyncClient(timeout=3.0) as client:
+            try:
+                response = await client.get(f"{rest_base}/api/v0/models")
+                if response.status_code == 200:
+                    models = [
+                        m for m in response.json().get("data", [])
+                        if m.get("type") in (None, "llm", "vlm")
+                    ]
+                    for m in models:
+                        self.hot[m["id"]] = m.get("state") == "loaded"
+                    return [m["id"] for m in models]
+            except (httpx.HTTPError, ValueError):
+                pass
+
+            response = await client.get(f"{base}/models")
+            response.raise_for_status()
+            ids = [m["id"] for m in response.json().get("data", [])]
+            for model_id in ids:
+                self.hot[model_id] = True
+            return ids
+
+    async def warm(self, model: str) -> bool:
+        """Load `model` (or keep it loaded) with a one-token completion."""
+        if model in self._warming:
+            return False
+        self._warming.add(model)
+        started = time.perf_counter()
+        try:
+            async with httpx.AsyncClient(timeout=settings.residency_load_timeout_seconds) as client:
+                response = await client.post(
+                    f"{settings.lm_studio_url}/chat/completions",
+                    json={
+                        "model": model,
+                        "messages": [{"role": "user", "content": "hi"}],
+                        "max_tokens": 1,
+                        "temperature": 0,
+                    },
+                )
+                response.raise_for_status()
+            elapsed = (time.perf_counter() - started) * 1000
+            if not self.hot.get(model):
+                self.load_ms[model] = round(elapsed, 1)
+                print(f"[RESIDENCY] {model} warmed in {elapsed:.0f} ms")
+            self.hot[model] = True
+            self.last_ping[model] = time.monotonic()
+            return True
+        except httpx.HTTPError as e:
+            print(f"[RESIDENCY] Could not warm {model}: {e}")
+            return False
+        finally:
+            self._warming.discard(model)
+
+
+residency = ModelResidency()
@@ -0,0 +1,235 @@
+"""Cheap local pre-router deciding whether a turn needs tool binding.
+
+Compiled patterns give strong signals in both directions; an optional
+linear scoring model (JSON weights over lowercase word tokens) breaks
+ties. Turns routed to "no_tools" skip the non-streaming tool-decision
+call entirely; "tools" and "uncertain" keep the normal ReAct path.
+
+Run `python router.py [fixtures.jsonl]` to report accuracy on a labeled
+fixture set.
+"""
+import json
+import math
+import re
+import sys
+from pathlib import Path
+from typing import Literal, TypedDict
+
+from config import settings
+
+ToolRoute = Literal["tools", "no_tools", "uncertain"]
+
+
+class RouteDecision(TypedDict):
+    route: ToolRoute
+    score: float
+    reason: str
+
+
+# --- Patterns ---
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_GREETING = (
+    r"(hi|hello|hey|ola|olá|oi|thanks|thank you|thx|obrigad[oa]|valeu|"
+    r"bom dia|boa tarde|boa noite|good (morning|afternoon|evening|night)|bye|tchau)"
+)
+_ACK = r"(ok|okay|yes|no|sure|sim|não|nao|great|nice|cool|perfect|perfeito|got it|entendi)"
+
+# Messages that never need a tool: a greeting or thanks and nothing else
+SMALL_TALK = re.compile(
+    rf"^\W*{_GREETING}(\W+({_GREETING}|there|everyone|all|so much|a lot|again|"
+    rf"muito|that helped))*\W*$",
+    re.IGNORECASE,
+)
+
+# A bare acknowledgement; it only needs a tool when it answers a tool offer
+ACKNOWLEDGEMENT = re.compile(rf"^\W*{_ACK}(\W+{_ACK})*\W*$", re.IGNORECASE)
+
+# Coding and creative work the model answers from its own knowledge
+NO_TOOL_TOPICS = re.compile(
+    r"```|\b(def|class|function|return|import|const|async|lambda)\b|"
+    r"\b(refactor|regex|algorithm|big-?o|typescript|javascript|python|sql|"
+    r"write (a|an|me) (poem|story|song|essay|email)|translate|tradu[zç]a?|"
+    r"explain|explique|what is the difference|o que é|what does .* mean)\b",
+    re.IGNORECASE,
+)
+
+# Up-to-date information that only web_search can provide
+WEB_SIGNALS = re.compile(
+    r"\b(today|tonight|now|right now|latest|recent|current|currently|this week|"
+    r"news|headline|price|prices|stock|exchange rate|weather|forecast|score|"
+    r"who won|election|release date|hoje|agora|atual|últim[oa]s?|notícias?|"
+    r"preço|cotação|clima|previsão|placar|search (again|for|online|the web)|"
+    r"look (it |that )?up|google (it|that)|pesquise|pesquisar|busque)\b|\b20[2-9]\d\b|https?://",
+    re.IGNORECASE,
+)
+
+# Local machine inspection that only terminal_execute can provide
+TERMINAL_SIGNALS = re.compile(
+    r"\b(file|files|folder|folders|directory|directories|path|disk|drive|"
+    r"git (status|log|diff|branch)|repo|repository|process|processes|service|"
+    r"installed|version of|my machine|my computer|arquivos?|pastas?|diret[óo]rios?|"
+    r"disco|processos?|minha m[áa]quina|run|running|execute|instances?|rode|rodar|"
+    r"executar?)\b|[a-z]:\\|(^|\s)--?[a-z][\w-]*|"
+    r"\.(py|js|ts|tsx|json|md|txt|csv|log|ya?ml|toml|ini|cfg|env)\b",
+    re.IGNORECASE,
+)
+
+# An assistant reply that offered to use a tool or reported using one
+TOOL_FOLLOWUP = re.compile(
+    r"\b(want me to|should i|shall i|would you like me to|do you want me to|"
+    r"i can (run|search|check|look)|quer que eu|deseja que eu|"
+    r"posso (pesquisar|buscar|executar|rodar|verificar)|i ran|i searched|"
+    r"search results|according to the (search|results)|the command (returned|output)|"
+    r"executei|pesquisei)\b",
+    re.IGNORECASE,
+)
+
+
+# --- Optional scoring model ---
+
+class ScoringModel:
+    """Logistic model over word tokens: P(tools needed | message)."""
+
+    def __init__(self, bias: float, weights: dict[str, float], low: float, high: float):
+        self.bias = bias
+        self.weights = weights
+        self.low = low
+        self.high = high
+
+    @classmethod
+    def load(cls, path: str) -> "ScoringModel":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(
+            bias=float(data.get("bias", 0.0)),
+            weights={k.lower(): float(v) for k, v in data.get("weights", {}).items()},
+            low=float(data.get("threshold_low", 0.3)),
+            high=float(data.get("threshold_high", 0.7)),
+        )
+
+    def probability(self, message: str) -> float:
+        z = self.bias + sum(self.weights.get(t, 0.0) for t in _WORD.findall(message.lower()))
+        return 1.0 / (1.0 + math.exp(-z))
+
+
+_model: ScoringModel | None = None
+_model_loaded = False
+
+
+def get_scoring_model() -> ScoringModel | None:
+    global _model, _model_loaded
+    if not _model_loaded:
+        _model_loaded = True
+        if settings.tool_router_model_path:
+            try:
+                _model = ScoringModel.load(settings.tool_router_model_path)
+            except (OSError, ValueError) as e:
+                print(f"[ROUTER] Could not load scoring model: {e}")
+    return _model
+
+
+# --- Routing ---
+
+router_stats: dict[str, int] = {"tools": 0, "no_tools": 0, "uncertain": 0}
+
+
+def follows_tool_turn(messages: list) -> bool:
+    """True if the last assistant turn called a tool or offered to."""
+    for m in reversed(messages):
+        if m.type == "tool" or getattr(m, "tool_calls", None):
+            return True
+        if m.type == "ai":
+            return isinstance(m.content, str) and bool(TOOL_FOLLOWUP.search(m.content))
+    return False
+
+
+def route_message(message: str, web_search: bool, terminal_access: bool,
+                  follows_tool: bool = False) -> RouteDecision:
+    """Decide whether the enabled tools are needed for this message.
+
+    `follows_tool` marks a reply to a turn that used or offered a tool
+    ("yes, do it", "try again"); without a clearer signal it keeps tools.
+    """
+    text = message.strip()
+
+    if web_search and WEB_SIGNALS.search(text):
+        return {"route": "tools", "score": 1.0, "reason": "web_signal"}
+    if terminal_access and TERMINAL_SIGNALS.search(text):
+        return {"route": "tools", "score": 1.0, "reason": "terminal_signal"}
+    if SMALL_TALK.match(text):
+        return {"route": "no_tools", "score": 0.0, "reason": "small_talk"}
+    if follows_tool:
+        return {"route": "tools", "score": 1.0, "reason": "tool_followup"}
+    if ACKNOWLEDGEMENT.match(text):
+        return {"route": "no_tools", "score": 0.0, "reason": "small_talk"}
+    if NO_TOOL_TOPICS.search(text):
+        return {"route": "no_tools", "score": 0.0, "reason": "no_tool_topic"}
+
+    model = get_scoring_model()
+    if model is not None:
+        p = model.probability(text)
+        if p >= model.high:
+            return {"route": "tools", "score": p, "reason": "model"}
+        if p <= model.low:
+            return {"route": "no_tools", "score": p, "reason": "model"}
+        return {"route": "uncertain", "score": p, "reason": "model"}
+
+    return {"route": "uncertain", "score": 0.5, "reason": "no_signal"}
+
+
+def record_decision(decision: RouteDecision) -> None:
+    router_stats[decision["route"]] += 1
+    print(f"[ROUTER] route={decision['route']} reason={decision['reason']} score={decision['score']:.2f}")
+
+
+# --- Fixture evaluation ---
+
+def evaluate(fixtures_path: str) -> dict:
+    """Score the router against labeled fixtures.
+
+    Each JSONL line has `message`, `label` ("tools" or "no_tools") and
+    optionally `web_search` / `terminal_access` (both default to true) and
+    `previous_assistant`, the reply the message answers.
+    "uncertain" decisions are counted separately: they fall back to the
+    model's own tool decision, so they cost latency but never accuracy.
+    """
+    total = correct = uncertain = 0
+    confusion: dict[str, dict[str, int]] = {}
+    mistakes: list[dict] = []
+
+    for line in Path(fixtures_path).read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        case = json.loads(line)
+        decision = route_message(
+            case["message"],
+            case.get("web_search", True),
+            case.get("terminal_access", True),
+            bool(TOOL_FOLLOWUP.search(case.get("previous_assistant", ""))),
+        )
+        total += 1
+        confusion.setdefault(case["label"], {}).setdefault(decision["route"], 0)
+        confusion[case["label"]][decision["route"]] += 1
+        if decision["route"] == "uncertain":
+            uncertain += 1
+        elif decision["route"] == case["label"]:
+            correct += 1
+        else:
+            mistakes.append({"message": case["message"], "label": case["label"], **decision})
+
+    decided = total - uncertain
+    return {
+        "total": total,
+        "decided": decided,
+        "uncertain": uncertain,
+        "accuracy_on_decided": round(correct / decided, 3) if decided else None,
+        "coverage": round(decided / total, 3) if total else None,
+        "confusion": confusion,
+        "mistakes": mistakes,
+    }
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else str(Path(__file__).with_name("router_fixtures.jsonl"))
+    print(json.dumps(evaluate(path), indent=2, ensure_ascii=False))
@@ -24,25 +24,33 @@ class ChatRequest(BaseModel):
 class TitleRequest(BaseModel):
     message: str
     model: str = "local-model"
+    thread_id: str | None = None
 
 
 class TitleResponse(BaseModel):
     title: str
 
 
-class TerminalExecuteRequest(BaseModel):
-    command: str
-    working_directory: str = "."
+class TerminalDecision(BaseModel):
+    tool_call_id: str
+    approved: bool
 
 
-class TerminalExecuteResponse(BaseModel):
-    status: str
-    command: str
-    exit_code: int | None = None
-    stdout: str | None = None
-    stderr: str | None = None
-    truncated: bool = False
-    message: str | None = None
+class TerminalResumeRequest(BaseModel):
+    thread_id: str
+    decisions: list[TerminalDecision]
+
+
+class BatchJobResult(BaseModel):
+    index: int
+    thread_id: str
+    status: Literal["ok", "error", "invalid", "pending_approval"]
+    content: str = ""
+    message_type: str | None = None
+    tool_calls: list[dict] = []
+    error: str | None = None
+    elapsed_ms: float = 0.0
+    resume_offset: int = 0
 
 
 class ErrorResponse(BaseModel):
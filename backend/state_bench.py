@@ -0,0 +1,179 @@
+"""Measure per-step graph state overhead against history length.
+
+Runs one tool round-trip (pre_process, check_history, call_model,
+tool_node, call_model) without any LLM, on two graphs:
+
+- legacy: nodes return the full state and the image and tool outputs are
+  stored inline, as graph.py did before the delta-based GraphState;
+- delta: graph.GraphState with reducers and payload references.
+
+    python state_bench.py [--lengths 10 100 500 2000] [--repeats 5]
+
+Reports milliseconds per step and the checkpoint bytes kept per turn.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import statistics
+import time
+import uuid
+from typing import TypedDict
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, StateGraph
+
+from graph import GraphState, checkpoint_size, node_check_history, node_pre_process
+from payloads import payloads
+
+STEPS = 5
+IMAGE_BYTES = 150_000
+TOOL_OUTPUT_CHARS = 4_000
+
+
+def _tool_call_message() -> AIMessage:
+    return AIMessage(content="", tool_calls=[{
+        "id": f"call_{uuid.uuid4().hex[:8]}", "name": "web_search", "args": {"query": "benchmark"},
+    }])
+
+
+def _tool_output() -> str:
+    return json.dumps({"status": "ok", "results": "x" * TOOL_OUTPUT_CHARS})
+
+
+# --- Legacy graph: full-state returns, inline payloads ---
+
+class LegacyState(TypedDict):
+    messages: list[AnyMessage]
+    new_message: str
+    image_base64: str | None
+    message_type: str
+    history_compressed: bool
+    web_search: bool
+    terminal_access: bool
+    tool_calls_log: list[dict]
+    tool_call_iterations: int
+
+
+def _legacy_pre_process(state: LegacyState) -> LegacyState:
+    return {**state, "message_type": "simple"}
+
+
+def _legacy_check_history(state: LegacyState) -> LegacyState:
+    return {**state, "history_compressed": False}
+
+
+def _legacy_call_model(state: LegacyState) -> LegacyState:
+    response = _tool_call_message() if state["tool_call_iterations"] == 0 else AIMessage(content="done")
+    return {
+        **state,
+        "messages": state["messages"] + [response],
+        "tool_call_iterations": state["tool_call_iterations"] + 1,
+    }
+
+
+def _legacy_tool_node(state: LegacyState) -> LegacyState:
+    tc = state["messages"][-1].tool_calls[0]
+    result = _tool_output()
+    return {
+        **state,
+        "messages": state["messages"] + [ToolMessage(content=result, tool_call_id=tc["id"])],
+        "tool_calls_log": state["tool_calls_log"] + [{"id": tc["id"], "name": tc["name"], "args": tc["args"], "result": result}],
+    }
+
+
+# --- Delta graph: the real GraphState, tool steps without LLM/tool calls ---
+
+def _delta_call_model(state: GraphState) -> dict:
+    response = _tool_call_message() if state["tool_call_iterations"] == 0 else AIMessage(content="done")
+    return {"messages": [response], "tool_call_iterations": state["tool_call_iterations"] + 1}
+
+
+def _delta_tool_node(state: GraphState, config) -> dict:
+    tc = state["messages"][-1].tool_calls[0]
+    result_ref = payloads.wrap(config["configurable"]["thread_id"], _tool_output())
+    return {
+        "messages": [ToolMessage(content=result_ref, tool_call_id=tc["id"])],
+        "tool_calls_log": [{"id": tc["id"], "name": tc["name"], "args": tc["args"], "result": result_ref}],
+    }
+
+
+def _build(state_type, nodes: list, saver: MemorySaver):
+    graph = StateGraph(state_type)
+    names = ["pre_process", "check_history", "call_model", "tool_node", "call_model_2"]
+    for name, fn in zip(names, nodes):
+        graph.add_node(name, fn)
+    graph.set_entry_point(names[0])
+    for a, b in zip(names, names[1:]):
+        graph.add_edge(a, b)
+    graph.add_edge(names[-1], END)
+    return graph.compile(checkpointer=saver)
+
+
+def _history(length: int) -> list[AnyMessage]:
+    return [
+        HumanMessage(content=f"question {i} " * 20) if i % 2 == 0 else AIMessage(content=f"answer {i} " * 40)
+        for i in range(length)
+    ]
+
+
+async def _measure(graph, saver: MemorySaver, make_input, repeats: int) -> dict:
+    timings: list[float] = []
+    sizes: list[int] = []
+    for _ in range(repeats):
+        thread_id = uuid.uuid4().hex
+        config = {"configurable": {"thread_id": thread_id}}
+        started = time.perf_counter()
+        await graph.ainvoke(make_input(thread_id), config=config)
+        timings.append((time.perf_counter() - started) * 1000)
+        sizes.append(checkpoint_size(thread_id, saver))
+    return {
+        "ms_per_step": round(statistics.median(timings) / STEPS, 3),
+        "checkpoint_kb": round(statistics.median(sizes) / 1024, 1),
+    }
+
+
+async def run(lengths: list[int], repeats: int) -> dict:
+    image = base64.b64encode(os.urandom(IMAGE_BYTES)).decode()
+    legacy_saver, delta_saver = MemorySaver(), MemorySaver()
+    legacy = _build(LegacyState, [
+        _legacy_pre_process, _legacy_check_history, _legacy_call_model, _legacy_tool_node, _legacy_call_model,
+    ], legacy_saver)
+    delta = _build(GraphState, [
+        node_pre_process, node_check_history, _delta_call_model, _delta_tool_node, _delta_call_model,
+    ], delta_saver)
+
+    common = {
+        "new_message": "describe this image", "message_type": "simple", "history_compressed": False,
+        "web_search": False, "terminal_access": False, "tool_calls_log": [], "tool_call_iterations": 0,
+    }
+    report: dict = {"steps_per_turn": STEPS, "image_bytes": IMAGE_BYTES, "results": []}
+    for length in lengths:
+        history = _history(length)
+        row = {
+            "history_messages": length,
+            "legacy": await _measure(legacy, legacy_saver, lambda _: {
+                **common, "messages": list(history), "image_base64": image,
+            }, repeats),
+            "delta": await _measure(delta, delta_saver, lambda thread_id: {
+                **common, "messages": list(history), "image_ref": payloads.put(thread_id, image, kind="image"),
+                "image_media_type": "image/png", "tool_route": "uncertain", "model": "bench",
+                "thinking_mode": False, "has_pending_terminal": False,
+            }, repeats),
+        }
+        report["results"].append(row)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 500, 2000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.lengths, args.repeats)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator
+
+from config import settings
+
+
+class StreamBuffer:
+    """Sequence-numbered replay buffer for a single chat stream.
+
+    The producer task keeps publishing into the buffer even when no client
+    is attached. Once the last subscriber detaches, the producer gets
+    `stream_resume_grace_seconds` to be picked up again via the resume
+    endpoint before it is cancelled, but only if a resume-capable client
+    was ever attached; otherwise nobody can come back for it and it is
+    cancelled right away. Cancelling the producer tears down the graph run
+    and the upstream LM Studio request with it.
+
+    While subscribers are attached, the producer pauses once the slowest of
+    them is `stream_high_water_events` behind, which in turn stops reading
+    from LM Studio until the consumer catches up.
+    """
+
+    def __init__(self, stream_id: str, max_events: int):
+        self.stream_id = stream_id
+        self.events: deque[tuple[int, str]] = deque(maxlen=max_events)
+        self.next_seq = 0
+        self.done = False
+        self.created_at = time.monotonic()
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        self.subscribers = 0
+        self.resumable = False
+        self.cancel_requested_at: float | None = None
+        self.cancel_latency: float | None = None
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._positions: dict[object, int] = {}
+        self._expire_handle: asyncio.TimerHandle | None = None
+
+    # --- Producer side ---
+
+    def publish(self, chunk: str) -> None:
+        self.events.append((self.next_seq, chunk))
+        self.next_seq += 1
+        self._notify()
+
+    def lag(self) -> int:
+        """Events published but not yet consumed by the slowest subscriber."""
+        if not self._positions:
+            return 0
+        return self.next_seq - 1 - min(self._positions.values())
+
+    async def wait_writable(self) -> None:
+        while self.lag() >= settings.stream_high_water_events:
+            self._drained.clear()
+            await self._drained.wait()
+
+    def close(self) -> None:
+        if self.done:
+            return
+        self.done = True
+        self.finished_at = time.monotonic()
+        if self.cancel_requested_at is not None:
+            self.cancel_latency = self.finished_at - self.cancel_requested_at
+            print(f"[STREAMS] {self.stream_id} cancelled in {self.cancel_latency * 1000:.1f} ms")
+        if self._expire_handle:
+            self._expire_handle.cancel()
+            self._expire_handle = None
+        self._notify()
+
+    def cancel(self) -> bool:
+        """Cancel the producer task. Returns False if it already finished."""
+        if self.done or not self.task or self.cancel_requested_at is not None:
+            return False
+        self.cancel_requested_at = time.monotonic()
+        self.task.cancel()
+        return True
+
+    def _notify(self) -> None:
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    # --- Consumer side ---
+
+    def first_seq(self) -> int:
+        return self.events[0][0] if self.events else self.next_seq
+
+    def can_resume_from(self, last_seq: int) -> bool:
+        """True if every event after `last_seq` is still in the buffer."""
+        return last_seq + 1 >= self.first_seq()
+
+    async def iter_events(self, last_seq: int = -1,
+                          resumable: bool = True) -> AsyncIterator[tuple[int, str]]:
+        """Replay (seq, chunk) pairs after `last_seq`, then follow the live tail.
+
+        An event counts as consumed once the next one is requested.
+        `resumable` says whether this client reconnects after a drop.
+        """
+        subscriber = object()
+        self._attach(subscriber, last_seq, resumable)
+        try:
+            next_seq = last_seq + 1
+            while True:
+                wakeup = self._wakeup
+                first = self.first_seq()
+                next_seq = max(next_seq, first)
+                pending = list(islice(self.events, next_seq - first, None))
+                for seq, chunk in pending:
+                    yield seq, chunk
+                    next_seq = seq + 1
+                    self._positions[subscriber] = seq
+                    self._drained.set()
+                if next_seq >= self.next_seq:
+                    if self.done:
+                        return
+                    await wakeup.wait()
+        finally:
+            self._detach(subscriber)
+
+    async def subscribe(self, last_seq: int = -1, resumable: bool = True) -> AsyncIterator[str]:
+        """SSE view of iter_events, with each event's seq as its id."""
+        async for seq, chunk in self.iter_events(last_seq, resumable):
+            yield f"id: {seq}\n{chunk}"
+
+    def _attach(self, subscriber: object, last_seq: int, resumable: bool) -> None:
+        self.subscribers += 1
+        self.resumable = self.resumable or resumable
+        self._positions[subscriber] = last_seq
+        if self._expire_handle:
+            self._expire_handle.cancel()
+            self._expire_handle = None
+
+    def _detach(self, subscriber: object) -> None:
+        self.subscribers -= 1
+        self._positions.pop(subscriber, None)
+        self._drained.set()
+        if self.subscribers == 0 and not self.done:
+            if not self.resumable or settings.stream_resume_grace_seconds <= 0:
+                self.cancel()
+                return
+            loop = asyncio.get_running_loop()
+            self._expire_handle = loop.call_later(
+                settings.stream_resume_grace_seconds, self._expire,
+            )
+
+    def _expire(self) -> None:
+        self._expire_handle = None
+        if self.subscribers == 0 and not self.done:
+            print(f"[STREAMS] {self.stream_id} not resumed within grace period, cancelling")
+            self.cancel()
+
+
+class StreamRegistry:
+    """Keeps live and recently finished streams addressable by ID."""
+
+    def __init__(self):
+        self._streams: dict[str, StreamBuffer] = {}
+
+    def start(self, source: AsyncIterator[str]) -> StreamBuffer:
+        self._prune()
+        buffer = StreamBuffer(uuid.uuid4().hex, settings.stream_buffer_max_events)
+        buffer.task = asyncio.create_task(self._pump(buffer, source))
+        self._streams[buffer.stream_id] = buffer
+        return buffer
+
+    def get(self, stream_id: str) -> StreamBuffer | None:
+        self._prune()
+        return self._streams.get(stream_id)
+
+    async def _pump(self, buffer: StreamBuffer, source: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in source:
+                await buffer.wait_writable()
+                buffer.publish(chunk)
+        except asyncio.CancelledError:
+            buffer.publish(f"data: {json.dumps({'type': 'cancelled'})}\n\n")
+        except Exception as e:
+            buffer.publish(f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n")
+        finally:
+            buffer.close()
+
+    def stats(self) -> list[dict]:
+        self._prune()
+        now = time.monotonic()
+        return [
+            {
+                "stream_id": b.stream_id,
+                "done": b.done,
+                "age_s": round(now - b.created_at, 1),
+                "events": len(b.events),
+                "chars": sum(len(chunk) for _, chunk in b.events),
+                "subscribers": b.subscribers,
+                "lag": b.lag(),
+            }
+            for b in self._streams.values()
+        ]
+
+    def _prune(self) -> None:
+        """Drop finished streams whose replay window has elapsed."""
+        cutoff = time.monotonic() - settings.stream_resume_grace_seconds
+        expired = [
+            sid for sid, b in self._streams.items()
+            if b.done and b.finished_at is not None and b.finished_at < cutoff
+        ]
+        for sid in expired:
+            del self._streams[sid]
+
+
+stream_registry = StreamRegistry()
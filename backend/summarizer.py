@@ -0,0 +1,91 @@
+"""Extractive history summarizer that needs no LLM call.
+
+Splits the conversation into sentences, scores each one by TF-IDF
+similarity to the whole conversation plus a bonus for facts (names and
+numbers), then picks sentences greedily with maximal marginal relevance so
+near-duplicates are skipped. Picked sentences are kept in their original
+order under their speaker. Runs in milliseconds on the CPU.
+"""
+import re
+
+import numpy as np
+
+from textutil import FACT, STOPWORDS
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# Weight of similarity to already picked sentences versus relevance
+REDUNDANCY_WEIGHT = 0.4
+FACT_WEIGHT = 0.05
+# Sentences this similar to a picked one are dropped outright
+DUPLICATE_SIMILARITY = 0.85
+MIN_SENTENCE_CHARS = 12
+
+
+def split_sentences(text: str) -> list[str]:
+    return [s.strip() for s in _SENTENCE.split(text) if len(s.strip()) >= MIN_SENTENCE_CHARS]
+
+
+def _tfidf(sentences: list[str]) -> np.ndarray:
+    """Row-normalized TF-IDF matrix, one row per sentence."""
+    vocab: dict[str, int] = {}
+    rows, cols = [], []
+    for i, sentence in enumerate(sentences):
+        for word in _WORD.findall(sentence.lower()):
+            if word not in STOPWORDS and not word.isdigit():
+                rows.append(i)
+                cols.append(vocab.setdefault(word, len(vocab)))
+
+    tf = np.zeros((len(sentences), max(len(vocab), 1)), dtype=np.float32)
+    np.add.at(tf, (rows, cols), 1.0)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1.0
+    matrix = np.log1p(tf) * idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def summarize(messages: list[tuple[str, str]], max_tokens: int) -> str:
+    """Summarize (role, text) pairs into at most roughly `max_tokens` tokens."""
+    units = [
+        (role, sentence)
+        for role, text in messages
+        for sentence in split_sentences(text)
+    ]
+    if not units:
+        return ""
+
+    sentences = [s for _, s in units]
+    matrix = _tfidf(sentences)
+    centroid = matrix.mean(axis=0)
+    relevance = matrix @ centroid
+    relevance = relevance / (relevance.max() or 1.0)
+    relevance += FACT_WEIGHT * np.array([len(FACT.findall(s)) for s in sentences])
+
+    budget = max_tokens * 4  # same chars-per-token estimate as estimate_tokens
+    picked: list[int] = []
+    used = 0
+    max_sim = np.zeros(len(units), dtype=np.float32)
+    available = np.ones(len(units), dtype=bool)
+    while available.any():
+        scores = np.where(available, relevance - REDUNDANCY_WEIGHT * max_sim, -np.inf)
+        best = int(np.argmax(scores))
+        available[best] = False
+        if used + len(sentences[best]) > budget:
+            continue
+        picked.append(best)
+        used += len(sentences[best])
+        max_sim = np.maximum(max_sim, matrix @ matrix[best])
+        available &= max_sim < DUPLICATE_SIMILARITY
+
+    lines: list[str] = []
+    last_role = None
+    for i in sorted(picked):
+        role, sentence = units[i]
+        if role == last_role:
+            lines[-1] += f" {sentence}"
+        else:
+            lines.append(f"{role.upper()}: {sentence}")
+            last_role = role
+    return "\n".join(lines)
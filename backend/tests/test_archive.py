@@ -0,0 +1,32 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from config import settings
+from archive import Archive, parse_cursor
+
+
+def test_parse_cursor_round_trips_next_cursor():
+    assert parse_cursor("1700000000000:abc:def") == (1700000000000, "abc:def")
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "12:", "abc:id", ":id"])
+def test_malformed_cursor_is_a_bad_request(cursor, monkeypatch):
+    monkeypatch.setattr(settings, "archive_enabled", True)
+    response = TestClient(main.app).get("/archive/conversations", params={"cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_set_title_before_and_after_the_first_turn(tmp_path):
+    store = Archive(str(tmp_path / "archive.db"))
+    store.set_title("c1", "Early title")
+    assert store.list_conversations(10)["conversations"] == []  # no empty row
+
+    store.add_messages("c1", [("user", "hello there")], "m")
+    [row] = store.list_conversations(10)["conversations"]
+    assert row["title"] == "Early title"
+
+    store.set_title("c1", "Renamed")
+    [renamed] = store.list_conversations(10)["conversations"]
+    assert renamed["title"] == "Renamed"
+    assert renamed["updatedAt"] == row["updatedAt"]
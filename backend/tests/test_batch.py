@@ -0,0 +1,42 @@
+import asyncio
+import json
+
+import batch
+from schemas import BatchJobResult, ChatRequest
+
+
+def job(n: int) -> ChatRequest:
+    return ChatRequest(thread_id=f"t{n}", messages=[], new_message=f"job {n}")
+
+
+def run(jobs, delays, monkeypatch, concurrency=4, offset=0) -> list[dict]:
+    async def fake_run_job(batch_id, index, request):
+        await asyncio.sleep(delays[index])
+        return BatchJobResult(index=index, thread_id=request.thread_id, status="ok")
+
+    monkeypatch.setattr(batch, "run_job", fake_run_job)
+
+    async def collect():
+        return [json.loads(line) async for line in batch.run_batch(jobs, concurrency, offset)]
+
+    return asyncio.run(collect())
+
+
+def test_resume_offset_counts_only_the_finished_prefix(monkeypatch):
+    jobs = [job(0), job(1), job(2), job(3)]
+    results = run(jobs, [0.06, 0.02, 0.04, 0.0], monkeypatch)
+    assert [(r["index"], r["resume_offset"]) for r in results] == [(3, 0), (1, 0), (2, 0), (0, 4)]
+
+
+def test_invalid_jobs_advance_the_offset(monkeypatch):
+    jobs = ["Invalid job: bad", job(1), job(2)]
+    results = run(jobs, [0, 0.04, 0.02], monkeypatch)
+    assert [(r["index"], r["status"], r["resume_offset"]) for r in results] == [
+        (0, "invalid", 1), (2, "ok", 1), (1, "ok", 3),
+    ]
+
+
+def test_resuming_skips_jobs_before_the_offset(monkeypatch):
+    jobs = [job(0), job(1), job(2), job(3)]
+    results = run(jobs, [0.0, 0.0, 0.03, 0.0], monkeypatch, concurrency=1, offset=2)
+    assert [(r["index"], r["resume_offset"]) for r in results] == [(2, 3), (3, 4)]
@@ -0,0 +1,72 @@
+import pytest
+
+from config import settings
+from filesearch import FileIndex, nested_quantifier
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    (tmp_path / "notes.txt").write_text("Café com leite\nplain line\n", encoding="utf-8")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "main.py").write_text("def handler():\n    return 1\n", encoding="utf-8")
+    monkeypatch.setattr(settings, "file_search_roots", [str(tmp_path)])
+    monkeypatch.setattr(settings, "file_search_content", True)
+    monkeypatch.setattr(settings, "file_search_content_index", True)
+    return FileIndex()
+
+
+def test_content_search_is_opt_in(index, monkeypatch):
+    monkeypatch.setattr(settings, "file_search_content", False)
+    assert index.search("*", content_regex="handler")["status"] == "error"
+    assert index.search("*.py")["results"]
+
+
+def test_nested_quantifiers_are_rejected(index):
+    assert nested_quantifier("(a+)+$")
+    assert nested_quantifier(r"(?:\w*\s?)*x")
+    assert not nested_quantifier(r"def \w+\(")
+    result = index.search("*", content_regex="(a+)+$")
+    assert result["status"] == "error"
+    assert "nested quantifiers" in result["message"]
+
+
+def test_ignore_case_matches_non_ascii(index):
+    result = index.search("*", content_regex="CAFÉ", ignore_case=True)
+    assert [m["text"] for r in result["results"] for m in r["matches"]] == ["Café com leite"]
+    assert index.search("*", content_regex="CAFÉ")["results"] == []
+
+
+def test_ascii_content_search_uses_trigrams(index):
+    result = index.search("*", content_regex=r"HANDLER\(", ignore_case=True)
+    assert [(r["path"].rsplit("/", 1)[-1], r["matches"][0]["line"]) for r in result["results"]] == [("main.py", 1)]
+
+
+@pytest.fixture
+def contained(tmp_path, monkeypatch):
+    tmp_path = tmp_path.resolve()  # the index compares real paths
+    root = tmp_path / "root"
+    (root / "docs").mkdir(parents=True)
+    (root / "docs" / "inside.txt").write_text("inside\n", encoding="utf-8")
+    sibling = tmp_path / "root2"
+    sibling.mkdir()
+    (sibling / "secret.txt").write_text("secret\n", encoding="utf-8")
+    (root / "escape").symlink_to(sibling, target_is_directory=True)
+    monkeypatch.setattr(settings, "file_search_roots", [str(root)])
+    return FileIndex(), root, sibling
+
+
+def test_resolve_root_stays_inside_configured_roots(contained):
+    index, root, sibling = contained
+    assert index.resolve_root(str(root / "docs")) == str(root / "docs")
+    assert index.resolve_root(str(root / "docs" / ".." / "..")) is None
+    assert index.resolve_root(str(sibling)) is None  # shares the root's name as a prefix
+    assert index.resolve_root(str(root / "escape")) is None  # symlink out of the root
+
+
+def test_search_never_leaves_the_roots(contained):
+    index, root, sibling = contained
+    result = index.search("*.txt")
+    assert [r["path"] for r in result["results"]] == [str(root / "docs" / "inside.txt")]
+    outside = index.search("*", root=str(sibling))
+    assert outside["status"] == "error"
+    assert index.search("*", root=str(root / "escape"))["status"] == "error"
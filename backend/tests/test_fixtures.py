@@ -0,0 +1,42 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from fixtures import FixtureNotFound, RecordingTransport, ReplayTransport
+
+URL = "http://lmstudio.test/v1/chat/completions"
+BODY = {"model": "m", "stream": True, "messages": [{"role": "user", "content": "olá"}]}
+SSE = (
+    'data: {"choices":[{"delta":{"content":"<think>hmm</think>"}}]}\n\n'
+    'data: {"choices":[{"delta":{"content":"Olá!"}}]}\n\n'
+    "data: [DONE]\n\n"
+).encode("utf-8")
+
+
+def lm_studio(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=SSE)
+
+
+async def fetch(transport: httpx.AsyncBaseTransport, body: dict) -> tuple[int, str, bytes]:
+    async with httpx.AsyncClient(transport=transport) as client:
+        async with client.stream("POST", URL, json=body) as response:
+            data = b"".join([chunk async for chunk in response.aiter_raw()])
+            return response.status_code, response.headers["content-type"], data
+
+
+def test_recorded_response_replays_byte_for_byte(tmp_path):
+    recorded = asyncio.run(fetch(RecordingTransport(tmp_path, httpx.MockTransport(lm_studio)), BODY))
+    assert recorded == (200, "text/event-stream", SSE)
+    [fixture] = tmp_path.glob("*.json")
+    assert json.loads(fixture.read_text(encoding="utf-8"))["request"]["body"] == BODY
+
+    # Key order in the body does not change the fixture key
+    reordered = dict(reversed(list(BODY.items())))
+    assert asyncio.run(fetch(ReplayTransport(tmp_path, speed=0), reordered)) == recorded
+
+
+def test_unrecorded_request_raises_fixture_not_found(tmp_path):
+    with pytest.raises(FixtureNotFound, match="No fixture"):
+        asyncio.run(fetch(ReplayTransport(tmp_path, speed=0), {**BODY, "model": "other"}))
@@ -0,0 +1,55 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, StateGraph
+
+import graph
+from graph import GraphState, _graph_events, node_tool_executor
+
+
+def test_tool_results_stream_before_the_step_finishes(monkeypatch):
+    fast_reported = threading.Event()
+    waited = []
+
+    def slow(args):
+        # Only unblocks if the fast result already reached the client
+        waited.append(fast_reported.wait(timeout=5))
+        return json.dumps({"status": "success", "tool": "slow"})
+
+    monkeypatch.setattr(graph, "ALL_TOOLS", [
+        SimpleNamespace(name="fast", invoke=lambda args: json.dumps({"status": "success", "tool": "fast"})),
+        SimpleNamespace(name="slow", invoke=slow),
+    ])
+    only_tools = StateGraph(GraphState)
+    only_tools.add_node("tool_node", node_tool_executor)
+    only_tools.set_entry_point("tool_node")
+    only_tools.add_edge("tool_node", END)
+    monkeypatch.setattr(graph, "compiled_graph", only_tools.compile(checkpointer=MemorySaver()))
+
+    calls = AIMessage(content="", tool_calls=[
+        {"name": "fast", "args": {}, "id": "call-1"},
+        {"name": "slow", "args": {}, "id": "call-2"},
+    ])
+
+    async def scenario():
+        events = []
+        config = {"configurable": {"thread_id": "graph-events-test"}}
+        async for chunk in _graph_events({"messages": [calls]}, config):
+            event = json.loads(chunk[6:])
+            events.append(event)
+            if event["type"] == "tool_result" and json.loads(event["content"])["tool"] == "fast":
+                fast_reported.set()
+        return events
+
+    try:
+        events = asyncio.run(scenario())
+    finally:
+        graph.discard_thread("graph-events-test")
+
+    assert waited == [True]
+    assert [e["type"] for e in events] == ["tool_start", "tool_result", "tool_start", "tool_result", "status"]
+    assert [json.loads(e["content"])["name"] for e in events if e["type"] == "tool_start"] == ["fast", "slow"]
@@ -0,0 +1,43 @@
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from graph import discard_thread, resolve_payloads
+from payloads import INLINE_MAX_CHARS, REF_PREFIX, PayloadStore, payloads
+
+
+def test_small_values_stay_inline():
+    store = PayloadStore()
+    assert store.wrap("t", "short") == "short"
+    assert store.stats()["payloads"] == 0
+
+
+def test_large_values_round_trip_through_a_reference():
+    store = PayloadStore()
+    data = "x" * (INLINE_MAX_CHARS + 1)
+    ref = store.wrap("t", data)
+    assert ref.startswith(REF_PREFIX)
+    assert store.resolve(ref) == data
+    assert store.resolve(42) == 42
+    assert store.thread_stats("t") == {"payloads": 1, "chars_by_kind": {"tool": len(data)}}
+
+
+def test_discarded_thread_resolves_to_empty():
+    store = PayloadStore()
+    ref = store.put("t", "image-bytes", kind="image")
+    store.discard_thread("t")
+    assert store.resolve(ref) == ""
+    assert store.stats()["payloads"] == 0
+
+
+def test_resolve_payloads_swaps_tool_messages_only():
+    output = "y" * (INLINE_MAX_CHARS + 1)
+    ref = payloads.wrap("payload-test", output)
+    tool = ToolMessage(content=ref, tool_call_id="call-1")
+    human = HumanMessage(content=REF_PREFIX + "not-a-tool-message")
+    try:
+        resolved = resolve_payloads([human, tool])
+        assert resolved[0] is human
+        assert resolved[1].content == output
+        assert tool.content == ref  # the checkpointed message keeps its reference
+    finally:
+        discard_thread("payload-test")
+    assert payloads.resolve(ref) == ""
@@ -0,0 +1,69 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import prefetch
+from config import settings
+from prefetch import SpeculativeSearch, coverage, derive_query, extra_terms
+
+
+def test_derive_query_drops_stopwords_and_caps_terms():
+    assert derive_query("What is the weather in Lisbon today?") == "weather lisbon today"
+    assert derive_query("Qual é a cotação do dólar hoje?") == "cotação dólar hoje"
+    assert len(derive_query(" ".join(f"term{i}" for i in range(30))).split()) == prefetch.MAX_QUERY_TERMS
+    assert derive_query("what is it?") == ""
+
+
+def test_coverage_and_extra_terms():
+    assert coverage("weather lisbon today", "lisbon weather") == 1.0
+    assert coverage("weather lisbon", "lisbon weather forecast tomorrow") == 0.5
+    assert coverage("weather lisbon", "") == 0.0
+    assert extra_terms("weather lisbon today", "lisbon weather") == 1
+    assert extra_terms("a1 a2 a3 a4 a5 lisbon", "lisbon") == 5
+
+
+def run_take(monkeypatch, result: str, requested: str, message="weather in Lisbon today"):
+    monkeypatch.setattr(settings, "speculative_search_enabled", True)
+    monkeypatch.setattr(prefetch, "web_search", SimpleNamespace(invoke=lambda args: result))
+    search = SpeculativeSearch()
+
+    async def scenario():
+        search.start("t", message)
+        return await search.take("t", {"query": requested})
+
+    return search, asyncio.run(scenario())
+
+
+SUCCESS = json.dumps({"status": "success", "query": "weather lisbon today", "results": []})
+
+
+def test_matching_query_is_a_hit(monkeypatch):
+    search, result = run_take(monkeypatch, SUCCESS, "Lisbon weather today")
+    assert result == SUCCESS
+    assert (search.stats["hits"], search.stats["misses"]) == (1, 0)
+
+
+@pytest.mark.parametrize("failure", [
+    json.dumps({"status": "error", "message": "Search failed: timeout"}),
+    "not json",
+])
+def test_failed_speculative_search_is_a_miss(monkeypatch, failure):
+    search, result = run_take(monkeypatch, failure, "Lisbon weather today")
+    assert result is None  # the caller runs the live search
+    assert (search.stats["hits"], search.stats["misses"]) == (0, 1)
+
+
+def test_unrelated_or_much_broader_query_is_a_miss(monkeypatch):
+    search, result = run_take(monkeypatch, SUCCESS, "stock price of ACME")
+    assert result is None and search.stats["misses"] == 1
+    broad = "weather Lisbon today tomorrow beaches restaurants hotels museums"
+    search, result = run_take(monkeypatch, SUCCESS, "Lisbon weather", message=broad)
+    assert result is None and search.stats["misses"] == 1
+
+
+def test_take_without_speculation_counts_nothing(monkeypatch):
+    search = SpeculativeSearch()
+    assert asyncio.run(search.take("t", {"query": "x"})) is None
+    assert search.report()["hit_rate"] is None
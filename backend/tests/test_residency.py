@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from config import settings
+from residency import ModelResidency
+
+
+def test_recent_use_outranks_an_older_burst(monkeypatch):
+    monkeypatch.setattr(settings, "residency_half_life_seconds", 60.0)
+    monkeypatch.setattr(settings, "residency_max_hot_models", 1)
+    residency = ModelResidency()
+    now = time.monotonic()
+    residency._recent.extend((now - 600, "old-favourite") for _ in range(5))
+    residency._recent.append((now - 5, "current"))
+    assert residency.popular_models() == ["current"]
+
+
+def test_selected_model_is_always_kept_hot(monkeypatch):
+    monkeypatch.setattr(settings, "residency_warm_models", [])
+    monkeypatch.setattr(settings, "residency_max_hot_models", 1)
+    monkeypatch.setattr(settings, "aux_model", None)
+    residency = ModelResidency()
+    for _ in range(10):
+        residency.record_request("popular")
+    residency.record_request("selected")
+    warmed = []
+
+    async def fake_warm(model):
+        warmed.append(model)
+        return True
+
+    monkeypatch.setattr(residency, "warm", fake_warm)
+    asyncio.run(residency._maintain())
+    assert sorted(warmed) == ["popular", "selected"]
+
+
+def test_bad_startup_refresh_does_not_stop_maintenance(monkeypatch):
+    monkeypatch.setattr(settings, "residency_warm_models", [])
+    monkeypatch.setattr(settings, "residency_ping_interval_seconds", 0.01)
+    residency = ModelResidency()
+    calls = []
+
+    async def bad_refresh():
+        calls.append("refresh")
+        raise KeyError("id")  # malformed /v1/models body
+
+    async def maintain():
+        calls.append("maintain")
+
+    monkeypatch.setattr(residency, "refresh", bad_refresh)
+    monkeypatch.setattr(residency, "_maintain", maintain)
+
+    async def scenario():
+        task = asyncio.create_task(residency._run())
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert calls.count("refresh") > 1
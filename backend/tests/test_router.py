@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import pytest
+
+from router import evaluate, route_message
+
+FIXTURES = Path(__file__).resolve().parent.parent / "router_fixtures.jsonl"
+
+
+@pytest.mark.parametrize("message", [
+    "yes, do it",
+    "ok, try again",
+    "no, search again",
+    "yes please run it",
+    "run python --version",
+    "what sql server instances are running",
+])
+def test_follow_ups_and_commands_keep_tools(message):
+    assert route_message(message, True, True)["route"] != "no_tools"
+
+
+@pytest.mark.parametrize("message", ["hi!", "thanks, that helped", "bom dia", "thank you so much!"])
+def test_bare_small_talk_skips_tools(message):
+    assert route_message(message, True, True, follows_tool=True)["route"] == "no_tools"
+
+
+def test_reply_to_tool_offer_keeps_tools():
+    assert route_message("ok", True, True)["route"] == "no_tools"
+    assert route_message("ok", True, True, follows_tool=True)["route"] == "tools"
+
+
+def test_fixture_mistakes_are_known():
+    report = evaluate(str(FIXTURES))
+    assert [m["message"] for m in report["mistakes"]] == [
+        "Explain the difference between a process and a thread",
+    ]
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from streams import StreamRegistry
+
+CANCEL_BOUND_SECONDS = 1.0
+
+
+def event(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def endless_source(state: dict):
+    async def source():
+        try:
+            n = 0
+            while True:
+                yield event({"type": "token", "content": str(n)})
+                n += 1
+                state["produced"] = n
+                await asyncio.sleep(0.01)
+        finally:
+            state["closed"] = True
+    return source()
+
+
+def test_cancel_mid_stream_stops_the_pump():
+    async def scenario():
+        state = {"produced": 0, "closed": False}
+        buffer = StreamRegistry().start(endless_source(state))
+        received = []
+        async for _, chunk in buffer.iter_events():
+            received.append(json.loads(chunk[6:]))
+            if len(received) == 3:
+                assert buffer.cancel()
+        await asyncio.wait_for(buffer.task, CANCEL_BOUND_SECONDS)
+
+        assert received[-1] == {"type": "cancelled"}
+        assert buffer.done and buffer.cancel_latency < CANCEL_BOUND_SECONDS
+        assert state["closed"]
+        produced = state["produced"]
+        await asyncio.sleep(0.05)
+        assert state["produced"] == produced
+
+    asyncio.run(scenario())
+
+
+async def read_then_drop(buffer, resumable: bool) -> None:
+    events = buffer.iter_events(resumable=resumable)
+    await anext(events)
+    await events.aclose()
+
+
+def test_disconnect_without_resume_cancels_immediately():
+    async def scenario():
+        state = {"produced": 0, "closed": False}
+        buffer = StreamRegistry().start(endless_source(state))
+        await read_then_drop(buffer, resumable=False)
+        await asyncio.wait_for(buffer.task, CANCEL_BOUND_SECONDS)
+        assert buffer.events[-1][1] == event({"type": "cancelled"})
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_with_resume_keeps_generating():
+    async def scenario():
+        state = {"produced": 0, "closed": False}
+        buffer = StreamRegistry().start(endless_source(state))
+        await read_then_drop(buffer, resumable=True)
+        await asyncio.sleep(0.1)
+        assert not buffer.done and not state["closed"]
+        buffer.cancel()
+        await asyncio.wait_for(buffer.task, CANCEL_BOUND_SECONDS)
+
+    asyncio.run(scenario())
@@ -0,0 +1,36 @@
+from summarizer import split_sentences, summarize
+
+HISTORY = [
+    ("human", "I'm planning a trip to Lisbon in May with a budget of 1500 EUR. "
+              "I also want to visit Sintra and Porto."),
+    ("ai", "May is a great month for Lisbon. Budget around 80 EUR per night in Alfama. "
+           "Spend 4 days in Lisbon with a day trip to Sintra, then 3 days in Porto by train."),
+    ("human", "I'm planning a trip to Lisbon in May with a budget of 1500 EUR. "
+              "Is the train to Porto easy to book?"),
+    ("ai", "Yes, book the Alfa Pendular train online; it takes about 3 hours."),
+]
+
+
+def test_empty_history_gives_empty_summary():
+    assert summarize([], 100) == ""
+    assert summarize([("human", "ok")], 100) == ""  # below the minimum sentence length
+
+
+def test_summary_fits_the_token_budget():
+    for max_tokens in (15, 40, 400):
+        assert len(summarize(HISTORY, max_tokens)) <= max_tokens * 4 + 40  # plus role labels
+
+
+def test_duplicate_sentences_are_kept_once():
+    summary = summarize(HISTORY, 400)
+    assert summary.count("planning a trip to Lisbon") == 1
+
+
+def test_sentences_keep_their_order_and_speaker():
+    summary = summarize(HISTORY, 400)
+    lines = summary.splitlines()
+    assert lines[0].startswith("HUMAN: I'm planning a trip")
+    assert all(line.startswith(("HUMAN: ", "AI: ")) for line in lines)
+    sentences = dict.fromkeys(s for _, text in HISTORY for s in split_sentences(text))
+    positions = [summary.index(s) for s in sentences if s in summary]
+    assert positions == sorted(positions)
@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import main
+import ws
+from config import settings
+from schemas import ChatRequest
+
+HEALTH = {"type": "health", "online": True, "models": ["m"], "status": {}}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def fake_health():
+        return HEALTH
+
+    monkeypatch.setattr(ws, "health_snapshot", fake_health)
+    # No `with`: the lifespan (residency polling, file indexing) is not needed here
+    return TestClient(main.app)
+
+
+def test_foreign_origin_is_rejected(client):
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/ws", headers={"origin": "https://evil.example"}) as sock:
+            sock.receive_json()
+    assert exc.value.code == 1008
+
+
+def test_allowed_origin_connects(client):
+    with client.websocket_connect("/ws", headers={"origin": settings.cors_origins[0]}) as sock:
+        assert sock.receive_json() == HEALTH
+
+
+TOTAL_EVENTS = 10
+
+
+async def numbered_events(request: ChatRequest):
+    for n in range(TOTAL_EVENTS):
+        yield f"data: {json.dumps({'type': 'token', 'content': str(n)})}\n\n"
+
+
+@pytest.fixture
+def credit_client(monkeypatch):
+    async def fake_health():
+        return HEALTH
+
+    async def no_push(self):
+        pass
+
+    monkeypatch.setattr(ws, "health_snapshot", fake_health)
+    monkeypatch.setattr(ws.ChatConnection, "_push_health", no_push)
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def endpoint(websocket: WebSocket):
+        await websocket.accept()
+        await ws.ChatConnection(websocket, {"chat": (ChatRequest, numbered_events)}).run()
+
+    return TestClient(app)
+
+
+def test_credit_window_limits_unacknowledged_events(credit_client):
+    request = {"thread_id": "t", "messages": [], "new_message": "hi"}
+    with credit_client.websocket_connect("/ws") as sock:
+        sock.send_json({"op": "chat", "id": "a", "request": request, "credit": 3})
+        first = [sock.receive_json() for _ in range(3)]
+        assert [f["event"]["content"] for f in first] == ["0", "1", "2"]
+        assert [f["seq"] for f in first] == [0, 1, 2]
+
+        # Out of credit: the next frame is the reply to this op, not an event
+        sock.send_json({"op": "health"})
+        assert sock.receive_json() == HEALTH
+
+        sock.send_json({"op": "credit", "id": "a", "n": TOTAL_EVENTS})
+        rest = [sock.receive_json() for _ in range(TOTAL_EVENTS - 3)]
+        assert [f["seq"] for f in rest] == list(range(3, TOTAL_EVENTS))
+        assert sock.receive_json() == {"id": "a", "end": True}
+
+
+@pytest.mark.parametrize("credit", [0, -5, "lots"])
+def test_non_positive_credit_is_rejected(credit_client, credit):
+    request = {"thread_id": "t", "messages": [], "new_message": "hi"}
+    with credit_client.websocket_connect("/ws") as sock:
+        sock.send_json({"op": "chat", "id": "a", "request": request, "credit": credit})
+        assert sock.receive_json() == {"id": "a", "error": ws.CREDIT_ERROR}
+        sock.send_json({"op": "credit", "id": "a", "n": credit})
+        assert sock.receive_json() == {"id": "a", "error": ws.CREDIT_ERROR}
+
+
+def test_health_snapshot_is_shared_across_connections(monkeypatch):
+    monkeypatch.setattr(settings, "ws_health_interval_seconds", 60.0)
+    probes = []
+
+    async def probe():
+        probes.append(1)
+        await asyncio.sleep(0.01)
+        return HEALTH
+
+    monkeypatch.setattr(ws, "_probe_health", probe)
+    monkeypatch.setattr(ws, "_health_cache", ws._HealthCache())
+
+    async def scenario():
+        return await asyncio.gather(*(ws.health_snapshot() for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [HEALTH] * 5
+    assert asyncio.run(ws.health_snapshot()) == HEALTH
+    assert len(probes) == 1
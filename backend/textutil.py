@@ -0,0 +1,20 @@
+"""Text helpers shared by the query builder, summarizer and benchmarks."""
+import re
+
+# Words too common to carry meaning in a search query or a summary score
+STOPWORDS = {
+    # English
+    "a", "an", "the", "is", "are", "was", "were", "be", "what", "whats", "who", "how",
+    "when", "where", "which", "why", "do", "does", "did", "can", "could", "would",
+    "should", "will", "i", "me", "my", "you", "your", "it", "its", "of", "in", "on",
+    "at", "to", "for", "from", "with", "about", "and", "or", "please", "tell", "show",
+    "find", "search", "look", "up", "give", "s",
+    # Portuguese
+    "o", "os", "as", "um", "uma", "de", "do", "da", "dos", "das", "no", "na", "nos",
+    "nas", "em", "para", "por", "com", "que", "qual", "quais", "quem", "como", "quando",
+    "onde", "é", "e", "eu", "me", "meu", "minha", "você", "voce", "sobre", "pesquise",
+    "procure", "busque", "mostre", "diga",
+}
+
+# Capitalized terms and numbers: names, places, versions, amounts
+FACT = re.compile(r"\b(?:[A-Z][\w-]+|\d[\d.,]*)\b")
@@ -0,0 +1,130 @@
+"""Compare the main and auxiliary model tiers on housekeeping tasks.
+
+Runs title generation and history summarization on both tiers over a set
+of samples and reports latency plus simple quality signals:
+
+    python tiers.py [samples.jsonl] [--main MODEL] [--aux MODEL]
+
+Each JSONL sample has either `message` (title task) or `history`, a list
+of {"role", "content"} dicts (summary task). Without a file, a few
+built-in samples are used.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from config import settings
+from graph import (
+    SUMMARY_PROMPT, TITLE_SYSTEM_PROMPT, TITLE_USER_PROMPT, get_llm, _clean_title,
+)
+from textutil import FACT
+
+BUILTIN_SAMPLES = [
+    {"message": "Como configuro um proxy reverso com nginx para uma API FastAPI?"},
+    {"message": "What are the trade-offs between Postgres and SQLite for a desktop app?"},
+    {"history": [
+        {"role": "user", "content": "I'm planning a trip to Lisbon in May with a budget of 1500 EUR."},
+        {"role": "assistant", "content": "May is a great month. Budget around 80 EUR/night for Alfama or Baixa."},
+        {"role": "user", "content": "I also want to visit Sintra and Porto. I have 7 days total."},
+        {"role": "assistant", "content": "Spend 4 days in Lisbon with a day trip to Sintra, then 3 days in Porto by train (about 3 hours)."},
+    ]},
+]
+
+
+def fact_retention(source: str, summary: str) -> float:
+    """Share of capitalized terms and numbers from `source` kept in `summary`."""
+    facts = set(FACT.findall(source))
+    if not facts:
+        return 1.0
+    kept = sum(1 for f in facts if f in summary)
+    return round(kept / len(facts), 3)
+
+
+def history_text(history: list[dict]) -> str:
+    return "\n".join(f"{m['role'].upper()}: {m['content']}" for m in history)
+
+
+async def run_title(model: str, base_url: str | None, message: str) -> str:
+    llm = get_llm(model, temperature=0.1, base_url=base_url)
+    response = await llm.ainvoke([
+        SystemMessage(content=TITLE_SYSTEM_PROMPT),
+        HumanMessage(content=TITLE_USER_PROMPT.format(message=message[:300])),
+    ])
+    return _clean_title(response.content or "")
+
+
+async def run_summary(model: str, base_url: str | None, history: list[dict]) -> str:
+    llm = get_llm(model, base_url=base_url)
+    response = await llm.ainvoke([
+        HumanMessage(content=SUMMARY_PROMPT.format(history=history_text(history))),
+    ])
+    return response.content or ""
+
+
+async def compare(samples: list[dict], tiers: dict[str, tuple[str, str | None]]) -> dict:
+    report: dict = {"tiers": {name: model for name, (model, _) in tiers.items()}, "results": []}
+    latencies: dict[str, list[float]] = {name: [] for name in tiers}
+    failures: dict[str, int] = {name: 0 for name in tiers}
+    retention: dict[str, list[float]] = {name: [] for name in tiers}
+
+    for sample in samples:
+        row: dict = {"task": "title" if "message" in sample else "summary", "outputs": {}}
+        for name, (model, base_url) in tiers.items():
+            started = time.perf_counter()
+            try:
+                if "message" in sample:
+                    output = await run_title(model, base_url, sample["message"])
+                else:
+                    output = await run_summary(model, base_url, sample["history"])
+                    retention[name].append(fact_retention(history_text(sample["history"]), output))
+            except Exception as e:
+                failures[name] += 1
+                output = f"<error: {e}>"
+            elapsed = (time.perf_counter() - started) * 1000
+            latencies[name].append(elapsed)
+            row["outputs"][name] = {"output": output, "ms": round(elapsed, 1)}
+        report["results"].append(row)
+
+    report["summary"] = {
+        name: {
+            "mean_ms": round(statistics.mean(latencies[name]), 1) if latencies[name] else None,
+            "max_ms": round(max(latencies[name]), 1) if latencies[name] else None,
+            "failures": failures[name],
+            "summary_fact_retention": (
+                round(statistics.mean(retention[name]), 3) if retention[name] else None
+            ),
+        }
+        for name in tiers
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("samples", nargs="?")
+    parser.add_argument("--main", default=settings.lm_studio_model)
+    parser.add_argument("--aux", default=settings.aux_model)
+    args = parser.parse_args()
+
+    if not args.aux:
+        parser.error("no auxiliary model configured (set AUX_MODEL or pass --aux)")
+
+    if args.samples:
+        with open(args.samples, encoding="utf-8") as f:
+            samples = [json.loads(line) for line in f if line.strip()]
+    else:
+        samples = BUILTIN_SAMPLES
+
+    tiers = {
+        "main": (args.main, settings.lm_studio_url),
+        "aux": (args.aux, settings.aux_lm_studio_url),
+    }
+    print(json.dumps(asyncio.run(compare(samples, tiers)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ import subprocess
 from langchain_core.tools import tool
 from duckduckgo_search import DDGS
 
+from filesearch import file_index
+
 IS_WINDOWS = platform.system() == "Windows"
 
 
@@ -110,6 +112,39 @@ BLOCKED_TOKENS = {
 }
 
 
+def validate_command(command: str) -> str | None:
+    """Return a "blocked" JSON result if `command` is not allowed, else None."""
+    cmd_lower = command.lower().strip()
+
+    # Blocklist check (on the full command string)
+    for blocked in BLOCKED_TOKENS:
+        if blocked in cmd_lower:
+            return json.dumps({
+                "status": "blocked",
+                "command": command,
+                "message": f"Command blocked for safety: contains '{blocked.strip()}'",
+            })
+
+    # Split by pipe to validate each segment of a pipeline
+    segments = [s.strip() for s in cmd_lower.split("|")]
+
+    for segment in segments:
+        if not segment:
+            continue
+        base_cmd = segment.split()[0] if segment.split() else ""
+        two_word = " ".join(segment.split()[:2]) if len(segment.split()) > 1 else ""
+        allowed = base_cmd in ALLOWED_COMMANDS or two_word in ALLOWED_COMMANDS
+
+        if not allowed:
+            return json.dumps({
+                "status": "blocked",
+                "command": command,
+                "message": f"Command '{base_cmd}' is not in the allowed commands list.",
+            })
+
+    return None
+
+
 @tool
 def terminal_execute(command: str, working_directory: str = ".") -> str:
     """Execute a read-only shell command on the user's machine.
@@ -117,33 +152,9 @@ def terminal_execute(command: str, working_directory: str = ".") -> str:
     read file contents, or get system information.
     Only safe, read-only commands are permitted."""
     try:
-        cmd_lower = command.lower().strip()
-
-        # Blocklist check (on the full command string)
-        for blocked in BLOCKED_TOKENS:
-            if blocked in cmd_lower:
-                return json.dumps({
-                    "status": "blocked",
-                    "command": command,
-                    "message": f"Command blocked for safety: contains '{blocked.strip()}'",
-                })
-
-        # Split by pipe to validate each segment of a pipeline
-        segments = [s.strip() for s in cmd_lower.split("|")]
-
-        for segment in segments:
-            if not segment:
-                continue
-            base_cmd = segment.split()[0] if segment.split() else ""
-            two_word = " ".join(segment.split()[:2]) if len(segment.split()) > 1 else ""
-            allowed = base_cmd in ALLOWED_COMMANDS or two_word in ALLOWED_COMMANDS
-
-            if not allowed:
-                return json.dumps({
-                    "status": "blocked",
-                    "command": command,
-                    "message": f"Command '{base_cmd}' is not in the allowed commands list.",
-                })
+        blocked = validate_command(command)
+        if blocked is not None:
+            return blocked
 
         cwd = working_directory if working_directory != "." else None
 
@@ -197,11 +208,26 @@ def terminal_execute(command: str, working_directory: str = ".") -> str:
         })
 
 
-def execute_terminal_command(command: str, working_directory: str = ".") -> dict:
-    """Execute a terminal command directly (used by the approval endpoint).
-    Returns a parsed dict instead of a JSON string."""
-    result_json = terminal_execute.invoke({"command": command, "working_directory": working_directory})
-    return json.loads(result_json)
+# --- File search tool ---
+
+@tool
+def file_search(
+    pattern: str = "*",
+    content_regex: str | None = None,
+    root: str | None = None,
+    max_results: int = 50,
+    ignore_case: bool = False,
+) -> str:
+    """Find files on the user's machine by name and, optionally, by content.
+    `pattern` is a glob matched against the file name (or against the path
+    relative to `root` when it contains a slash), e.g. "*.py" or "src/**/*.ts".
+    `content_regex` keeps only files with a matching line and returns those
+    lines (only if content search is enabled; no nested quantifiers). `root` narrows the search to a folder inside the searchable roots.
+    Much faster than find, grep or Get-ChildItem -Recurse, and read-only."""
+    try:
+        return json.dumps(file_index.search(pattern, content_regex, root, max_results, ignore_case))
+    except Exception as e:
+        return json.dumps({"status": "error", "message": f"File search failed: {str(e)}"})
 
 
-ALL_TOOLS = [web_search, terminal_execute]
+ALL_TOOLS = [web_search, terminal_execute, file_search]
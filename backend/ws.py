@@ -0,0 +1,265 @@
+"""Multiplexed WebSocket transport for chat streams.
+
+One connection carries any number of concurrent chat turns, terminal
+approval resumes and LM Studio health pushes. Every stream still runs
+behind a StreamBuffer, exactly like the SSE endpoints, so a turn started
+here can be resumed after a reconnect (over the socket or via SSE).
+
+Client -> server (JSON text frames; `id` is chosen by the client):
+
+    {"op": "chat", "id": "a", "request": {...ChatRequest}, "credit": 64}
+    {"op": "terminal_resume", "id": "b", "request": {...TerminalResumeRequest}}
+    {"op": "resume", "id": "c", "stream_id": "...", "last_seq": 41}
+    {"op": "credit", "id": "a", "n": 32}
+    {"op": "cancel", "id": "a"}
+    {"op": "health"}
+
+Server -> client:
+
+    {"id": "a", "stream_id": "...", "seq": 0, "event": {"type": "token", ...}}
+    {"id": "a", "end": true}
+    {"type": "health", "online": true, "models": [...], "status": {...}}
+    {"id": "a", "error": "..."}
+
+`event` is the same object the SSE path sends as `data:`. Each stream has
+a credit window: the server sends at most `credit` events before waiting
+for a `credit` op. `credit` and `n` must be positive integers; anything
+else is answered with an error. A stream that runs out of credit stops
+consuming its buffer, and once it is `stream_high_water_events` behind,
+generation for that stream pauses. Other streams on the connection are unaffected.
+
+Health pushes come from one snapshot shared by all connections, probed
+at most once per `ws_health_interval_seconds`.
+"""
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Callable
+
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, ValidationError
+
+from config import settings
+from residency import residency
+from streams import StreamBuffer, stream_registry
+
+Sources = dict[str, tuple[type[BaseModel], Callable[[BaseModel], AsyncIterator[str]]]]
+
+
+def sse_payload(chunk: str) -> dict:
+    """Decode a `data: {...}` chunk back into its event object."""
+    data = "".join(
+        line[6:] for line in chunk.splitlines() if line.startswith("data: ")
+    )
+    return json.loads(data)
+
+
+async def _probe_health() -> dict:
+    try:
+        models = await residency.refresh()
+        return {
+            "type": "health",
+            "online": True,
+            "models": models,
+            "status": {m: residency.status(m) for m in models},
+        }
+    except Exception:
+        return {"type": "health", "online": False, "models": [], "status": {}}
+
+
+class _HealthCache:
+    """One LM Studio probe per `ws_health_interval_seconds`, shared by
+    every connection instead of one per socket."""
+
+    def __init__(self):
+        self._snapshot: dict | None = None
+        self._taken_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> dict:
+        async with self._lock:
+            now = time.monotonic()
+            if self._snapshot is None or now - self._taken_at >= settings.ws_health_interval_seconds:
+                self._snapshot = await _probe_health()
+                self._taken_at = time.monotonic()
+            return self._snapshot
+
+
+_health_cache = _HealthCache()
+
+
+async def health_snapshot() -> dict:
+    return await _health_cache.get()
+
+
+def positive_int(value) -> int | None:
+    """`value` as an int of at least 1, or None. A window of 0 would never
+    send anything and leave the producer stuck at high water."""
+    try:
+        n = int(value)
+    except (TypeError, ValueError):
+        return None
+    return n if n >= 1 else None
+
+
+CREDIT_ERROR = "credit must be a positive integer"
+
+
+class _Forward:
+    """Sends one buffer's events to the socket within its credit window."""
+
+    def __init__(self, conn: "ChatConnection", client_id: str, buffer: StreamBuffer,
+                 last_seq: int, credit: int):
+        self.conn = conn
+        self.client_id = client_id
+        self.buffer = buffer
+        self.credit = credit
+        self._credited = asyncio.Event()
+        self.task = asyncio.create_task(self._run(last_seq))
+
+    def grant(self, n: int) -> None:
+        self.credit += n
+        self._credited.set()
+
+    async def _run(self, last_seq: int) -> None:
+        try:
+            async for seq, chunk in self.buffer.iter_events(last_seq):
+                while self.credit <= 0:
+                    self._credited.clear()
+                    await self._credited.wait()
+                self.credit -= 1
+                await self.conn.send({
+                    "id": self.client_id,
+                    "stream_id": self.buffer.stream_id,
+                    "seq": seq,
+                    "event": sse_payload(chunk),
+                })
+            await self.conn.send({"id": self.client_id, "end": True})
+        except (WebSocketDisconnect, RuntimeError):
+            # Socket gone; the buffer's grace period takes over
+            pass
+        finally:
+            self.conn.streams.pop(self.client_id, None)
+
+
+class ChatConnection:
+    def __init__(self, websocket: WebSocket, sources: Sources):
+        self.websocket = websocket
+        self.sources = sources
+        self.streams: dict[str, _Forward] = {}
+        self._send_lock = asyncio.Lock()
+        self._last_health: dict | None = None
+
+    async def send(self, message: dict) -> None:
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(message))
+
+    async def run(self) -> None:
+        health = asyncio.create_task(self._push_health())
+        try:
+            while True:
+                try:
+                    message = json.loads(await self.websocket.receive_text())
+                except ValueError:
+                    await self.send({"error": "Invalid JSON"})
+                    continue
+                try:
+                    await self._handle(message)
+                except (TypeError, ValueError, AttributeError) as e:
+                    await self.send({"error": f"Bad message: {e}"})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            health.cancel()
+            open_streams = list(self.streams.values())
+            for forward in open_streams:
+                forward.task.cancel()
+            print(f"[WS] Connection closed, detached {len(open_streams)} stream(s)")
+
+    async def _handle(self, message: dict) -> None:
+        op = message.get("op")
+        client_id = message.get("id")
+
+        if op == "health":
+            self._last_health = await health_snapshot()
+            await self.send(self._last_health)
+            return
+
+        if not isinstance(client_id, str):
+            await self.send({"error": f"Missing id for op {op!r}"})
+            return
+
+        if op in self.sources:
+            await self._start(client_id, op, message)
+        elif op == "resume":
+            await self._resume(client_id, message)
+        elif op == "credit":
+            n = positive_int(message.get("n"))
+            if n is None:
+                await self.send({"id": client_id, "error": CREDIT_ERROR})
+                return
+            forward = self.streams.get(client_id)
+            if forward:
+                forward.grant(n)
+        elif op == "cancel":
+            forward = self.streams.get(client_id)
+            if forward:
+                forward.buffer.cancel()
+        else:
+            await self.send({"id": client_id, "error": f"Unknown op {op!r}"})
+
+    def _check_capacity(self, client_id: str) -> str | None:
+        if client_id in self.streams:
+            return "Stream id already in use"
+        if len(self.streams) >= settings.ws_max_streams:
+            return f"Too many concurrent streams (max {settings.ws_max_streams})"
+        return None
+
+    def _attach(self, client_id: str, buffer: StreamBuffer, last_seq: int, credit: int) -> None:
+        self.streams[client_id] = _Forward(self, client_id, buffer, last_seq, credit)
+
+    async def _start(self, client_id: str, op: str, message: dict) -> None:
+        error = self._check_capacity(client_id)
+        if error:
+            await self.send({"id": client_id, "error": error})
+            return
+        credit = positive_int(message.get("credit", settings.ws_initial_credit))
+        if credit is None:
+            await self.send({"id": client_id, "error": CREDIT_ERROR})
+            return
+        model, source = self.sources[op]
+        try:
+            request = model.model_validate(message.get("request"))
+        except ValidationError as e:
+            await self.send({"id": client_id, "error": str(e)})
+            return
+        self._attach(client_id, stream_registry.start(source(request)), -1, credit)
+
+    async def _resume(self, client_id: str, message: dict) -> None:
+        error = self._check_capacity(client_id)
+        if error:
+            await self.send({"id": client_id, "error": error})
+            return
+        buffer = stream_registry.get(str(message.get("stream_id")))
+        last_seq = int(message.get("last_seq", -1))
+        credit = positive_int(message.get("credit", settings.ws_initial_credit))
+        if credit is None:
+            await self.send({"id": client_id, "error": CREDIT_ERROR})
+        elif buffer is None:
+            await self.send({"id": client_id, "error": "Stream not found or expired"})
+        elif not buffer.can_resume_from(last_seq):
+            await self.send({"id": client_id, "error": "Requested events are no longer buffered"})
+        else:
+            self._attach(client_id, buffer, last_seq, credit)
+
+    async def _push_health(self) -> None:
+        """Push LM Studio status whenever it changes."""
+        try:
+            while True:
+                snapshot = await health_snapshot()
+                if snapshot != self._last_health:
+                    self._last_health = snapshot
+                    await self.send(snapshot)
+                await asyncio.sleep(settings.ws_health_interval_seconds)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
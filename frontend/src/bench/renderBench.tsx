@@ -0,0 +1,126 @@
+// Render benchmark: time per streamed token on a 500-message conversation.
+// Run with `npm run bench` and read the JSON summary from the page (also
+// logged to the console and exposed as window.__renderBench).
+import { Profiler, StrictMode, useEffect, useRef, useState } from "react"
+import { createRoot } from "react-dom/client"
+import { flushSync } from "react-dom"
+import "../index.css"
+import { MessageList } from "../components/chat/MessageList"
+import { useChatStore } from "../store/useChatStore"
+import type { Message } from "../types"
+
+const MESSAGE_COUNT = 500
+const TOKEN_COUNT = 300
+
+const SAMPLE_ANSWER = [
+  "Here is a **summary** of the approach:",
+  "",
+  "1. Parse the input",
+  "2. Validate each field",
+  "3. Return the result",
+  "",
+  "```python",
+  "def handler(event):",
+  "    return {\"status\": \"ok\", \"items\": len(event)}",
+  "```",
+  "",
+  "| Step | Cost |",
+  "|------|------|",
+  "| parse | low |",
+  "| validate | medium |",
+].join("\n")
+
+function buildFixture(): Message[] {
+  const messages: Message[] = []
+  for (let i = 0; i < MESSAGE_COUNT; i++) {
+    const isUser = i % 2 === 0
+    messages.push({
+      id: `m${i}`,
+      role: isUser ? "user" : "assistant",
+      content: isUser ? `Question ${i}: how does step ${i} work?` : SAMPLE_ANSWER,
+      timestamp: i,
+    })
+  }
+  // The reply being streamed into
+  messages.push({ id: "streaming", role: "assistant", content: "", timestamp: MESSAGE_COUNT })
+  return messages
+}
+
+function percentile(sorted: number[], p: number): number {
+  const idx = Math.min(sorted.length - 1, Math.floor((p / 100) * sorted.length))
+  return Number(sorted[idx].toFixed(3))
+}
+
+function summarize(samples: number[]) {
+  const sorted = [...samples].sort((a, b) => a - b)
+  const mean = samples.reduce((a, b) => a + b, 0) / samples.length
+  return {
+    mean: Number(mean.toFixed(3)),
+    p50: percentile(sorted, 50),
+    p95: percentile(sorted, 95),
+    max: Number(sorted[sorted.length - 1].toFixed(3)),
+  }
+}
+
+function Bench() {
+  const [messages, setMessages] = useState<Message[]>(buildFixture)
+  const [result, setResult] = useState<string>("running...")
+  const commitDurations = useRef<number[]>([])
+  const started = useRef(false)
+
+  useEffect(() => {
+    if (started.current) return
+    started.current = true
+    useChatStore.setState({ isStreaming: true })
+
+    // Let the initial mount and measurement settle first
+    setTimeout(() => {
+      const wall: number[] = []
+      commitDurations.current = []
+      const tokens = SAMPLE_ANSWER.split(/(?=\s)/)
+
+      for (let i = 0; i < TOKEN_COUNT; i++) {
+        const token = tokens[i % tokens.length]
+        const t0 = performance.now()
+        flushSync(() => {
+          setMessages((prev) => {
+            const last = prev[prev.length - 1]
+            return [...prev.slice(0, -1), { ...last, content: last.content + token }]
+          })
+        })
+        wall.push(performance.now() - t0)
+      }
+
+      useChatStore.setState({ isStreaming: false })
+      const summary = {
+        messages: MESSAGE_COUNT,
+        tokens: TOKEN_COUNT,
+        wall_ms_per_token: summarize(wall),
+        react_commit_ms: summarize(commitDurations.current),
+      }
+      console.log("[renderBench]", JSON.stringify(summary))
+      ;(window as unknown as { __renderBench: unknown }).__renderBench = summary
+      setResult(JSON.stringify(summary, null, 2))
+    }, 500)
+  }, [])
+
+  return (
+    <div className="flex h-screen bg-zinc-950">
+      <div className="flex flex-col flex-1 min-w-0">
+        <Profiler
+          id="message-list"
+          onRender={(_id, _phase, actualDuration) => commitDurations.current.push(actualDuration)}
+        >
+          <MessageList messages={messages} />
+        </Profiler>
+      </div>
+      <pre className="w-96 p-4 text-xs text-zinc-300 overflow-auto border-l border-zinc-800">{result}</pre>
+    </div>
+  )
+}
+
+createRoot(document.getElementById("root")!).render(
+  <StrictMode>
+    <Bench />
+  </StrictMode>
+)
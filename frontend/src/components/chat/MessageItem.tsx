@@ -1,10 +1,11 @@
-import { Brain, Globe, Terminal, Tag, Bot, User, Copy, Check } from "lucide-react"
-import { useState } from "react"
-import ReactMarkdown from "react-markdown"
+import { Brain, Globe, Terminal, Tag, Bot, User, Copy, Check, FolderSearch } from "lucide-react"
+import { memo, useMemo, useState } from "react"
+import ReactMarkdown, { type Components } from "react-markdown"
 import remarkGfm from "remark-gfm"
 import { Prism as SyntaxHighlighter } from "react-syntax-highlighter"
 import { vscDarkPlus } from "react-syntax-highlighter/dist/esm/styles/prism"
 import type { Message, ToolCallInfo } from "../../types"
+import { useImage } from "../../hooks/useImage"
 
 interface MessageItemProps {
   message: Message
@@ -88,109 +89,113 @@ function CodeBlock({ language, code }: { language: string; code: string }) {
   )
 }
 
-function MarkdownContent({ content }: { content: string }) {
-  return (
-    <div className="min-w-0 overflow-hidden">
-      <ReactMarkdown
-        remarkPlugins={[remarkGfm]}
-        components={{
-          code({ className, children, ...props }) {
-            const match = /language-(\w+)/.exec(className || "")
-            const codeString = String(children).replace(/\n$/, "")
-            const isBlock = codeString.includes("\n") || (className ?? "").includes("language-")
-
-            if (isBlock) {
-              return <CodeBlock language={match?.[1] ?? ""} code={codeString} />
-            }
+// Hoisted so ReactMarkdown gets stable props and memoized parts can bail out
+const markdownPlugins = [remarkGfm]
+
+const markdownComponents: Components = {
+  code({ className, children, ...props }) {
+    const match = /language-(\w+)/.exec(className || "")
+    const codeString = String(children).replace(/\n$/, "")
+    const isBlock = codeString.includes("\n") || (className ?? "").includes("language-")
 
-            return (
-              <code
-                className="px-1 py-0.5 rounded bg-zinc-700 text-violet-300 text-xs font-mono break-all"
-                {...props}
-              >
-                {children}
-              </code>
-            )
-          },
-          p({ children }) {
-            return <p className="mb-2 last:mb-0 leading-relaxed break-words">{children}</p>
-          },
-          strong({ children }) {
-            return <strong className="font-semibold text-zinc-100">{children}</strong>
-          },
-          em({ children }) {
-            return <em className="italic text-zinc-300">{children}</em>
-          },
-          ul({ children }) {
-            return <ul className="mb-2 ml-4 space-y-0.5 list-disc marker:text-zinc-500">{children}</ul>
-          },
-          ol({ children }) {
-            return <ol className="mb-2 ml-4 space-y-0.5 list-decimal marker:text-zinc-500">{children}</ol>
-          },
-          li({ children }) {
-            return <li className="leading-relaxed break-words">{children}</li>
-          },
-          h1({ children }) {
-            return <h1 className="text-base font-bold text-zinc-100 mb-2 mt-3 first:mt-0">{children}</h1>
-          },
-          h2({ children }) {
-            return <h2 className="text-sm font-bold text-zinc-100 mb-2 mt-3 first:mt-0">{children}</h2>
-          },
-          h3({ children }) {
-            return <h3 className="text-sm font-semibold text-zinc-200 mb-1.5 mt-2 first:mt-0">{children}</h3>
-          },
-          blockquote({ children }) {
-            return (
-              <blockquote className="border-l-2 border-zinc-600 pl-3 my-2 text-zinc-400 italic break-words">
-                {children}
-              </blockquote>
-            )
-          },
-          a({ href, children }) {
-            return (
-              <a
-                href={href}
-                target="_blank"
-                rel="noopener noreferrer"
-                className="text-violet-400 underline hover:text-violet-300 transition-colors break-all"
-              >
-                {children}
-              </a>
-            )
-          },
-          hr() {
-            return <hr className="my-3 border-zinc-700" />
-          },
-          table({ children }) {
-            return (
-              <div className="my-2 overflow-x-auto max-w-full">
-                <table className="text-xs border-collapse border border-zinc-700">
-                  {children}
-                </table>
-              </div>
-            )
-          },
-          th({ children }) {
-            return (
-              <th className="px-3 py-1.5 text-left font-semibold text-zinc-200 bg-zinc-800 border border-zinc-700 whitespace-nowrap">
-                {children}
-              </th>
-            )
-          },
-          td({ children }) {
-            return (
-              <td className="px-3 py-1.5 text-zinc-300 border border-zinc-700">
-                {children}
-              </td>
-            )
-          },
-        }}
+    if (isBlock) {
+      return <CodeBlock language={match?.[1] ?? ""} code={codeString} />
+    }
+
+    return (
+      <code
+        className="px-1 py-0.5 rounded bg-zinc-700 text-violet-300 text-xs font-mono break-all"
+        {...props}
       >
+        {children}
+      </code>
+    )
+  },
+  p({ children }) {
+    return <p className="mb-2 last:mb-0 leading-relaxed break-words">{children}</p>
+  },
+  strong({ children }) {
+    return <strong className="font-semibold text-zinc-100">{children}</strong>
+  },
+  em({ children }) {
+    return <em className="italic text-zinc-300">{children}</em>
+  },
+  ul({ children }) {
+    return <ul className="mb-2 ml-4 space-y-0.5 list-disc marker:text-zinc-500">{children}</ul>
+  },
+  ol({ children }) {
+    return <ol className="mb-2 ml-4 space-y-0.5 list-decimal marker:text-zinc-500">{children}</ol>
+  },
+  li({ children }) {
+    return <li className="leading-relaxed break-words">{children}</li>
+  },
+  h1({ children }) {
+    return <h1 className="text-base font-bold text-zinc-100 mb-2 mt-3 first:mt-0">{children}</h1>
+  },
+  h2({ children }) {
+    return <h2 className="text-sm font-bold text-zinc-100 mb-2 mt-3 first:mt-0">{children}</h2>
+  },
+  h3({ children }) {
+    return <h3 className="text-sm font-semibold text-zinc-200 mb-1.5 mt-2 first:mt-0">{children}</h3>
+  },
+  blockquote({ children }) {
+    return (
+      <blockquote className="border-l-2 border-zinc-600 pl-3 my-2 text-zinc-400 italic break-words">
+        {children}
+      </blockquote>
+    )
+  },
+  a({ href, children }) {
+    return (
+      <a
+        href={href}
+        target="_blank"
+        rel="noopener noreferrer"
+        className="text-violet-400 underline hover:text-violet-300 transition-colors break-all"
+      >
+        {children}
+      </a>
+    )
+  },
+  hr() {
+    return <hr className="my-3 border-zinc-700" />
+  },
+  table({ children }) {
+    return (
+      <div className="my-2 overflow-x-auto max-w-full">
+        <table className="text-xs border-collapse border border-zinc-700">
+          {children}
+        </table>
+      </div>
+    )
+  },
+  th({ children }) {
+    return (
+      <th className="px-3 py-1.5 text-left font-semibold text-zinc-200 bg-zinc-800 border border-zinc-700 whitespace-nowrap">
+        {children}
+      </th>
+    )
+  },
+  td({ children }) {
+    return (
+      <td className="px-3 py-1.5 text-zinc-300 border border-zinc-700">
+        {children}
+      </td>
+    )
+  },
+}
+
+// Memoized on the content string: completed parts are parsed and
+// highlighted once, and only the part still receiving tokens re-renders.
+const MarkdownContent = memo(function MarkdownContent({ content }: { content: string }) {
+  return (
+    <div className="min-w-0 overflow-hidden">
+      <ReactMarkdown remarkPlugins={markdownPlugins} components={markdownComponents}>
         {content}
       </ReactMarkdown>
     </div>
   )
-}
+})
 
 function ThinkingBlock({ content, isStreaming }: { content: string; isStreaming: boolean }) {
   return (
@@ -216,7 +221,7 @@ function ThinkingBlock({ content, isStreaming }: { content: string; isStreaming:
 }
 
 function SearchBlock({ toolCalls }: { toolCalls: ToolCallInfo[] }) {
-  const searchCalls = toolCalls.filter((tc) => tc.name !== "terminal_execute")
+  const searchCalls = toolCalls.filter((tc) => tc.name !== "terminal_execute" && tc.name !== "file_search")
   if (searchCalls.length === 0) return null
 
   return (
@@ -314,6 +319,50 @@ function TerminalBlock({ toolCalls }: { toolCalls: ToolCallInfo[] }) {
   )
 }
 
+function FileSearchBlock({ toolCalls }: { toolCalls: ToolCallInfo[] }) {
+  const fileCalls = toolCalls.filter((tc) => tc.name === "file_search")
+  if (fileCalls.length === 0) return null
+
+  return (
+    <div className="my-2 rounded-lg bg-amber-950/30 border border-amber-800/30 overflow-hidden">
+      <div className="flex items-center gap-1.5 px-3 py-1.5 border-b border-amber-800/20">
+        <FolderSearch size={11} className="text-amber-400" />
+        <span className="text-xs font-medium tracking-wide text-amber-400">
+          file search
+        </span>
+      </div>
+      <div className="px-3 py-2 space-y-2">
+        {fileCalls.map((tc, i) => (
+          <div key={i}>
+            <p className="text-xs text-amber-300/80 font-mono mb-1">{tc.query}</p>
+            {tc.files && (
+              tc.files.length === 0 ? (
+                <p className="text-xs text-amber-300/40">No files found</p>
+              ) : (
+                <ul className="space-y-0.5 max-h-48 overflow-y-auto">
+                  {tc.files.slice(0, 20).map((f, j) => (
+                    <li key={j} className="text-xs font-mono text-amber-200/60 break-all">
+                      {f.path}
+                      {f.matches?.slice(0, 2).map((m, k) => (
+                        <span key={k} className="block pl-3 text-amber-200/40 truncate">
+                          {m.line}: {m.text}
+                        </span>
+                      ))}
+                    </li>
+                  ))}
+                </ul>
+              )
+            )}
+            {tc.error && (
+              <p className="text-xs text-red-400/70">{tc.error}</p>
+            )}
+          </div>
+        ))}
+      </div>
+    </div>
+  )
+}
+
 const CLOSED_THINKING = /<think(?:ing)?>([\s\S]*?)<\/think(?:ing)?>/g
 const OPEN_THINKING = /<think(?:ing)?>([^]*)/
 
@@ -352,9 +401,15 @@ function parseContent(raw: string): ContentPart[] {
   return parts
 }
 
-export function MessageItem({ message, isStreaming }: MessageItemProps) {
+// Memoized: while tokens stream in, only the message whose object changed
+// (the active assistant reply) re-renders.
+export const MessageItem = memo(function MessageItem({ message, isStreaming }: MessageItemProps) {
   const isUser = message.role === "user"
-  const parts = isUser ? null : parseContent(message.content)
+  const parts = useMemo(
+    () => (isUser ? null : parseContent(message.content)),
+    [isUser, message.content],
+  )
+  const imageSrc = useImage(message.imageId)
 
   return (
     <div className={`flex gap-3 ${isUser ? "flex-row-reverse" : "flex-row"} min-w-0`}>
@@ -386,9 +441,9 @@ export function MessageItem({ message, isStreaming }: MessageItemProps) {
           </span>
         )}
 
-        {message.imageBase64 && message.imageMime && (
+        {imageSrc && (
           <img
-            src={`data:${message.imageMime};base64,${message.imageBase64}`}
+            src={imageSrc}
             alt="attached image"
             className="max-h-48 rounded-xl border border-zinc-700 object-contain mb-1"
           />
@@ -411,6 +466,7 @@ export function MessageItem({ message, isStreaming }: MessageItemProps) {
                 <>
                   <SearchBlock toolCalls={message.toolCalls} />
                   <TerminalBlock toolCalls={message.toolCalls} />
+                  <FileSearchBlock toolCalls={message.toolCalls} />
                 </>
               )}
               {parts?.map((part, i) =>
@@ -433,4 +489,4 @@ export function MessageItem({ message, isStreaming }: MessageItemProps) {
       </div>
     </div>
   )
-}
+})
@@ -1,6 +1,7 @@
 import { useEffect, useRef } from "react"
 import { MessageItem } from "./MessageItem"
 import { useChatStore } from "../../store/useChatStore"
+import { useVirtualWindow } from "../../hooks/useVirtualWindow"
 import type { Message } from "../../types"
 
 interface MessageListProps {
@@ -8,12 +9,19 @@ interface MessageListProps {
 }
 
 export function MessageList({ messages }: MessageListProps) {
-  const { isStreaming, isThinking } = useChatStore()
-  const bottomRef = useRef<HTMLDivElement>(null)
+  const { isStreaming } = useChatStore()
+  const { scrollRef, onScroll, scrollToBottom, measureRef, start, end, paddingTop, paddingBottom } =
+    useVirtualWindow({
+      count: messages.length,
+      getKey: (index) => messages[index].id,
+    })
 
+  // Jump to the bottom whenever a new message is added (e.g. the user sends one)
+  const lastCount = useRef(messages.length)
   useEffect(() => {
-    bottomRef.current?.scrollIntoView({ behavior: "smooth" })
-  }, [messages, isStreaming, isThinking])
+    if (messages.length > lastCount.current) scrollToBottom()
+    lastCount.current = messages.length
+  }, [messages.length, scrollToBottom])
 
   if (messages.length === 0) {
     return (
@@ -35,16 +43,24 @@ export function MessageList({ messages }: MessageListProps) {
   )
 
   return (
-    <div className="flex-1 overflow-y-auto overflow-x-hidden px-4 py-4 space-y-4 scrollbar-thin scrollbar-thumb-zinc-700 scrollbar-track-transparent min-w-0">
-      {messages.map((message, index) => (
-        <MessageItem
-          key={message.id}
-          message={message}
-          isStreaming={isStreaming && index === lastAssistantIndex && message.role === "assistant"}
-          isThinking={isThinking && index === lastAssistantIndex && message.role === "assistant"}
-        />
-      ))}
-      <div ref={bottomRef} />
+    <div
+      ref={scrollRef}
+      onScroll={onScroll}
+      className="flex-1 overflow-y-auto overflow-x-hidden px-4 py-4 scrollbar-thin scrollbar-thumb-zinc-700 scrollbar-track-transparent min-w-0"
+    >
+      <div style={{ paddingTop, paddingBottom }}>
+        {messages.slice(start, end).map((message, offset) => {
+          const index = start + offset
+          return (
+            <div key={message.id} ref={measureRef} data-virtual-key={message.id} className="pb-4">
+              <MessageItem
+                message={message}
+                isStreaming={isStreaming && index === lastAssistantIndex && message.role === "assistant"}
+              />
+            </div>
+          )
+        })}
+      </div>
     </div>
   )
 }
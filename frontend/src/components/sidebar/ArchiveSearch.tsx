@@ -0,0 +1,101 @@
+import { useEffect, useState } from "react"
+import { Search, X } from "lucide-react"
+import { v4 as uuidv4 } from "uuid"
+import { useChatStore } from "../../store/useChatStore"
+import { searchArchive, fetchArchivedConversation } from "../../lib/api"
+import type { ArchiveSearchResult } from "../../types"
+
+const SEARCH_DEBOUNCE_MS = 250
+
+/** Renders "[match]" markers from the backend snippet as highlights. */
+function Snippet({ text }: { text: string }) {
+  const parts = text.split(/(\[[^\]]*\])/)
+  return (
+    <>
+      {parts.map((part, i) =>
+        part.startsWith("[") && part.endsWith("]")
+          ? <mark key={i} className="bg-transparent text-violet-300">{part.slice(1, -1)}</mark>
+          : <span key={i}>{part}</span>
+      )}
+    </>
+  )
+}
+
+/**
+ * Full-text search over the server-side archive. Results open the local
+ * conversation, or fetch it from the archive when this browser has no copy.
+ */
+export function ArchiveSearch() {
+  const { conversations, setActiveConversation, importConversation } = useChatStore()
+  const [query, setQuery] = useState("")
+  const [results, setResults] = useState<ArchiveSearchResult[]>([])
+
+  useEffect(() => {
+    const q = query.trim()
+    if (!q) {
+      setResults([])
+      return
+    }
+    const controller = new AbortController()
+    const timer = setTimeout(async () => {
+      const found = await searchArchive(q, controller.signal)
+      if (!controller.signal.aborted) setResults(found)
+    }, SEARCH_DEBOUNCE_MS)
+    return () => { clearTimeout(timer); controller.abort() }
+  }, [query])
+
+  const open = async (id: string) => {
+    if (conversations.some((c) => c.id === id)) {
+      setActiveConversation(id)
+    } else {
+      const archived = await fetchArchivedConversation(id)
+      if (!archived) return
+      importConversation({
+        id: archived.id,
+        title: archived.title || "Archived conversation",
+        createdAt: archived.createdAt,
+        updatedAt: archived.updatedAt,
+        messages: archived.messages.map((m) => ({ ...m, id: uuidv4() })),
+      })
+    }
+    setQuery("")
+  }
+
+  return (
+    <div className="px-3 pb-2">
+      <div className="flex items-center gap-2 px-3 py-1.5 rounded-lg bg-zinc-800 border border-zinc-700 focus-within:border-zinc-600">
+        <Search size={12} className="shrink-0 text-zinc-500" />
+        <input
+          value={query}
+          onChange={(e) => setQuery(e.target.value)}
+          placeholder="Search history"
+          className="w-full bg-transparent text-xs text-zinc-300 placeholder:text-zinc-600 outline-none"
+        />
+        {query && (
+          <button onClick={() => setQuery("")} aria-label="Clear search" className="text-zinc-500 hover:text-zinc-300">
+            <X size={12} />
+          </button>
+        )}
+      </div>
+
+      {query.trim() && (
+        <div className="mt-1.5 max-h-64 overflow-y-auto space-y-0.5">
+          {results.length === 0 ? (
+            <p className="text-xs text-zinc-600 text-center py-2">No matches</p>
+          ) : (
+            results.map((r) => (
+              <button
+                key={r.message_id}
+                onClick={() => { void open(r.conversation_id) }}
+                className="w-full text-left px-3 py-2 rounded-lg hover:bg-zinc-800 transition-colors duration-100"
+              >
+                <p className="text-xs text-zinc-300 truncate">{r.title || "Untitled"}</p>
+                <p className="text-[11px] text-zinc-500 line-clamp-2"><Snippet text={r.snippet} /></p>
+              </button>
+            ))
+          )}
+        </div>
+      )}
+    </div>
+  )
+}
@@ -2,6 +2,7 @@ import { useState } from "react"
 import { Trash2, MessageSquare } from "lucide-react"
 import { DeleteDialog } from "./DeleteDialog"
 import { useChatStore } from "../../store/useChatStore"
+import { deleteArchivedConversation } from "../../lib/api"
 import type { Conversation } from "../../types"
 
 interface ConversationItemProps {
@@ -54,7 +55,11 @@ export function ConversationItem({ conversation, isActive }: ConversationItemPro
 
       <DeleteDialog
         open={showDelete}
-        onConfirm={() => { deleteConversation(conversation.id); setShowDelete(false) }}
+        onConfirm={() => {
+          deleteConversation(conversation.id)
+          void deleteArchivedConversation(conversation.id)
+          setShowDelete(false)
+        }}
         onCancel={() => setShowDelete(false)}
       />
     </>
@@ -3,10 +3,11 @@ import { useState, useRef, useEffect } from "react"
 import { useChatStore } from "../../store/useChatStore"
 import { useHealth } from "../../hooks/useHealth"
 import { ConversationItem } from "./ConversationItem"
+import { ArchiveSearch } from "./ArchiveSearch"
 
 export function Sidebar() {
   const { conversations, activeConversationId, createConversation, selectedModel, setSelectedModel } = useChatStore()
-  const { online, models } = useHealth()
+  const { online, models, modelStatus } = useHealth()
   const [dropdownOpen, setDropdownOpen] = useState(false)
   const dropdownRef = useRef<HTMLDivElement>(null)
 
@@ -71,12 +72,24 @@ export function Sidebar() {
                   onClick={() => { setSelectedModel(model); setDropdownOpen(false) }}
                   className={`w-full text-left px-3 py-2 text-xs transition-colors duration-100 ${model === selectedModel ? "bg-violet-600/30 text-violet-300" : "text-zinc-300 hover:bg-zinc-700"}`}
                 >
-                  {model}
+                  <span className="flex items-center justify-between gap-2">
+                    <span className="truncate">{model}</span>
+                    {modelStatus[model] && modelStatus[model] !== "hot" && (
+                      <span className="shrink-0 text-[10px] text-amber-400/80">{modelStatus[model]}</span>
+                    )}
+                  </span>
                 </button>
               ))}
             </div>
           )}
         </div>
+        {selectedModel && modelStatus[selectedModel] && modelStatus[selectedModel] !== "hot" && (
+          <p className="text-[11px] text-amber-400/80 mt-1.5 px-1">
+            {modelStatus[selectedModel] === "loading"
+              ? "Model is loading…"
+              : "Model is not loaded — the first reply will be slower"}
+          </p>
+        )}
       </div>
 
       <div className="px-3 py-3">
@@ -89,6 +102,8 @@ export function Sidebar() {
         </button>
       </div>
 
+      <ArchiveSearch />
+
       <div className="flex-1 overflow-y-auto px-3 pb-3 space-y-0.5">
         {conversations.length === 0 ? (
           <p className="text-xs text-zinc-600 text-center mt-8 px-4">
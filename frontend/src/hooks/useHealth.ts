@@ -1,13 +1,28 @@
 import { useEffect, useState } from "react"
 import { fetchLMStudioStatus, fetchLMStudioModels } from "../lib/api"
+import { USE_WEBSOCKET, chatSocket } from "../lib/ws"
 import { useChatStore } from "../store/useChatStore"
+import type { ModelStatus } from "../types"
 
 export function useHealth() {
   const [online, setOnline] = useState<boolean | null>(null)
   const [models, setModels] = useState<string[]>([])
+  const [modelStatus, setModelStatus] = useState<Record<string, ModelStatus>>({})
   const { selectedModel, setSelectedModel } = useChatStore()
 
   useEffect(() => {
+    if (USE_WEBSOCKET) {
+      // The backend pushes status changes over the shared socket
+      return chatSocket.onHealth(({ online: isOnline, models: available, status }) => {
+        setOnline(isOnline)
+        setModels(available)
+        setModelStatus(status)
+        if (available.length > 0 && !selectedModel) {
+          setSelectedModel(available[0])
+        }
+      })
+    }
+
     let cancelled = false
 
     const check = async () => {
@@ -16,14 +31,16 @@ export function useHealth() {
       setOnline(isOnline)
 
       if (isOnline) {
-        const available = await fetchLMStudioModels()
+        const { models: available, status } = await fetchLMStudioModels()
         if (cancelled) return
         setModels(available)
+        setModelStatus(status)
         if (available.length > 0 && !selectedModel) {
           setSelectedModel(available[0])
         }
       } else {
         setModels([])
+        setModelStatus({})
       }
     }
 
@@ -32,5 +49,5 @@ export function useHealth() {
     return () => { cancelled = true; clearInterval(interval) }
   }, [selectedModel, setSelectedModel])
 
-  return { online, models }
+  return { online, models, modelStatus }
 }
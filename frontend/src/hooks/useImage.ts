@@ -0,0 +1,25 @@
+import { useEffect, useState } from "react"
+import { loadImage } from "../lib/db"
+
+/** Resolve a stored image reference to a data URL (null while loading). */
+export function useImage(imageId?: string): string | null {
+  const [src, setSrc] = useState<string | null>(null)
+
+  useEffect(() => {
+    if (!imageId) {
+      setSrc(null)
+      return
+    }
+    let cancelled = false
+    loadImage(imageId)
+      .then((image) => {
+        if (!cancelled) setSrc(image ? `data:${image.mediaType};base64,${image.base64}` : null)
+      })
+      .catch(() => {
+        if (!cancelled) setSrc(null)
+      })
+    return () => { cancelled = true }
+  }, [imageId])
+
+  return src
+}
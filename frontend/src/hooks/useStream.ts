@@ -1,7 +1,10 @@
 import { useCallback, useRef } from "react"
 import { useChatStore } from "../store/useChatStore"
-import { streamChat, generateTitle, executeTerminalCommand } from "../lib/api"
-import type { MessageRole, ToolCallInfo, SearchResult, TerminalResult } from "../types"
+import { streamChat, generateTitle, resumeAfterTerminal } from "../lib/api"
+import { storeImage } from "../lib/db"
+import type {
+  MessageRole, ToolCallInfo, SearchResult, TerminalResult, TerminalResumeRequest, FileSearchMatch,
+} from "../types"
 
 export type TerminalApprovalResult = "approve" | "approve_always" | "deny"
 
@@ -74,10 +77,11 @@ export function useStream() {
       const isFirstMessage = conversation.messages.length === 0
       const model = selectedModel || "local-model"
 
+      // Image bytes go to IndexedDB; the message only keeps a reference
       addMessage(conversationId, {
         role: "user" as MessageRole,
         content,
-        imageBase64,
+        imageId: imageBase64 ? storeImage(imageBase64, imageMediaType ?? "image/jpeg") : undefined,
         imageMediaType,
       })
 
@@ -97,27 +101,27 @@ export function useStream() {
       // guarantees it appears before any streaming tokens
       if (isFirstMessage) {
         try {
-          const title = await generateTitle(content, model)
+          const title = await generateTitle(content, model, conversationId)
           if (title) setTitle(conversationId, title)
         } catch {
           // title generation is non-critical
         }
       }
 
+      // The backend only uses the text of past messages, so earlier images
+      // are not re-sent with every turn.
       const historyMessages = conversation.messages.map((m) => ({
         role: m.role,
         content: m.content,
-        image_base64: m.imageBase64,
-        image_media_type: m.imageMediaType,
       }))
 
       // Collect tool calls to set on the message after streaming
       const collectedToolCalls: ToolCallInfo[] = []
-      // Track terminal results for follow-up request
-      let terminalToolContext = ""
+      // Tool calls announced by tool_start that still await their tool_result
+      const awaitingResults: ToolCallInfo[] = []
 
       try {
-        const generator = streamChat({
+        let generator = streamChat({
           thread_id: conversationId,
           messages: historyMessages,
           new_message: content,
@@ -129,196 +133,158 @@ export function useStream() {
           terminal_access: terminalMode,
         }, abortController.signal)
 
-        for await (const event of generator) {
-          if (abortController.signal.aborted) break
+        // The graph pauses on terminal commands; after the user decides, the
+        // same run resumes from its checkpoint and may pause again.
+        while (true) {
+          const decisions: TerminalResumeRequest["decisions"] = []
 
-          if (event.type === "compressing") {
-            setCompressing(true)
-          } else if (event.type === "thinking_start") {
-            setCompressing(false)
-            setThinking(true)
-          } else if (event.type === "terminal_pending") {
-            setThinking(false)
-            setSearching(false)
+          for await (const event of generator) {
+            if (abortController.signal.aborted) break
 
-            try {
-              const pending = JSON.parse(event.content ?? "{}")
-              const command = pending.command ?? ""
-              const workingDirectory = pending.working_directory ?? "."
-
-              // Check auto-approve
-              const autoApprove = useChatStore.getState().autoApproveTerminal
-              let decision: TerminalApprovalResult
+            if (event.type === "compressing") {
+              setCompressing(true)
+            } else if (event.type === "thinking_start") {
+              setCompressing(false)
+              setThinking(true)
+            } else if (event.type === "terminal_pending") {
+              setThinking(false)
+              setSearching(false)
 
-              if (autoApprove) {
-                decision = "approve"
-              } else {
-                // Show dialog and wait for user decision
-                decision = await waitForApproval(command, workingDirectory)
-              }
+              try {
+                const pending = JSON.parse(event.content ?? "{}")
+                const command = pending.command ?? ""
+                const workingDirectory = pending.working_directory ?? "."
 
-              if (abortController.signal.aborted) break
+                // Check auto-approve
+                const autoApprove = useChatStore.getState().autoApproveTerminal
+                let decision: TerminalApprovalResult
 
-              if (decision === "approve_always") {
-                setAutoApproveTerminal(true)
-              }
-
-              if (decision === "approve" || decision === "approve_always") {
-                // Execute the command
-                setExecuting(true)
-                const result = await executeTerminalCommand(command, workingDirectory)
-                setExecuting(false)
+                if (autoApprove) {
+                  decision = "approve"
+                } else {
+                  // Show dialog and wait for user decision
+                  decision = await waitForApproval(command, workingDirectory)
+                }
 
                 if (abortController.signal.aborted) break
 
-                const tcInfo: ToolCallInfo = {
-                  name: "terminal_execute",
-                  query: "",
-                  command,
+                if (decision === "approve_always") {
+                  setAutoApproveTerminal(true)
                 }
 
-                if (result.status === "success") {
-                  tcInfo.terminalResult = {
-                    command: result.command,
-                    exit_code: result.exit_code ?? 0,
-                    stdout: result.stdout ?? "",
-                    stderr: result.stderr ?? "",
-                    truncated: result.truncated ?? false,
+                // The backend runs (or rejects) the command on resume and
+                // reports it back through tool_start/tool_result events.
+                decisions.push({
+                  tool_call_id: pending.tool_call_id ?? "",
+                  approved: decision === "approve" || decision === "approve_always",
+                })
+              } catch { /* ignore parse errors */ }
+            } else if (event.type === "tool_start") {
+              setThinking(false)
+              try {
+                const info = JSON.parse(event.content ?? "{}")
+                let tcInfo: ToolCallInfo
+                if (info.name === "terminal_execute") {
+                  setExecuting(true)
+                  tcInfo = {
+                    name: "terminal_execute",
+                    query: "",
+                    command: info.args?.command ?? "",
+                  }
+                } else if (info.name === "file_search") {
+                  setSearching(true)
+                  tcInfo = {
+                    name: "file_search",
+                    query: info.args?.content_regex || info.args?.pattern || "*",
                   }
-                  terminalToolContext += `\n\n[Tool call: terminal_execute({"command": "${command}"})]\n${JSON.stringify(result)}`
                 } else {
-                  tcInfo.error = result.message ?? "Execution failed"
-                  terminalToolContext += `\n\n[Tool call: terminal_execute({"command": "${command}"})]\n${JSON.stringify(result)}`
+                  setSearching(true)
+                  tcInfo = {
+                    name: info.name ?? "web_search",
+                    query: info.args?.query ?? "",
+                  }
                 }
-
                 collectedToolCalls.push(tcInfo)
+                awaitingResults.push(tcInfo)
                 setToolCalls(conversationId, assistantMessageId, [...collectedToolCalls])
-              } else {
-                // User denied
-                const tcInfo: ToolCallInfo = {
-                  name: "terminal_execute",
-                  query: "",
-                  command,
-                  error: "Command rejected by user",
+              } catch { /* ignore parse errors */ }
+            } else if (event.type === "tool_result") {
+              try {
+                const result = JSON.parse(event.content ?? "{}")
+                // Results arrive in the same order the calls were announced
+                const lastTc = awaitingResults.shift()
+                if (lastTc?.name === "terminal_execute") {
+                  if (result.status === "success") {
+                    lastTc.terminalResult = {
+                      command: result.command,
+                      exit_code: result.exit_code,
+                      stdout: result.stdout,
+                      stderr: result.stderr,
+                      truncated: result.truncated,
+                    } as TerminalResult
+                  } else {
+                    lastTc.error = result.message
+                  }
+                } else if (lastTc?.name === "file_search") {
+                  if (result.status === "success") {
+                    lastTc.files = result.results as FileSearchMatch[]
+                  } else {
+                    lastTc.error = result.message
+                  }
+                } else if (lastTc) {
+                  if (result.status === "success" && result.results) {
+                    lastTc.results = result.results as SearchResult[]
+                  } else if (result.status === "error") {
+                    lastTc.error = result.message
+                  }
                 }
-                collectedToolCalls.push(tcInfo)
-                setToolCalls(conversationId, assistantMessageId, [...collectedToolCalls])
-                terminalToolContext += `\n\n[Tool call: terminal_execute({"command": "${command}"})]\n{"status": "denied", "message": "User denied execution of this command."}`
-              }
-            } catch {
+              } catch { /* ignore */ }
+              setSearching(false)
               setExecuting(false)
-            }
-          } else if (event.type === "tool_start") {
-            setThinking(false)
-            try {
-              const info = JSON.parse(event.content ?? "{}")
-              if (info.name === "terminal_execute") {
-                setExecuting(true)
-                collectedToolCalls.push({
-                  name: "terminal_execute",
-                  query: "",
-                  command: info.args?.command ?? "",
-                })
-              } else {
-                setSearching(true)
-                collectedToolCalls.push({
-                  name: info.name ?? "web_search",
-                  query: info.args?.query ?? "",
-                })
+              // Persist tool calls on the message
+              if (collectedToolCalls.length > 0) {
+                setToolCalls(conversationId, assistantMessageId, [...collectedToolCalls])
               }
-            } catch { /* ignore parse errors */ }
-          } else if (event.type === "tool_result") {
-            try {
-              const result = JSON.parse(event.content ?? "{}")
-              const lastTc = collectedToolCalls[collectedToolCalls.length - 1]
-              if (lastTc?.name === "terminal_execute") {
-                if (result.status === "success") {
-                  lastTc.terminalResult = {
-                    command: result.command,
-                    exit_code: result.exit_code,
-                    stdout: result.stdout,
-                    stderr: result.stderr,
-                    truncated: result.truncated,
-                  } as TerminalResult
-                } else {
-                  lastTc.error = result.message
-                }
-              } else if (lastTc) {
-                if (result.status === "success" && result.results) {
-                  lastTc.results = result.results as SearchResult[]
-                } else if (result.status === "error") {
-                  lastTc.error = result.message
-                }
+            } else if (event.type === "status") {
+              // After tools finish the model is deciding on its next step
+              if (event.content === "tool_node" && awaitingResults.length === 0) {
+                setThinking(true)
               }
-            } catch { /* ignore */ }
-            setSearching(false)
-            setExecuting(false)
-            // Persist tool calls on the message
-            if (collectedToolCalls.length > 0) {
-              setToolCalls(conversationId, assistantMessageId, [...collectedToolCalls])
-            }
-          } else if (event.type === "tool_error") {
-            setSearching(false)
-            setExecuting(false)
-          } else if (event.type === "token") {
-            setThinking(false)
-            setSearching(false)
-            setExecuting(false)
-            setCompressing(false)
-            appendToken(conversationId, assistantMessageId, event.content ?? "")
-          } else if (event.type === "message_type") {
-            setCompressing(false)
-            setMessageType(
-              conversationId,
-              assistantMessageId,
-              (event.content ?? "simple") as "simple" | "summary_request" | "system_instruction"
-            )
-          } else if (event.type === "error") {
-            setThinking(false)
-            setSearching(false)
-            setExecuting(false)
-            setCompressing(false)
-            appendToken(conversationId, assistantMessageId, `\n\n[Error: ${event.content}]`)
-            break
-          } else if (event.type === "done") {
-            break
-          }
-        }
-
-        // If terminal commands were executed (via approval), make a follow-up
-        // streaming request so the model can generate a response based on results
-        if (terminalToolContext && !abortController.signal.aborted) {
-          const followUpAbort = new AbortController()
-          abortRef.current = followUpAbort
-
-          const followUpGenerator = streamChat({
-            thread_id: conversationId,
-            messages: [
-              ...historyMessages,
-              { role: "user" as MessageRole, content },
-            ],
-            new_message: `[SYSTEM: The following terminal tool results are available. Use them to answer the user's question.${terminalToolContext}]\n\n${content}`,
-            model,
-            thinking_mode: thinkingMode,
-            web_search: false,
-            terminal_access: false,
-          }, followUpAbort.signal)
-
-          for await (const event of followUpGenerator) {
-            if (followUpAbort.signal.aborted) break
-
-            if (event.type === "token") {
+            } else if (event.type === "tool_error") {
+              setSearching(false)
+              setExecuting(false)
+            } else if (event.type === "token") {
               setThinking(false)
+              setSearching(false)
+              setExecuting(false)
+              setCompressing(false)
               appendToken(conversationId, assistantMessageId, event.content ?? "")
-            } else if (event.type === "thinking_start") {
-              setThinking(true)
+            } else if (event.type === "message_type") {
+              setCompressing(false)
+              setMessageType(
+                conversationId,
+                assistantMessageId,
+                (event.content ?? "simple") as "simple" | "summary_request" | "system_instruction"
+              )
             } else if (event.type === "error") {
+              setThinking(false)
+              setSearching(false)
+              setExecuting(false)
+              setCompressing(false)
               appendToken(conversationId, assistantMessageId, `\n\n[Error: ${event.content}]`)
               break
             } else if (event.type === "done") {
               break
             }
           }
+
+          if (decisions.length === 0 || abortController.signal.aborted) break
+
+          setExecuting(true)
+          generator = resumeAfterTerminal(
+            { thread_id: conversationId, decisions },
+            abortController.signal,
+          )
         }
       } catch (err) {
         if (err instanceof DOMException && err.name === "AbortError") {
@@ -0,0 +1,124 @@
+import { useCallback, useEffect, useLayoutEffect, useRef, useState } from "react"
+
+interface VirtualWindowOptions {
+  count: number
+  getKey: (index: number) => string
+  /** Height assumed for items that have not been measured yet */
+  estimateHeight?: number
+  /** Extra pixels rendered above and below the viewport */
+  overscan?: number
+}
+
+const STICK_THRESHOLD_PX = 80
+
+/**
+ * Windowed rendering for a vertical list of variable-height items.
+ * Only items intersecting the viewport (plus overscan) are mounted; the
+ * rest are replaced by top/bottom padding sized from measured heights.
+ * The list sticks to the bottom while the user is already there.
+ */
+export function useVirtualWindow({
+  count,
+  getKey,
+  estimateHeight = 160,
+  overscan = 800,
+}: VirtualWindowOptions) {
+  const scrollRef = useRef<HTMLDivElement>(null)
+  const heights = useRef(new Map<string, number>())
+  const stickToBottom = useRef(true)
+  const [viewport, setViewport] = useState({ scrollTop: 0, height: 0 })
+  const [, setMeasureVersion] = useState(0)
+  const observerRef = useRef<ResizeObserver | null>(null)
+  const observed = useRef(new Set<HTMLElement>())
+
+  if (!observerRef.current && typeof ResizeObserver !== "undefined") {
+    observerRef.current = new ResizeObserver((entries) => {
+      let changed = false
+      for (const entry of entries) {
+        const key = (entry.target as HTMLElement).dataset.virtualKey
+        if (!key) continue
+        const height = entry.borderBoxSize?.[0]?.blockSize ?? entry.contentRect.height
+        if (heights.current.get(key) !== height) {
+          heights.current.set(key, height)
+          changed = true
+        }
+      }
+      if (changed) setMeasureVersion((v) => v + 1)
+    })
+  }
+
+  useEffect(() => () => {
+    observerRef.current?.disconnect()
+    observed.current.clear()
+  }, [])
+
+  const measureRef = useCallback((el: HTMLElement | null) => {
+    if (el && !observed.current.has(el)) {
+      observed.current.add(el)
+      observerRef.current?.observe(el)
+    }
+  }, [])
+
+  const onScroll = useCallback(() => {
+    const el = scrollRef.current
+    if (!el) return
+    stickToBottom.current = el.scrollHeight - el.scrollTop - el.clientHeight < STICK_THRESHOLD_PX
+    setViewport({ scrollTop: el.scrollTop, height: el.clientHeight })
+  }, [])
+
+  const scrollToBottom = useCallback(() => {
+    stickToBottom.current = true
+    const el = scrollRef.current
+    if (el) el.scrollTop = el.scrollHeight
+  }, [])
+
+  useLayoutEffect(() => {
+    // Stop observing items that scrolled out of the window and unmounted
+    for (const item of observed.current) {
+      if (!item.isConnected) {
+        observerRef.current?.unobserve(item)
+        observed.current.delete(item)
+      }
+    }
+
+    const el = scrollRef.current
+    if (!el) return
+    if (stickToBottom.current) el.scrollTop = el.scrollHeight
+    if (el.clientHeight !== viewport.height || el.scrollTop !== viewport.scrollTop) {
+      setViewport({ scrollTop: el.scrollTop, height: el.clientHeight })
+    }
+  })
+
+  const offsets = new Array<number>(count + 1)
+  offsets[0] = 0
+  for (let i = 0; i < count; i++) {
+    offsets[i + 1] = offsets[i] + (heights.current.get(getKey(i)) ?? estimateHeight)
+  }
+  const total = offsets[count]
+
+  const top = viewport.scrollTop - overscan
+  const bottom = viewport.scrollTop + viewport.height + overscan
+
+  let lo = 0
+  let hi = count
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1
+    if (offsets[mid + 1] <= top) lo = mid + 1
+    else hi = mid
+  }
+  const start = lo
+
+  let end = start
+  while (end < count && offsets[end] < bottom) end++
+
+  return {
+    scrollRef,
+    onScroll,
+    scrollToBottom,
+    measureRef,
+    start,
+    end,
+    paddingTop: offsets[start],
+    paddingBottom: total - offsets[end],
+  }
+}
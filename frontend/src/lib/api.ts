@@ -1,22 +1,16 @@
-import type { ChatRequest, StreamEvent, TerminalResult } from "../types"
+import type { ArchiveSearchResult, ArchivedConversation, ChatRequest, ModelStatus, StreamEvent, TerminalResumeRequest } from "../types"
+
+import { USE_WEBSOCKET, chatSocket } from "./ws"
 
 const BASE_URL = import.meta.env.VITE_API_URL ?? "http://localhost:8000"
 
-export async function* streamChat(
-  request: ChatRequest,
-  signal?: AbortSignal,
-): AsyncGenerator<StreamEvent> {
-  const response = await fetch(`${BASE_URL}/chat/stream`, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify(request),
-    signal,
-  })
-
-  if (!response.ok) {
-    throw new Error(`Backend error: ${response.status} ${response.statusText}`)
-  }
+const MAX_RESUME_ATTEMPTS = 3
+const RESUME_DELAY_MS = 1000
 
+async function* readEvents(
+  response: Response,
+  onEventId: (id: string) => void,
+): AsyncGenerator<StreamEvent> {
   if (!response.body) {
     throw new Error("No response body")
   }
@@ -34,7 +28,9 @@ export async function* streamChat(
     buffer = lines.pop() ?? ""
 
     for (const line of lines) {
-      if (line.startsWith("data: ")) {
+      if (line.startsWith("id: ")) {
+        onEventId(line.slice(4).trim())
+      } else if (line.startsWith("data: ")) {
         const raw = line.slice(6).trim()
         if (!raw) continue
         try {
@@ -47,12 +43,110 @@ export async function* streamChat(
   }
 }
 
-export async function generateTitle(message: string, model: string): Promise<string> {
+async function* postEventStream(
+  path: string,
+  body: unknown,
+  signal?: AbortSignal,
+): AsyncGenerator<StreamEvent> {
+  let response = await fetch(`${BASE_URL}${path}`, {
+    method: "POST",
+    // We reattach after a dropped connection, so the backend should keep generating
+    headers: { "Content-Type": "application/json", "X-Stream-Resumable": "true" },
+    body: JSON.stringify(body),
+    signal,
+  })
+
+  if (!response.ok) {
+    throw new Error(`Backend error: ${response.status} ${response.statusText}`)
+  }
+
+  // The backend keeps a replay buffer per stream; if the connection drops
+  // mid-answer we reattach with Last-Event-ID instead of regenerating.
+  const streamId = response.headers.get("X-Stream-Id")
+  if (streamId) {
+    // Aborting only closes our socket; tell the backend to stop generating now
+    // rather than after the resume grace period.
+    signal?.addEventListener("abort", () => { void cancelStream(streamId) }, { once: true })
+  }
+  let lastEventId: string | null = null
+  let finished = false
+  let resumes = 0
+
+  while (true) {
+    try {
+      for await (const event of readEvents(response, (id) => { lastEventId = id })) {
+        if (event.type === "done" || event.type === "error" || event.type === "cancelled") {
+          finished = true
+        }
+        resumes = 0
+        yield event
+      }
+      if (finished || !streamId) return
+    } catch (err) {
+      if (signal?.aborted || !streamId) throw err
+    }
+
+    if (resumes >= MAX_RESUME_ATTEMPTS) {
+      throw new Error("Stream connection lost")
+    }
+    resumes += 1
+    response = await resumeStream(streamId, lastEventId, signal)
+  }
+}
+
+export function streamChat(
+  request: ChatRequest,
+  signal?: AbortSignal,
+): AsyncGenerator<StreamEvent> {
+  if (USE_WEBSOCKET) return chatSocket.stream("chat", request, signal)
+  return postEventStream("/chat/stream", request, signal)
+}
+
+/** Continue a turn paused for terminal approval from its graph checkpoint. */
+export function resumeAfterTerminal(
+  request: TerminalResumeRequest,
+  signal?: AbortSignal,
+): AsyncGenerator<StreamEvent> {
+  if (USE_WEBSOCKET) return chatSocket.stream("terminal_resume", request, signal)
+  return postEventStream("/chat/terminal/resume", request, signal)
+}
+
+async function resumeStream(
+  streamId: string,
+  lastEventId: string | null,
+  signal?: AbortSignal,
+): Promise<Response> {
+  const headers: Record<string, string> = {}
+  if (lastEventId !== null) headers["Last-Event-ID"] = lastEventId
+
+  for (let attempt = 1; attempt <= MAX_RESUME_ATTEMPTS; attempt++) {
+    await new Promise((resolve) => setTimeout(resolve, RESUME_DELAY_MS * attempt))
+    try {
+      const res = await fetch(`${BASE_URL}/chat/stream/${streamId}/resume`, { headers, signal })
+      if (res.ok) return res
+      // 404/409: the stream expired or the gap is no longer buffered
+      if (res.status === 404 || res.status === 409) break
+    } catch (err) {
+      if (signal?.aborted) throw err
+    }
+  }
+  throw new Error("Stream connection lost")
+}
+
+export async function cancelStream(streamId: string): Promise<void> {
+  try {
+    await fetch(`${BASE_URL}/chat/stream/${streamId}/cancel`, { method: "POST" })
+  } catch {
+    // best effort — the backend cancels on its own after the grace period
+  }
+}
+
+export async function generateTitle(message: string, model: string, threadId?: string): Promise<string> {
   try {
     const res = await fetch(`${BASE_URL}/chat/title`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ message, model }),
+      body: JSON.stringify({ message, model, thread_id: threadId }),
     })
     if (!res.ok) return ""
     const data = await res.json()
@@ -62,29 +156,6 @@ export async function generateTitle(message: string, model: string): Promise<str
   }
 }
 
-export async function executeTerminalCommand(
-  command: string,
-  workingDirectory = ".",
-): Promise<TerminalResult & { status: string; message?: string }> {
-  const res = await fetch(`${BASE_URL}/chat/terminal/execute`, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ command, working_directory: workingDirectory }),
-  })
-  if (!res.ok) {
-    return {
-      status: "error",
-      command,
-      exit_code: -1,
-      stdout: "",
-      stderr: "",
-      truncated: false,
-      message: `Backend error: ${res.status}`,
-    }
-  }
-  return res.json()
-}
-
 export async function fetchLMStudioStatus(): Promise<boolean> {
   try {
     const res = await fetch(`${BASE_URL}/lmstudio/status`)
@@ -96,13 +167,42 @@ export async function fetchLMStudioStatus(): Promise<boolean> {
   }
 }
 
-export async function fetchLMStudioModels(): Promise<string[]> {
+export async function fetchLMStudioModels(): Promise<{ models: string[]; status: Record<string, ModelStatus> }> {
   try {
     const res = await fetch(`${BASE_URL}/lmstudio/models`)
+    if (!res.ok) return { models: [], status: {} }
+    const data = await res.json()
+    return { models: data.models ?? [], status: data.status ?? {} }
+  } catch {
+    return { models: [], status: {} }
+  }
+}
+
+export async function searchArchive(query: string, signal?: AbortSignal): Promise<ArchiveSearchResult[]> {
+  try {
+    const res = await fetch(`${BASE_URL}/archive/search?q=${encodeURIComponent(query)}&limit=20`, { signal })
     if (!res.ok) return []
     const data = await res.json()
-    return data.models ?? []
+    return data.results ?? []
   } catch {
     return []
   }
 }
+
+export async function fetchArchivedConversation(id: string): Promise<ArchivedConversation | null> {
+  try {
+    const res = await fetch(`${BASE_URL}/archive/conversations/${encodeURIComponent(id)}`)
+    if (!res.ok) return null
+    return await res.json()
+  } catch {
+    return null
+  }
+}
+
+export async function deleteArchivedConversation(id: string): Promise<void> {
+  try {
+    await fetch(`${BASE_URL}/archive/conversations/${encodeURIComponent(id)}`, { method: "DELETE" })
+  } catch {
+    // the archive is optional; the local copy is already gone
+  }
+}
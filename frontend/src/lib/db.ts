@@ -0,0 +1,107 @@
+import { v4 as uuidv4 } from "uuid"
+import type { Conversation } from "../types"
+
+const DB_NAME = "langgraph-chat"
+const DB_VERSION = 1
+const CONVERSATIONS = "conversations"
+const IMAGES = "images"
+
+export interface StoredImage {
+  id: string
+  base64: string
+  mediaType: string
+}
+
+let dbPromise: Promise<IDBDatabase> | null = null
+
+function openDB(): Promise<IDBDatabase> {
+  if (!dbPromise) {
+    dbPromise = new Promise((resolve, reject) => {
+      const req = indexedDB.open(DB_NAME, DB_VERSION)
+      req.onupgradeneeded = () => {
+        const db = req.result
+        if (!db.objectStoreNames.contains(CONVERSATIONS)) {
+          db.createObjectStore(CONVERSATIONS, { keyPath: "id" })
+        }
+        if (!db.objectStoreNames.contains(IMAGES)) {
+          db.createObjectStore(IMAGES, { keyPath: "id" })
+        }
+      }
+      req.onsuccess = () => resolve(req.result)
+      req.onerror = () => reject(req.error)
+    })
+  }
+  return dbPromise
+}
+
+function requestResult<T>(req: IDBRequest<T>): Promise<T> {
+  return new Promise((resolve, reject) => {
+    req.onsuccess = () => resolve(req.result)
+    req.onerror = () => reject(req.error)
+  })
+}
+
+function transactionDone(tx: IDBTransaction): Promise<void> {
+  return new Promise((resolve, reject) => {
+    tx.oncomplete = () => resolve()
+    tx.onerror = () => reject(tx.error)
+    tx.onabort = () => reject(tx.error)
+  })
+}
+
+// --- Conversations (one record per conversation) ---
+
+export async function loadConversations(): Promise<Conversation[]> {
+  const db = await openDB()
+  const store = db.transaction(CONVERSATIONS).objectStore(CONVERSATIONS)
+  const all = await requestResult(store.getAll() as IDBRequest<Conversation[]>)
+  // Newest first, matching the order createConversation maintains
+  return all.sort((a, b) => b.createdAt - a.createdAt)
+}
+
+export async function writeConversations(
+  updated: Conversation[],
+  deletedIds: string[],
+  deletedImageIds: string[],
+): Promise<void> {
+  const db = await openDB()
+  const tx = db.transaction([CONVERSATIONS, IMAGES], "readwrite")
+  const conversations = tx.objectStore(CONVERSATIONS)
+  const images = tx.objectStore(IMAGES)
+  for (const c of updated) conversations.put(c)
+  for (const id of deletedIds) conversations.delete(id)
+  for (const id of deletedImageIds) images.delete(id)
+  await transactionDone(tx)
+}
+
+// --- Images (kept out of the in-memory store) ---
+
+const imageCache = new Map<string, StoredImage>()
+
+/** Store an image and return its ID right away; the write happens in the background. */
+export function storeImage(base64: string, mediaType: string): string {
+  const image: StoredImage = { id: uuidv4(), base64, mediaType }
+  imageCache.set(image.id, image)
+  openDB()
+    .then((db) => {
+      const tx = db.transaction(IMAGES, "readwrite")
+      tx.objectStore(IMAGES).put(image)
+      return transactionDone(tx)
+    })
+    .catch((err) => console.error("Failed to store image", err))
+  return image.id
+}
+
+export async function loadImage(id: string): Promise<StoredImage | undefined> {
+  const cached = imageCache.get(id)
+  if (cached) return cached
+  const db = await openDB()
+  const store = db.transaction(IMAGES).objectStore(IMAGES)
+  const image = await requestResult(store.get(id) as IDBRequest<StoredImage | undefined>)
+  if (image) imageCache.set(id, image)
+  return image
+}
+
+export function forgetImages(ids: string[]) {
+  for (const id of ids) imageCache.delete(id)
+}
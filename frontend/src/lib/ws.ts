@@ -0,0 +1,161 @@
+import type { ModelStatus, StreamEvent } from "../types"
+
+/**
+ * Client for the backend's multiplexed /ws endpoint: every chat stream,
+ * terminal resume and health push shares one socket. Events are the same
+ * objects the SSE path yields. Credit is granted back as the consumer
+ * reads events, so a slow reader pauses generation for its stream only.
+ */
+
+const BASE_URL = import.meta.env.VITE_API_URL ?? "http://localhost:8000"
+const WS_URL = BASE_URL.replace(/^http/, "ws") + "/ws"
+
+const CREDIT_WINDOW = 64
+const MAX_RESUME_ATTEMPTS = 3
+const RESUME_DELAY_MS = 1000
+const HEALTH_RECONNECT_MS = 10000
+
+export const USE_WEBSOCKET = import.meta.env.VITE_USE_WEBSOCKET === "true"
+
+export interface HealthPush {
+  online: boolean
+  models: string[]
+  status: Record<string, ModelStatus>
+}
+
+type ServerFrame =
+  | { id: string; stream_id: string; seq: number; event: StreamEvent }
+  | { id: string; end: true }
+  | { id?: string; error: string }
+  | ({ type: "health" } & HealthPush)
+
+interface StreamState {
+  push: (frame: ServerFrame | null) => void
+  streamId: string | null
+  lastSeq: number
+}
+
+class ChatSocket {
+  private socket: WebSocket | null = null
+  private opening: Promise<WebSocket> | null = null
+  private streams = new Map<string, StreamState>()
+  private healthListeners = new Set<(health: HealthPush) => void>()
+  private nextId = 0
+
+  private connect(): Promise<WebSocket> {
+    if (this.socket?.readyState === WebSocket.OPEN) return Promise.resolve(this.socket)
+    if (this.opening) return this.opening
+
+    this.opening = new Promise((resolve, reject) => {
+      const socket = new WebSocket(WS_URL)
+      socket.onopen = () => {
+        this.socket = socket
+        this.opening = null
+        if (this.healthListeners.size > 0) socket.send(JSON.stringify({ op: "health" }))
+        resolve(socket)
+      }
+      socket.onerror = () => {
+        this.opening = null
+        reject(new Error("WebSocket connection failed"))
+      }
+      socket.onclose = () => {
+        if (this.socket === socket) this.socket = null
+        // Wake every reader; each one decides whether to resume
+        for (const state of this.streams.values()) state.push(null)
+        if (this.healthListeners.size > 0) {
+          for (const listener of this.healthListeners) listener({ online: false, models: [], status: {} })
+          setTimeout(() => { void this.connect().catch(() => {}) }, HEALTH_RECONNECT_MS)
+        }
+      }
+      socket.onmessage = (msg) => this.dispatch(JSON.parse(msg.data) as ServerFrame)
+    })
+    return this.opening
+  }
+
+  private dispatch(frame: ServerFrame) {
+    if ("type" in frame && frame.type === "health") {
+      for (const listener of this.healthListeners) listener(frame)
+      return
+    }
+    if ("id" in frame && frame.id) this.streams.get(frame.id)?.push(frame)
+  }
+
+  private async send(message: unknown) {
+    const socket = await this.connect()
+    socket.send(JSON.stringify(message))
+  }
+
+  async *stream(
+    op: "chat" | "terminal_resume",
+    request: unknown,
+    signal?: AbortSignal,
+  ): AsyncGenerator<StreamEvent> {
+    const id = `s${this.nextId++}`
+    const queue: (ServerFrame | null)[] = []
+    let wake: (() => void) | null = null
+    const state: StreamState = {
+      push: (frame) => { queue.push(frame); wake?.() },
+      streamId: null,
+      lastSeq: -1,
+    }
+    this.streams.set(id, state)
+
+    const onAbort = () => { void this.send({ op: "cancel", id }).catch(() => {}) }
+    signal?.addEventListener("abort", onAbort, { once: true })
+
+    try {
+      await this.send({ op, id, request, credit: CREDIT_WINDOW })
+      let consumed = 0
+      let resumes = 0
+
+      while (true) {
+        if (queue.length === 0) {
+          await new Promise<void>((resolve) => { wake = resolve })
+          wake = null
+        }
+        const frame = queue.shift()
+
+        if (frame === null || frame === undefined) {
+          // Socket dropped: reattach to the same buffer after the last event
+          if (signal?.aborted) throw new DOMException("Aborted", "AbortError")
+          if (!state.streamId || resumes >= MAX_RESUME_ATTEMPTS) throw new Error("Stream connection lost")
+          resumes += 1
+          await new Promise((resolve) => setTimeout(resolve, RESUME_DELAY_MS * resumes))
+          consumed = 0
+          await this.send({
+            op: "resume", id, stream_id: state.streamId, last_seq: state.lastSeq, credit: CREDIT_WINDOW,
+          }).catch(() => {})  // a failed connect closes the socket, which wakes us again
+          continue
+        }
+        if ("error" in frame) throw new Error(frame.error)
+        if ("end" in frame) return
+        if (!("event" in frame)) continue
+
+        state.streamId = frame.stream_id
+        state.lastSeq = frame.seq
+        resumes = 0
+        yield frame.event
+
+        consumed += 1
+        if (consumed >= CREDIT_WINDOW / 2) {
+          void this.send({ op: "credit", id, n: consumed }).catch(() => {})
+          consumed = 0
+        }
+      }
+    } finally {
+      signal?.removeEventListener("abort", onAbort)
+      this.streams.delete(id)
+    }
+  }
+
+  /** Subscribe to LM Studio health pushes; returns an unsubscribe function. */
+  onHealth(listener: (health: HealthPush) => void): () => void {
+    this.healthListeners.add(listener)
+    void this.send({ op: "health" }).catch(() => {
+      listener({ online: false, models: [], status: {} })
+    })
+    return () => { this.healthListeners.delete(listener) }
+  }
+}
+
+export const chatSocket = new ChatSocket()
@@ -0,0 +1,181 @@
+import type { StoreApi } from "zustand"
+import { loadConversations, writeConversations, storeImage, forgetImages } from "../lib/db"
+import type { Conversation, Message } from "../types"
+
+// Writes are batched: a conversation that changes while tokens stream in is
+// written once the stream ends, or after the store has been idle for a bit.
+const IDLE_FLUSH_MS = 1000
+const MAX_FLUSH_DELAY_MS = 5000
+
+interface ConversationSlice {
+  conversations: Conversation[]
+  conversationsLoaded: boolean
+  isStreaming: boolean
+}
+
+type LegacyMessage = Message & { imageBase64?: string }
+
+// Copy of the legacy conversations, kept until IndexedDB has them
+const LEGACY_BACKUP_KEY = "langgraph-chat-legacy-conversations"
+
+let legacyConversations: Conversation[] = []
+
+/**
+ * Conversations found in the old single-blob localStorage format. The
+ * persist middleware rewrites its key without them right after migrating,
+ * so a copy is saved first; this throws (and aborts the migration, leaving
+ * the old blob alone) if localStorage has no room for it.
+ */
+export function setLegacyConversations(conversations: Conversation[]) {
+  legacyConversations = conversations
+  localStorage.setItem(LEGACY_BACKUP_KEY, JSON.stringify(conversations))
+}
+
+function takeLegacyConversations(): Conversation[] {
+  if (legacyConversations.length > 0) return legacyConversations
+  try {
+    // Left over from a migration whose IndexedDB write never succeeded
+    const backup = localStorage.getItem(LEGACY_BACKUP_KEY)
+    return backup ? (JSON.parse(backup) as Conversation[]) : []
+  } catch {
+    return []
+  }
+}
+
+function dropLegacyBackup() {
+  legacyConversations = []
+  localStorage.removeItem(LEGACY_BACKUP_KEY)
+}
+
+function imageIdsOf(conversation: Conversation): string[] {
+  return conversation.messages.flatMap((m) => (m.imageId ? [m.imageId] : []))
+}
+
+function migrateLegacy(conversations: Conversation[]): Conversation[] {
+  return conversations.map((c) => ({
+    ...c,
+    messages: c.messages.map((m) => {
+      const { imageBase64, ...rest } = m as LegacyMessage
+      if (!imageBase64) return rest
+      return { ...rest, imageId: storeImage(imageBase64, m.imageMediaType ?? "image/jpeg") }
+    }),
+  }))
+}
+
+export function persistConversations<T extends ConversationSlice>(store: StoreApi<T>) {
+  const dirty = new Set<string>()
+  const deleted = new Map<string, string[]>()
+  // Migrated conversations not written to IndexedDB yet
+  const unmigrated = new Set<string>()
+  let timer: ReturnType<typeof setTimeout> | null = null
+  let firstDirtyAt: number | null = null
+
+  const flush = async () => {
+    if (timer) clearTimeout(timer)
+    timer = null
+    firstDirtyAt = null
+    if (dirty.size === 0 && deleted.size === 0) return
+
+    const byId = new Map(store.getState().conversations.map((c) => [c.id, c]))
+    const updated = [...dirty].flatMap((id) => {
+      const c = byId.get(id)
+      return c ? [c] : []
+    })
+    const removed = [...deleted]
+    const deletedIds = removed.map(([id]) => id)
+    const deletedImageIds = removed.flatMap(([, imageIds]) => imageIds)
+    dirty.clear()
+    deleted.clear()
+
+    forgetImages(deletedImageIds)
+    try {
+      await writeConversations(updated, deletedIds, deletedImageIds)
+    } catch (err) {
+      console.error("Failed to persist conversations", err)
+      for (const c of updated) dirty.add(c.id)
+      for (const [id, imageIds] of removed) deleted.set(id, imageIds)
+      return
+    }
+
+    if (unmigrated.size > 0) {
+      for (const c of updated) unmigrated.delete(c.id)
+      for (const id of deletedIds) unmigrated.delete(id)
+      if (unmigrated.size === 0) dropLegacyBackup()
+    }
+  }
+
+  const scheduleFlush = () => {
+    const now = Date.now()
+    firstDirtyAt ??= now
+    if (timer) clearTimeout(timer)
+    if (now - firstDirtyAt >= MAX_FLUSH_DELAY_MS) {
+      void flush()
+      return
+    }
+    timer = setTimeout(() => { void flush() }, IDLE_FLUSH_MS)
+  }
+
+  store.subscribe((state, prev) => {
+    if (prev.isStreaming && !state.isStreaming) {
+      void flush()
+    }
+    if (state.conversations === prev.conversations || !prev.conversationsLoaded) return
+
+    // Reducers replace only the conversations they touch, so an identity
+    // check is enough to find what changed — no serialization per update.
+    const before = new Map(prev.conversations.map((c) => [c.id, c]))
+    for (const c of state.conversations) {
+      if (before.get(c.id) !== c) dirty.add(c.id)
+      before.delete(c.id)
+    }
+    for (const [id, c] of before) {
+      dirty.delete(id)
+      deleted.set(id, imageIdsOf(c))
+    }
+
+    if (state.isStreaming) {
+      scheduleFlush()
+    } else {
+      void flush()
+    }
+  })
+
+  window.addEventListener("pagehide", () => { void flush() })
+  document.addEventListener("visibilitychange", () => {
+    if (document.visibilityState === "hidden") void flush()
+  })
+
+  loadConversations()
+    .then((stored) => {
+      const legacy = takeLegacyConversations()
+      if (stored.length === 0 && legacy.length > 0) {
+        stored = migrateLegacy(legacy)
+        stored.forEach((c) => {
+          dirty.add(c.id)
+          unmigrated.add(c.id)
+        })
+      } else if (legacy.length > 0) {
+        dropLegacyBackup()  // an earlier migration already got them in
+      }
+
+      // Keep anything created before hydration finished
+      const current = store.getState().conversations
+      const currentIds = new Set(current.map((c) => c.id))
+      current.forEach((c) => dirty.add(c.id))
+
+      store.setState({
+        conversations: [...current, ...stored.filter((c) => !currentIds.has(c.id))],
+        conversationsLoaded: true,
+      } as Partial<T>)
+      if (dirty.size > 0) void flush()
+    })
+    .catch((err) => {
+      console.error("Failed to load conversations", err)
+      // Show the legacy conversations anyway; their backup stays in
+      // localStorage so the migration is retried on the next load
+      store.setState({
+        conversations: [...store.getState().conversations, ...migrateLegacy(takeLegacyConversations())],
+        conversationsLoaded: true,
+      } as Partial<T>)
+    })
+}
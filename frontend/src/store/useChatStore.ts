@@ -2,6 +2,7 @@ import { create } from "zustand"
 import { persist } from "zustand/middleware"
 import { v4 as uuidv4 } from "uuid"
 import type { Conversation, Message, MessageType, ToolCallInfo } from "../types"
+import { persistConversations, setLegacyConversations } from "./persistence"
 
 export interface PendingTerminalCommand {
   command: string
@@ -10,6 +11,7 @@ export interface PendingTerminalCommand {
 
 interface ChatStore {
   conversations: Conversation[]
+  conversationsLoaded: boolean
   activeConversationId: string | null
   isStreaming: boolean
   isThinking: boolean
@@ -25,9 +27,11 @@ interface ChatStore {
 
   createConversation: () => string
   deleteConversation: (id: string) => void
+  importConversation: (conversation: Conversation) => void
   setActiveConversation: (id: string) => void
   addMessage: (conversationId: string, message: Omit<Message, "id" | "timestamp">) => string
   appendToken: (conversationId: string, messageId: string, token: string) => void
+  flushTokens: () => void
   setTitle: (conversationId: string, title: string) => void
   setMessageType: (conversationId: string, messageId: string, type: MessageType) => void
   setToolCalls: (conversationId: string, messageId: string, toolCalls: ToolCallInfo[]) => void
@@ -45,10 +49,15 @@ interface ChatStore {
   getActiveConversation: () => Conversation | null
 }
 
+// In-flight tokens keyed by conversation and message, applied per frame
+const pendingTokens = new Map<string, string>()
+let tokenFrame: number | null = null
+
 export const useChatStore = create<ChatStore>()(
   persist(
     (set, get) => ({
       conversations: [],
+      conversationsLoaded: false,
       activeConversationId: null,
       isStreaming: false,
       isThinking: false,
@@ -90,6 +99,15 @@ export const useChatStore = create<ChatStore>()(
         })
       },
 
+      importConversation: (conversation) => {
+        set((state) => ({
+          conversations: state.conversations.some((c) => c.id === conversation.id)
+            ? state.conversations
+            : [conversation, ...state.conversations],
+          activeConversationId: conversation.id,
+        }))
+      },
+
       setActiveConversation: (id) => set({ activeConversationId: id }),
 
       addMessage: (conversationId, message) => {
@@ -107,17 +125,41 @@ export const useChatStore = create<ChatStore>()(
       },
 
       appendToken: (conversationId, messageId, token) => {
+        // Tokens collect in a mutable buffer and are applied once per
+        // animation frame instead of producing a new state per token.
+        const key = `${conversationId}\u0000${messageId}`
+        pendingTokens.set(key, (pendingTokens.get(key) ?? "") + token)
+        if (tokenFrame === null) {
+          tokenFrame = requestAnimationFrame(() => get().flushTokens())
+        }
+      },
+
+      flushTokens: () => {
+        if (tokenFrame !== null) {
+          cancelAnimationFrame(tokenFrame)
+          tokenFrame = null
+        }
+        if (pendingTokens.size === 0) return
+        const batch = new Map<string, Map<string, string>>()
+        for (const [key, text] of pendingTokens) {
+          const [conversationId, messageId] = key.split("\u0000")
+          if (!batch.has(conversationId)) batch.set(conversationId, new Map())
+          batch.get(conversationId)!.set(messageId, text)
+        }
+        pendingTokens.clear()
+
         set((state) => ({
-          conversations: state.conversations.map((c) =>
-            c.id === conversationId
-              ? {
-                  ...c,
-                  messages: c.messages.map((m) =>
-                    m.id === messageId ? { ...m, content: m.content + token } : m
-                  ),
-                }
-              : c
-          ),
+          conversations: state.conversations.map((c) => {
+            const updates = batch.get(c.id)
+            if (!updates) return c
+            return {
+              ...c,
+              messages: c.messages.map((m) => {
+                const text = updates.get(m.id)
+                return text === undefined ? m : { ...m, content: m.content + text }
+              }),
+            }
+          }),
         }))
       },
 
@@ -168,7 +210,11 @@ export const useChatStore = create<ChatStore>()(
         }))
       },
 
-      setStreaming: (value) => set({ isStreaming: value }),
+      setStreaming: (value) => {
+        // Make sure the last buffered tokens land before the stream is marked done
+        if (!value) get().flushTokens()
+        set({ isStreaming: value })
+      },
       setThinking: (value) => set({ isThinking: value }),
       setSearching: (value) => set({ isSearching: value }),
       setExecuting: (value) => set({ isExecuting: value }),
@@ -187,14 +233,27 @@ export const useChatStore = create<ChatStore>()(
     }),
     {
       name: "langgraph-chat-storage",
+      version: 1,
+      // Conversations live in IndexedDB (see ./persistence); only small UI
+      // settings stay in localStorage.
       partialize: (state) => ({
-        conversations: state.conversations,
         activeConversationId: state.activeConversationId,
         thinkingMode: state.thinkingMode,
         webSearchMode: state.webSearchMode,
         terminalMode: state.terminalMode,
         selectedModel: state.selectedModel,
       }),
+      migrate: (persisted, version) => {
+        const state = persisted as Partial<ChatStore>
+        if (version === 0 && state.conversations) {
+          // Backs the conversations up first; see setLegacyConversations
+          setLegacyConversations(state.conversations)
+          delete state.conversations
+        }
+        return state as ChatStore
+      },
     }
   )
 )
+
+persistConversations(useChatStore)
@@ -2,6 +2,8 @@ export type MessageRole = "user" | "assistant" | "system"
 
 export type MessageType = "simple" | "summary_request" | "system_instruction"
 
+export type ModelStatus = "hot" | "cold" | "loading"
+
 export interface SearchResult {
   position: number
   title: string
@@ -17,11 +19,17 @@ export interface TerminalResult {
   truncated: boolean
 }
 
+export interface FileSearchMatch {
+  path: string
+  matches?: { line: number; text: string }[]
+}
+
 export interface ToolCallInfo {
   name: string
   query: string
   command?: string
   results?: SearchResult[]
+  files?: FileSearchMatch[]
   terminalResult?: TerminalResult
   error?: string
 }
@@ -31,7 +39,7 @@ export interface Message {
   role: MessageRole
   content: string
   messageType?: MessageType
-  imageBase64?: string
+  imageId?: string
   imageMediaType?: string
   toolCalls?: ToolCallInfo[]
   timestamp: number
@@ -59,6 +67,8 @@ export interface StreamEvent {
     | "tool_error"
     | "terminal_pending"
     | "compressing"
+    | "cancelled"
+    | "status"
   content?: string
 }
 
@@ -78,3 +88,29 @@ export interface ChatRequest {
   web_search: boolean
   terminal_access: boolean
 }
+
+export interface ArchiveSearchResult {
+  conversation_id: string
+  title: string
+  message_id: number
+  role: MessageRole
+  snippet: string
+  rank: number
+  timestamp: number
+}
+
+export interface ArchivedConversation {
+  id: string
+  title: string
+  createdAt: number
+  updatedAt: number
+  messages: { role: MessageRole; content: string; timestamp: number }[]
+}
+
+export interface TerminalResumeRequest {
+  thread_id: string
+  decisions: {
+    tool_call_id: string
+    approved: boolean
+  }[]
+}